@@ -0,0 +1,105 @@
+"""Bulk DAO benchmark: single-row ``BaseDao`` methods vs the bulk ones.
+
+Inserts, updates and deletes ``--rows`` subreddits with each strategy against
+the configured database and prints rows/sec. Needs a migrated schema; the
+rows it creates are removed again.
+
+    python -m bench.bulk_dao --rows 5000 --batch-size 1000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import select
+
+from src.config.database import engine
+from src.posts.dao import SubredditDao
+from src.posts.models import Subreddit
+
+
+def make_rows(prefix: str, count: int) -> list[dict]:
+    return [{"name": f"{prefix}{i}", "description": "bench"} for i in range(count)]
+
+
+async def timed(count: int, coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return round(count / (time.perf_counter() - started), 1)
+
+
+async def loop_add(rows):
+    for row in rows:
+        await SubredditDao.add(**row)
+
+
+async def loop_update(ids):
+    for obj_id in ids:
+        await SubredditDao.update({"id": obj_id}, description="looped")
+
+
+async def loop_delete(ids):
+    for obj_id in ids:
+        await SubredditDao.delete_by_id(obj_id)
+
+
+async def bench_ids(prefix: str) -> list[int]:
+    async with engine.connect() as connection:
+        result = await connection.execute(
+            select(Subreddit.id).where(Subreddit.name.startswith(prefix))
+        )
+        return result.scalars().all()
+
+
+async def main(args):
+    rows, batch = args.rows, args.batch_size
+    await SubredditDao.delete_many({"description": "bench"})
+    report = {"insert": {}, "update": {}, "delete": {}}
+
+    report["insert"]["loop_add"] = await timed(rows, loop_add(make_rows("bl-", rows)))
+    report["insert"]["add_many"] = await timed(
+        rows, SubredditDao.add_many(make_rows("bm-", rows), batch_size=batch)
+    )
+    report["insert"]["add_many_copy"] = await timed(
+        rows, SubredditDao.add_many(make_rows("bc-", rows), batch_size=batch, copy=True)
+    )
+
+    looped, bulk = await bench_ids("bl-"), await bench_ids("bm-")
+    report["update"]["loop_update"] = await timed(rows, loop_update(looped))
+    report["update"]["update_many"] = await timed(
+        rows,
+        SubredditDao.update_many(
+            [{"id": obj_id, "description": "bulk"} for obj_id in bulk],
+            batch_size=batch,
+        ),
+    )
+    report["update"]["upsert_many"] = await timed(
+        rows,
+        SubredditDao.upsert_many(
+            [{"name": f"bc-{i}", "description": "bench"} for i in range(rows)],
+            index_elements=("name",),
+            batch_size=batch,
+        ),
+    )
+
+    report["delete"]["loop_delete"] = await timed(rows, loop_delete(looped))
+    report["delete"]["delete_many"] = await timed(
+        rows, SubredditDao.delete_many({"id": bulk}, batch_size=batch)
+    )
+    await SubredditDao.delete_many({"description": "bench"})
+    await engine.dispose()
+
+    for results in report.values():
+        baseline = next(iter(results.values()))
+        results["speedup"] = {
+            name: round(rate / baseline, 1) for name, rate in results.items()
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,150 @@
+"""Per-call Python overhead of the hot DAO reads: rebuilt vs prebuilt statements.
+
+For each method, "before" builds the ``select()`` on every call the way the
+DAOs used to, "after" calls the DAO, which reuses one statement object. Both
+run ``--calls`` times against the configured database, each call in its own
+session like outside a request, and report microseconds per call:
+
+- ``build_us``: building the statement and its cache key, no database;
+- ``cpu_us``: process CPU time, i.e. everything but waiting on Postgres;
+- ``wall_us``: end to end.
+
+    python -m bench.dao_statements --calls 2000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+
+from src.config.database import engine, session_scope
+from src.posts.dao import CommentDao, PostDao, VoteDao
+from src.posts.models import Comment, Post, Vote
+from src.users.dao import UserDao
+from src.users.models import User
+
+
+def legacy_queries(ids: dict) -> dict:
+    return {
+        "UserDao.find_one_or_none_by_id": lambda: select(User).filter_by(
+            id=ids["user"]
+        ),
+        "PostDao.get_post_by_id": lambda: select(Post)
+        .filter_by(id=ids["post"])
+        .options(joinedload(Post.subreddit), joinedload(Post.user)),
+        "CommentDao.get_comment_by_id": lambda: select(Comment)
+        .filter_by(id=ids["comment"])
+        .options(joinedload(Comment.user)),
+        "VoteDao.get_user_votes_for_comments": lambda: select(Vote).filter(
+            Vote.user_id == ids["user"], Vote.comment_id.in_(ids["comments"])
+        ),
+    }
+
+
+def dao_calls(ids: dict) -> dict:
+    return {
+        "UserDao.find_one_or_none_by_id": lambda: UserDao.find_one_or_none_by_id(
+            ids["user"]
+        ),
+        "PostDao.get_post_by_id": lambda: PostDao.get_post_by_id(ids["post"]),
+        "CommentDao.get_comment_by_id": lambda: CommentDao.get_comment_by_id(
+            ids["comment"]
+        ),
+        "VoteDao.get_user_votes_for_comments": (
+            lambda: VoteDao.get_user_votes_for_comments(ids["user"], ids["comments"])
+        ),
+    }
+
+
+def prebuilt_statements() -> dict:
+    return {
+        "UserDao.find_one_or_none_by_id": UserDao._statements.get("by_id"),
+        "PostDao.get_post_by_id": PostDao._statements.get("by_id_with_relations"),
+        "CommentDao.get_comment_by_id": CommentDao._statements.get("by_id_with_user"),
+        "VoteDao.get_user_votes_for_comments": VoteDao._statements.get(
+            "user_votes_for_comments"
+        ),
+    }
+
+
+async def sample_ids() -> dict:
+    async with session_scope() as session:
+        comment = (
+            await session.execute(select(Comment.id, Comment.post_id).limit(1))
+        ).one_or_none()
+        if comment is None:
+            raise SystemExit("The database needs at least one comment")
+        comments = await session.execute(
+            select(Comment.id).where(Comment.post_id == comment.post_id).limit(50)
+        )
+        user = await session.scalar(select(func.min(User.id)))
+    return {
+        "user": user or 1,
+        "post": comment.post_id,
+        "comment": comment.id,
+        "comments": comments.scalars().all(),
+    }
+
+
+def time_build(build, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        build()._generate_cache_key()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+async def time_calls(call, calls: int) -> tuple[float, float]:
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(calls):
+        await call()
+    return (
+        (time.perf_counter() - wall) / calls * 1e6,
+        (time.process_time() - cpu) / calls * 1e6,
+    )
+
+
+async def run_legacy(build):
+    async with session_scope() as session:
+        result = await session.execute(build())
+        return result.scalars().all()
+
+
+async def main(args):
+    ids = await sample_ids()
+    legacy, calls = legacy_queries(ids), dao_calls(ids)
+    report = {}
+    for name, build in legacy.items():
+        # Warm up both paths: compiled cache, prepared statements, pool.
+        for _ in range(20):
+            await run_legacy(build)
+            await calls[name]()
+        before_wall, before_cpu = await time_calls(
+            lambda build=build: run_legacy(build), args.calls
+        )
+        after_wall, after_cpu = await time_calls(calls[name], args.calls)
+        report[name] = {
+            "before": {
+                "build_us": round(time_build(build, args.calls), 1),
+                "cpu_us": round(before_cpu, 1),
+                "wall_us": round(before_wall, 1),
+            },
+            "after": {
+                "cpu_us": round(after_cpu, 1),
+                "wall_us": round(after_wall, 1),
+            },
+        }
+    for name, query in prebuilt_statements().items():
+        report[name]["after"]["build_us"] = round(
+            time_build(lambda query=query: query, args.calls), 1
+        )
+    await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
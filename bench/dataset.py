@@ -0,0 +1,336 @@
+"""Synthetic corpus for benchmarks, bulk-loaded with ``COPY``.
+
+Activity follows a Zipf distribution: a few huge subreddits and heavy users,
+a long tail. Subscriptions, posts, comments and votes pick their users,
+subreddits and targets that way. Post and comment bodies are log-normally
+long around ``--post-words`` and ``--comment-words``. Comment threads reply
+to the latest comment with ``--reply-chains`` probability, so busy threads
+grow deep chains. The counters (upvotes, comments, replies, subscribers)
+match the rows. Everyone's password is ``password123``; users 1-4 are the
+fixture users of tests/conftest.py.
+
+The database's name must contain ``bench`` or ``test``, its schema is
+dropped first.
+
+    python -m bench.dataset --users 50000 --posts 1000000 --comments 3000000
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.config.database import DATABASE_URL, engine, transaction
+from src.config.partitions import PARTITIONED_TABLES, create_partitions_statement
+from src.config.settings import settings
+from src.posts.dao import CommentDao, PostDao, SubredditDao, SubscriptionDao, VoteDao
+from src.users.auth import get_password_hash
+from src.users.dao import UserDao
+from src.users.models import GenderEnum, Role
+
+# Users 1-4 play the roles of the fixture users in tests/conftest.py.
+SEED_USERS = ("user", "admin", "other", "unverified")
+
+TABLES = (
+    "users",
+    "subreddits",
+    "subscriptions",
+    "posts",
+    "comments",
+    "votes",
+    "notifications",
+)
+SYLLABLES = ["ka", "ro", "mi", "ne", "la", "to", "su", "vi", "de", "po", "ra", "li"]
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--days", type=int, default=150)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--subreddits", type=int, default=500)
+    parser.add_argument("--subscriptions", type=int, default=30000)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=300000)
+    parser.add_argument("--votes", type=int, default=300000)
+    parser.add_argument("--post-words", type=int, default=80)
+    parser.add_argument("--comment-words", type=int, default=20)
+    parser.add_argument("--replies", type=float, default=0.6)
+    parser.add_argument("--reply-chains", type=float, default=0.2)
+
+
+def require_scratch_database():
+    if "bench" not in settings.DB_NAME and "test" not in settings.DB_NAME:
+        sys.exit("DB_NAME must point at a dedicated *bench* or *test* database")
+
+
+def zipf(rng: random.Random, n: int, k: int, s: float = 1.1) -> list[int]:
+    """``k`` draws from ``range(n)`` where rank ``r`` has weight ``1/r**s``."""
+    if not k:
+        return []
+    cum_weights, total = [], 0.0
+    for rank in range(1, n + 1):
+        total += 1 / rank**s
+        cum_weights.append(total)
+    return rng.choices(range(n), cum_weights=cum_weights, k=k)
+
+
+def recent(rng: random.Random, now: datetime, days: int) -> datetime:
+    return now - timedelta(seconds=rng.randrange(days * 86400))
+
+
+def vocabulary(rng: random.Random, size: int = 5000) -> list[str]:
+    return ["".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))) for _ in range(size)]
+
+
+def prose(rng: random.Random, words: list[str], median: int, limit: int) -> str:
+    """Log-normally many words around ``median``, mostly short and some long,
+    cut at the column's ``limit`` characters."""
+    n = int(rng.lognormvariate(math.log(median), 1)) + 1
+    return " ".join(rng.choices(words, k=n))[:limit]
+
+
+async def reset_schema():
+    reset_engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    async with reset_engine.begin() as connection:
+        await connection.execute(text("DROP SCHEMA public CASCADE"))
+        await connection.execute(text("CREATE SCHEMA public"))
+    await reset_engine.dispose()
+
+
+async def generate(args) -> dict[str, int]:
+    """Load the corpus into the migrated, empty database; returns the number
+    of rows per table."""
+    rng = random.Random(args.seed)
+    words = vocabulary(rng)
+    now = datetime.now().replace(microsecond=0)
+    days = args.days
+    months = days // 28 + 1
+    async with transaction() as session:
+        for table in PARTITIONED_TABLES:
+            await session.execute(
+                text(create_partitions_statement(table, months_back=months))
+            )
+        await session.execute(
+            insert(Role),
+            [
+                {"id": 1, "name": "user"},
+                {"id": 2, "name": "admin"},
+                {"id": 3, "name": "super_admin"},
+            ],
+        )
+
+    password = get_password_hash("password123")
+    await UserDao.add_many(
+        [
+            {
+                "id": i,
+                "username": name,
+                "email": f"{name}@example.com",
+                "password": password,
+                "gender": GenderEnum.OTHER,
+                "date_of_birth": datetime(2000, 1, 1),
+                "is_verified": True,
+                "role_id": 3 if i == 2 else 1,
+            }
+            for i, name in enumerate(
+                [*SEED_USERS, *(f"user{i}" for i in range(5, args.users + 1))], 1
+            )
+        ],
+        copy=True,
+    )
+    subreddits = [
+        {
+            "id": i,
+            "name": f"sub{i}",
+            "description": "synthetic",
+            "created_by_id": creator + 1,
+            "subscribers_count": 0,
+        }
+        for i, creator in enumerate(zipf(rng, args.users, args.subreddits), 1)
+    ]
+
+    pairs = set(
+        zip(
+            (u + 1 for u in zipf(rng, args.users, args.subscriptions)),
+            (s + 1 for s in zipf(rng, args.subreddits, args.subscriptions)),
+            strict=True,
+        )
+    )
+    for _, subreddit_id in pairs:
+        subreddits[subreddit_id - 1]["subscribers_count"] += 1
+    await SubredditDao.add_many(subreddits, copy=True)
+    await SubscriptionDao.add_many(
+        [
+            {"id": i, "user_id": u, "subreddit_id": s}
+            for i, (u, s) in enumerate(sorted(pairs), 1)
+        ],
+        copy=True,
+    )
+
+    authors = zipf(rng, args.users, args.posts)
+    in_subreddits = zipf(rng, args.subreddits, args.posts)
+    posts = [
+        {
+            "id": i,
+            "created_at": recent(rng, now, days),
+            "title": f"post {i}",
+            "content": prose(rng, words, args.post_words, 40000),
+            "upvote": 0,
+            "comments_count": 0,
+            "user_id": authors[i - 1] + 1,
+            "subreddit_id": in_subreddits[i - 1] + 1,
+        }
+        for i in range(1, args.posts + 1)
+    ]
+
+    comments = []
+    commenters = zipf(rng, args.users, args.comments)
+    for i, post_index in enumerate(zipf(rng, args.posts, args.comments), 1):
+        post = posts[post_index]
+        siblings = post.setdefault("_comments", [])
+        draw = rng.random()
+        if siblings and draw < args.reply_chains:
+            # Answers the latest comment: back-and-forth threads grow deep.
+            parent = siblings[-1]
+        elif siblings and draw < args.replies:
+            parent = rng.choice(siblings)
+        else:
+            parent = None
+        after = parent["created_at"] if parent else post["created_at"]
+        comments.append(
+            {
+                "id": i,
+                "created_at": after + (now - after) * rng.random() ** 4,
+                "content": prose(rng, words, args.comment_words, 4000),
+                "upvote": 0,
+                "replies_count": 0,
+                "user_id": commenters[i - 1] + 1,
+                "post_id": post["id"],
+                "parent_comment_id": parent["id"] if parent else None,
+            }
+        )
+        siblings.append(comments[-1])
+        post["comments_count"] += 1
+        if parent:
+            parent["replies_count"] += 1
+    for post in posts:
+        post.pop("_comments", None)
+
+    votes, seen = [], set()
+    voters = zipf(rng, args.users, args.votes)
+    on_posts = zipf(rng, args.posts, args.votes // 2)
+    on_comments = zipf(rng, args.comments, args.votes - args.votes // 2)
+    for n, (voter, target) in enumerate(
+        zip(voters, [*on_posts, *on_comments], strict=True)
+    ):
+        kind = "post" if n < len(on_posts) else "comment"
+        row = posts[target] if kind == "post" else comments[target]
+        if (voter, kind, row["id"]) in seen:
+            continue
+        seen.add((voter, kind, row["id"]))
+        is_upvote = rng.random() < 0.8
+        row["upvote"] += 1 if is_upvote else -1
+        votes.append(
+            {
+                "id": len(votes) + 1,
+                "created_at": row["created_at"] + (now - row["created_at"]) / 2,
+                "user_id": voter + 1,
+                "post_id": row["id"] if kind == "post" else None,
+                "comment_id": row["id"] if kind == "comment" else None,
+                "is_upvote": is_upvote,
+            }
+        )
+
+    await PostDao.add_many(posts, copy=True)
+    await CommentDao.add_many(comments, copy=True)
+    await VoteDao.add_many(votes, copy=True)
+
+    async with transaction() as session:
+        # What the outbox relay would have recorded for these comments, read
+        # a day after the fact except for the last few days.
+        await session.execute(
+            text(
+                "INSERT INTO notifications (user_id, kind, actor_id, post_id, "
+                "comment_id, read_at, emailed_at, created_at) "
+                "SELECT coalesce(parent.user_id, p.user_id), "
+                "CASE WHEN c.parent_comment_id IS NULL THEN 'comment' "
+                "ELSE 'reply' END, c.user_id, c.post_id, c.id, "
+                "CASE WHEN c.created_at < :recent THEN c.created_at + interval "
+                "'1 day' END, c.created_at + interval '1 hour', c.created_at "
+                "FROM comments c "
+                "LEFT JOIN comments parent ON parent.id = c.parent_comment_id "
+                "LEFT JOIN posts p ON p.id = c.post_id AND c.parent_comment_id IS NULL "
+                "WHERE coalesce(parent.user_id, p.user_id) IS DISTINCT FROM c.user_id "
+                "ORDER BY 1, c.created_at"
+            ),
+            {"recent": now - timedelta(days=3)},
+        )
+
+    async with transaction() as session:
+        for table in ("users", "subreddits", "subscriptions", *PARTITIONED_TABLES):
+            await session.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT max(id) FROM {table}))"
+                )
+            )
+        await session.execute(
+            text(
+                "UPDATE users SET is_verified = false, verification_code = '123456', "
+                "verification_expires = now() + interval '1 hour' WHERE id = 4"
+            )
+        )
+    async with engine.connect() as connection:
+        await connection.execution_options(isolation_level="AUTOCOMMIT")
+        # Statistics from a sample as large as the tables, and no autovacuum
+        # resampling them later, so the plans come out the same on every run.
+        tables = await connection.execute(
+            text(
+                "SELECT relname FROM pg_class WHERE relkind = 'r' "
+                "AND relnamespace = 'public'::regnamespace"
+            )
+        )
+        for table in tables.scalars().all():
+            await connection.execute(
+                text(f"ALTER TABLE {table} SET (autovacuum_enabled = false)")
+            )
+        await connection.execute(text("SET default_statistics_target = 10000"))
+        await connection.execute(text("VACUUM ANALYZE"))
+        return {
+            table: (
+                await connection.execute(text(f"SELECT count(*) FROM {table}"))
+            ).scalar_one()
+            for table in TABLES
+        }
+
+
+async def main(args):
+    started = time.perf_counter()
+    rows = await generate(args)
+    await engine.dispose()
+    print(
+        json.dumps(
+            {"rows": rows, "seconds": round(time.perf_counter() - started, 1)},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+    require_scratch_database()
+    asyncio.run(reset_schema())
+    command.upgrade(Config("alembic.ini"), "head")
+    asyncio.run(main(args))
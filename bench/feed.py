@@ -0,0 +1,197 @@
+"""The "new" feed for users with 10, 100 and 1,000 subscriptions.
+
+Seeds the posts of bench/plans.py into a dedicated database (its name must
+contain ``bench`` or ``test``), subscribes one user to ``n`` random
+subreddits for each ``--subscriptions`` size and fetches the first and the
+``--page``-th page of ``--limit`` posts ``--runs`` times with:
+
+- ``offset``: the old ``subreddit_id IN (...) ORDER BY created_at DESC``
+  with ``OFFSET``;
+- ``lateral``: one ``LATERAL ... LIMIT`` per subreddit from the cursor, then
+  the posts, as src/posts/feed.py does without Redis for a few subreddits;
+- ``keyset_in``: the ``IN`` list from the cursor, what it does for many;
+- ``heads``: ``FeedHeads.page`` from warm Redis heads, when Redis answers.
+
+Reports p50/p95 milliseconds per page and, for the SQL ones, the shared
+buffers the query picking the posts touched (``EXPLAIN (ANALYZE, BUFFERS)``).
+``--quiet`` subscribes to the less active half of the subreddits, where
+walking ``created_at`` skips the most posts. ``FEED_LATERAL_MAX_SUBREDDITS``
+should sit where ``lateral`` stops beating ``keyset_in``.
+
+    python -m bench.feed --subscriptions 10 100 300 1000
+    python -m bench.feed --reuse --quiet
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+from alembic import command
+from alembic.config import Config
+from redis.exceptions import RedisError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import selectinload
+
+from bench.plans import explain, reset_schema, seed_dataset
+from src.config.database import engine, session_scope, transaction
+from src.config.redis_client import close_redis, get_redis
+from src.config.settings import settings
+from src.posts.feed import FeedHeads, in_list_query, newest_query, score
+from src.posts.models import Post, Subscription
+
+# Seeded users from this id on have nothing special about them.
+FIRST_USER = 5
+
+
+def offset_query(subreddit_ids: list[int], limit: int, page: int):
+    return (
+        select(Post)
+        .where(Post.subreddit_id.in_(subreddit_ids))
+        .order_by(Post.created_at.desc())
+        .offset((page - 1) * limit)
+        .limit(limit)
+    )
+
+
+async def offset(subreddit_ids: list[int], limit: int, page: int):
+    query = offset_query(subreddit_ids, limit, page).options(
+        selectinload(Post.user), selectinload(Post.subreddit)
+    )
+    async with session_scope() as session:
+        return (await session.execute(query)).scalars().all()
+
+
+async def from_sql(heads: FeedHeads, subreddit_ids: list[int], limit: int, after):
+    newest = await heads._newest(subreddit_ids, limit, total=limit, after=after)
+    merged = sorted((head for rows in newest.values() for head in rows), reverse=True)
+    return await heads._posts(merged)
+
+
+async def buffers(query) -> int:
+    compiled = query.compile(
+        dialect=engine.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    params = compiled.construct_params()
+    plan = await explain(
+        str(compiled), tuple(params[name] for name in compiled.positiontup)
+    )
+    return plan["Shared Hit Blocks"] + plan["Shared Read Blocks"]
+
+
+async def timed(call, runs: int) -> dict:
+    await call()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[max(int(len(samples) * 0.95) - 1, 0)], 2),
+    }
+
+
+async def subscribe(user_id: int, subreddit_ids: list[int]):
+    async with transaction() as session:
+        await session.execute(
+            delete(Subscription).where(Subscription.user_id == user_id)
+        )
+        await session.execute(
+            insert(Subscription),
+            [{"user_id": user_id, "subreddit_id": s} for s in subreddit_ids],
+        )
+
+
+async def redis_available() -> bool:
+    try:
+        await get_redis().ping()
+    except RedisError:
+        return False
+    return True
+
+
+async def main(args):
+    if not args.reuse:
+        await seed_dataset(argparse.Namespace(**{**vars(args), "subscriptions": 0}))
+    rng = random.Random(args.seed)
+    size, ttl = settings.FEED_HEAD_SIZE, settings.FEED_HEAD_TTL_SECONDS
+    lateral, keyset_in = FeedHeads(size, ttl, sys.maxsize), FeedHeads(size, ttl, 0)
+    use_redis = await redis_available()
+    if use_redis:
+        await lateral.clear()
+
+    report = {}
+    for user_id, count in enumerate(args.subscriptions, FIRST_USER):
+        # Subreddit ids follow their Zipf rank: the quiet ones come last.
+        pool = range(1, args.subreddits + 1)
+        if args.quiet:
+            pool = pool[-max(count, args.subreddits // 2) :]
+        ids = sorted(rng.sample(pool, count))
+        await subscribe(user_id, ids)
+        # The cursor a client holds after reading the pages before --page.
+        skipped = await from_sql(lateral, ids, args.limit * (args.page - 1), None)
+        cursor = (score(skipped[-1].created_at), skipped[-1].id) if skipped else None
+
+        pages = {}
+        for page, after in ((1, None), (args.page, cursor)):
+            calls = {
+                "offset": lambda ids=ids, page=page: offset(ids, args.limit, page),
+                "lateral": lambda ids=ids, after=after: from_sql(
+                    lateral, ids, args.limit, after
+                ),
+                "keyset_in": lambda ids=ids, after=after: from_sql(
+                    keyset_in, ids, args.limit, after
+                ),
+            }
+            if use_redis:
+                calls["heads"] = lambda ids=ids, after=after: lateral.page(
+                    ids, args.limit, after
+                )
+            results = {
+                name: await timed(call, args.runs) for name, call in calls.items()
+            }
+            for name, query in (
+                ("offset", offset_query(ids, args.limit, page)),
+                ("lateral", newest_query(ids, args.limit, args.limit, after)),
+                ("keyset_in", in_list_query(ids, args.limit, after)),
+            ):
+                results[name]["buffers"] = await buffers(query)
+            if not use_redis:
+                results["heads"] = "skipped: Redis is not reachable"
+            pages[f"page_{page}"] = results
+        report[count] = pages
+
+    await close_redis()
+    await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscriptions", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--page", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument(
+        "--quiet", action="store_true", help="subscribe to the less active half"
+    )
+    parser.add_argument("--reuse", action="store_true", help="skip reset and seed")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--days", type=int, default=150)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--subreddits", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=200000)
+    args = parser.parse_args()
+    # Comments and votes play no part in the feed.
+    args.comments = args.votes = 0
+    if "bench" not in settings.DB_NAME and "test" not in settings.DB_NAME:
+        sys.exit("DB_NAME must point at a dedicated *bench* or *test* database")
+    if not args.reuse:
+        asyncio.run(reset_schema())
+        command.upgrade(Config("alembic.ini"), "head")
+    asyncio.run(main(args))
@@ -0,0 +1,88 @@
+"""Live post streams: memory per idle connection and fan-out of coalesced updates.
+
+Opens ``--connections`` streams spread over ``--posts`` posts in one process,
+the way a worker serves them, and reports the memory each idle one holds
+(tracemalloc, the stream's task and generator included). Then fires
+``--votes`` vote updates per post in a burst and reports how many frames the
+streams got (one per post and tick when coalescing works) and how long until
+every stream had its frame. Updates are fed to the hub directly, so Redis is
+not needed; its pub/sub round trip is not part of the numbers.
+
+    python -m bench.live --connections 1000 5000 10000
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import time
+import tracemalloc
+
+from src.posts.live import LiveHub
+
+
+async def consume(hub: LiveHub, post_id: int, frames: list, done: asyncio.Event):
+    async for frame in hub.stream(post_id, {"upvotes": 0}, 3600, 3600):
+        if frame.startswith("event: update"):
+            frames.append(time.perf_counter())
+            done.set()
+
+
+async def run(connections: int, posts: int, votes: int, coalesce: float) -> dict:
+    hub = LiveHub(coalesce, connections, 50, retry=3600)
+    frames, events = [], [asyncio.Event() for _ in range(connections)]
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [
+        asyncio.create_task(consume(hub, i % posts, frames, events[i]))
+        for i in range(connections)
+    ]
+    while hub.connections < connections:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.1)
+    gc.collect()
+    per_connection = (tracemalloc.get_traced_memory()[0] - before) / connections
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for vote in range(votes):
+        for post_id in range(posts):
+            hub.received(post_id, {"upvotes": vote})
+    await asyncio.gather(*(event.wait() for event in events))
+    elapsed = time.perf_counter() - started
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await hub.close()
+    return {
+        "bytes_per_connection": round(per_connection),
+        "updates": votes * posts,
+        "frames": len(frames),
+        "all_delivered_ms": round(elapsed * 1000, 1),
+        "fan_out_ms": round((max(frames) - min(frames)) * 1000, 1),
+    }
+
+
+async def main(args):
+    report = {}
+    for connections in args.connections:
+        report[f"connections={connections}"] = await run(
+            connections, args.posts, args.votes, args.coalesce
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--votes", type=int, default=100)
+    parser.add_argument("--coalesce", type=float, default=0.5)
+    args = parser.parse_args()
+    # Without Redis every stream would log that it can't subscribe.
+    logging.getLogger("src.posts.live").setLevel(logging.ERROR)
+    asyncio.run(main(args))
@@ -0,0 +1,263 @@
+"""End-to-end load: mixed traffic against the ASGI app, in-process.
+
+``--concurrency`` virtual users log in as random corpus users (see
+bench/dataset.py; load it first), then loop over a weighted mix of requests
+for ``--duration`` seconds: the feeds, threads, single posts, votes and
+search. Targets are Zipf-distributed like the corpus, so hot posts get
+most of the traffic. Requests made during the ``--warmup`` seconds are not
+counted.
+
+Prints requests/sec and p50/p95/p99 latency in ms per route, and for all
+routes together, as JSON. ``--output`` stores it and ``--compare`` puts an
+earlier run next to it, e.g. to compare two commits:
+
+    python -m bench.load --duration 60 --output before.json
+    python -m bench.load --duration 60 --compare before.json
+
+``--route`` (repeatable) narrows the mix to the given routes, e.g. to time
+one route with a setting on and off.
+
+Votes are written for real, so the corpus drifts from run to run; reload it
+for exact comparisons. Everything shares one process and one event loop, so
+the numbers are for one worker.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+from sqlalchemy import text
+
+from bench.dataset import require_scratch_database, zipf
+from src.config.database import engine
+from src.config.redis_client import close_redis
+from src.config.settings import settings
+
+# Relative weight of each request in the mix.
+TRAFFIC = {
+    "GET /posts/lenta/": 20,
+    "GET /posts/lenta/new/": 15,
+    "GET /comments/comments/by_post/{post_id}": 25,
+    "GET /posts/{post_id}": 15,
+    "POST /posts/upvote/{post_id}": 10,
+    "POST /comments/upvote/{comment_id}": 5,
+    "GET /posts/find/": 5,
+    "POST /users/login/": 5,
+}
+
+
+class Corpus:
+    """Ids the requests pick from, hottest first."""
+
+    def __init__(self, rng: random.Random, users: int, posts: list, comments: list):
+        self.rng = rng
+        self.users = users
+        self.posts = posts
+        self.comments = comments
+        self._post_picks: list[int] = []
+        self._comment_picks: list[int] = []
+
+    @classmethod
+    async def load(cls, rng: random.Random) -> "Corpus":
+        async with engine.connect() as connection:
+
+            async def ids(query: str) -> list[int]:
+                return (await connection.execute(text(query))).scalars().all()
+
+            [users] = await ids("SELECT count(*) FROM users")
+            posts = await ids(
+                "SELECT id FROM posts ORDER BY comments_count DESC LIMIT 10000"
+            )
+            comments = await ids(
+                "SELECT id FROM comments ORDER BY upvote DESC LIMIT 10000"
+            )
+        if not posts:
+            raise SystemExit("No posts: load the corpus with python -m bench.dataset")
+        return cls(rng, users, posts, comments)
+
+    def user(self) -> str:
+        # 1-4 are the fixture users; the unverified one can't vote.
+        return f"user{self.rng.randint(5, self.users)}"
+
+    def post(self) -> int:
+        if not self._post_picks:
+            self._post_picks = zipf(self.rng, len(self.posts), 1000)
+        return self.posts[self._post_picks.pop()]
+
+    def comment(self) -> int:
+        if not self._comment_picks:
+            self._comment_picks = zipf(self.rng, len(self.comments), 1000)
+        return self.comments[self._comment_picks.pop()]
+
+
+def build_request(route: str, corpus: Corpus) -> tuple[str, str, dict]:
+    """Method, URL and keyword arguments of one ``route`` request."""
+    rng = corpus.rng
+    if route == "GET /posts/lenta/":
+        return (
+            "GET",
+            "/posts/lenta/",
+            {"params": {"sort_by": rng.choice(["hot", "top"])}},
+        )
+    if route == "GET /posts/lenta/new/":
+        return "GET", "/posts/lenta/new/", {}
+    if route == "GET /comments/comments/by_post/{post_id}":
+        return "GET", f"/comments/comments/by_post/{corpus.post()}", {}
+    if route == "GET /posts/{post_id}":
+        return "GET", f"/posts/{corpus.post()}", {}
+    if route == "POST /posts/upvote/{post_id}":
+        url = f"/posts/upvote/{corpus.post()}"
+        return "POST", url, {"params": {"is_upvote": rng.random() < 0.8}}
+    if route == "POST /comments/upvote/{comment_id}":
+        url = f"/comments/upvote/{corpus.comment()}"
+        return "POST", url, {"params": {"is_upvote": rng.random() < 0.8}}
+    if route == "GET /posts/find/":
+        return (
+            "GET",
+            "/posts/find/",
+            {"params": {"search": f"post {rng.randint(1, 999)}"}},
+        )
+    if route == "POST /users/login/":
+        user = corpus.user()
+        body = {"email": f"{user}@example.com", "password": "password123"}
+        return "POST", "/users/login/", {"json": body}
+    raise ValueError(route)
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    corpus: Corpus,
+    traffic: dict[str, int],
+    deadline: float,
+    measure_from: float,
+    latencies: dict[str, list[float]],
+    errors: dict[str, int],
+):
+    routes, weights = list(traffic), list(traffic.values())
+    # Everyone starts logged in, as a browsing session would be.
+    await request(client, *build_request("POST /users/login/", corpus))
+    while time.perf_counter() < deadline:
+        route = corpus.rng.choices(routes, weights)[0]
+        started = time.perf_counter()
+        status = await request(client, *build_request(route, corpus))
+        if started < measure_from:
+            continue
+        latencies[route].append(time.perf_counter() - started)
+        if status >= 400:
+            errors[route] += 1
+
+
+async def request(client: httpx.AsyncClient, method: str, url: str, kwargs: dict):
+    response = await client.request(method, f"{settings.API_V1_STR}{url}", **kwargs)
+    return response.status_code
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(samples: list[float], errors: int, seconds: float) -> dict:
+    ordered = sorted(samples)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / seconds, 1),
+        **{
+            f"p{q}_ms": round(percentile(ordered, q / 100) * 1000, 2)
+            if ordered
+            else None
+            for q in (50, 95, 99)
+        },
+    }
+
+
+def compare(before: dict, now: dict) -> dict:
+    """``"before -> now (change)"`` of each figure, per route."""
+
+    def pairs(old: dict, new: dict) -> dict:
+        result = {}
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms", "errors"):
+            a, b = old.get(key), new.get(key)
+            change = f" ({(b - a) / a:+.0%})" if a and b is not None else ""
+            result[key] = f"{a} -> {b}{change}"
+        return result
+
+    return {
+        "total": pairs(before["total"], now["total"]),
+        "routes": {
+            route: pairs(before["routes"].get(route, {}), summary)
+            for route, summary in now["routes"].items()
+        },
+    }
+
+
+async def main(args):
+    from src.main import app
+
+    rng = random.Random(args.seed)
+    traffic = {route: TRAFFIC[route] for route in args.route or TRAFFIC}
+    corpus = await Corpus.load(rng)
+    latencies, errors = defaultdict(list), defaultdict(int)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    clients = [
+        httpx.AsyncClient(transport=transport, base_url="http://load")
+        for _ in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    deadline = measure_from + args.duration
+    await asyncio.gather(
+        *(
+            virtual_user(
+                client, corpus, traffic, deadline, measure_from, latencies, errors
+            )
+            for client in clients
+        )
+    )
+    for client in clients:
+        await client.aclose()
+    await close_redis()
+    await engine.dispose()
+
+    report = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "total": summarize(
+            [s for samples in latencies.values() for s in samples],
+            sum(errors.values()),
+            args.duration,
+        ),
+        "routes": {
+            route: summarize(latencies[route], errors[route], args.duration)
+            for route in traffic
+        },
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        report = compare(json.loads(Path(args.compare).read_text()), report)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--route", action="append", choices=TRAFFIC, help="only these routes"
+    )
+    parser.add_argument("--output", metavar="FILE")
+    parser.add_argument("--compare", metavar="FILE")
+    args = parser.parse_args()
+    require_scratch_database()
+    # Without Redis every cache would log on every request.
+    logging.disable(logging.WARNING)
+    asyncio.run(main(args))
@@ -0,0 +1,117 @@
+"""Media serving benchmark: plain ``StaticFiles`` vs ``MediaFiles``.
+
+Drives both ASGI apps in-process (no network, no server) with the same
+workload and prints requests/sec and response bytes per scenario. The
+"repeat visit" scenario models a browser cache: a cached response is reused
+without a request while it is fresh, otherwise it is revalidated with
+If-None-Match.
+
+    python -m bench.media_serving --files 200 --size 200000 --requests 5000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+
+from starlette.staticfiles import StaticFiles
+
+from src.media.serving import MediaFiles
+
+
+def make_corpus(root: str, files: int, size: int, seed: int = 42) -> list[str]:
+    rnd = random.Random(seed)
+    paths = []
+    for _ in range(files):
+        data = rnd.randbytes(size)
+        digest = hashlib.sha256(data).hexdigest()
+        key = f"{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+        os.makedirs(os.path.join(root, digest[:2], digest[2:4]), exist_ok=True)
+        with open(os.path.join(root, key), "wb") as file:
+            file.write(data)
+        paths.append(key)
+    return paths
+
+
+async def call(app, path: str, headers: dict[str, str]):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": f"/{path}",
+        "raw_path": f"/{path}".encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        "extensions": {},
+    }
+    status, sent, response_headers = 0, 0, {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status, sent, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = {k.decode(): v.decode() for k, v in message["headers"]}
+        elif message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, sent, response_headers
+
+
+async def run_scenario(app, paths, requests, scenario, seed=7):
+    rnd = random.Random(seed)
+    cache: dict[str, dict[str, str]] = {}
+    network_requests, total_bytes = 0, 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        path = rnd.choice(paths)
+        headers = {}
+        if scenario == "range":
+            headers["range"] = "bytes=0-65535"
+        elif scenario == "repeat_visit" and path in cache:
+            cached = cache[path]
+            if "immutable" in cached.get("cache-control", ""):
+                continue
+            headers["if-none-match"] = cached["etag"]
+        status, sent, response_headers = await call(app, path, headers)
+        network_requests += 1
+        total_bytes += sent
+        if status == 200:
+            cache[path] = response_headers
+    elapsed = time.perf_counter() - started
+    return {
+        "page_views_per_sec": round(requests / elapsed, 1),
+        "network_requests": network_requests,
+        "bytes_sent": total_bytes,
+    }
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as root:
+        paths = make_corpus(root, args.files, args.size)
+        apps = {
+            "static_files": StaticFiles(directory=root),
+            "media_files": MediaFiles(directory=root),
+        }
+        report = {}
+        for scenario in ("cold", "repeat_visit", "range"):
+            report[scenario] = {
+                name: await run_scenario(app, paths, args.requests, scenario)
+                for name, app in apps.items()
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
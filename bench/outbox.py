@@ -0,0 +1,88 @@
+"""Outbox relay throughput in events/sec.
+
+Fills the outbox of a dedicated database (its name must contain ``bench`` or
+``test``) with ``--events`` events, lets ``--relays`` concurrent relays drain
+it with each ``--batch-sizes`` and reports events/sec. The ``null`` sink
+publishes nothing and shows what claiming and deleting costs; ``streams`` and
+``celery`` add the real publishing when Redis is reachable.
+
+    python -m bench.outbox --events 50000 --relays 1 2 4
+    python -m bench.outbox --sink streams --batch-sizes 100 500
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+
+from src.config.database import engine, transaction
+from src.config.redis_client import close_redis, get_redis
+from src.config.settings import settings
+from src.outbox.relay import CelerySink, Sink, StreamSink, relay_once
+
+FILL = text(
+    "INSERT INTO outbox (topic, payload) "
+    "SELECT 'post.created', jsonb_build_object("
+    "'id', g, 'subreddit_id', g % 500, 'user_id', g % 5000) "
+    "FROM generate_series(1, :events) AS g"
+)
+
+
+class NullSink(Sink):
+    async def publish(self, events):
+        pass
+
+
+async def fill(events: int):
+    async with transaction() as session:
+        await session.execute(text("TRUNCATE outbox"))
+        await session.execute(FILL, {"events": events})
+    async with engine.connect() as connection:
+        await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.execute(text("VACUUM ANALYZE outbox"))
+
+
+async def drain(sink: Sink, batch_size: int):
+    while await relay_once(sink, batch_size):
+        pass
+
+
+async def main(args):
+    sink = {
+        "null": NullSink,
+        "streams": lambda: StreamSink(settings.OUTBOX_STREAM_MAXLEN),
+        "celery": CelerySink,
+    }[args.sink]()
+    if args.sink == "streams":
+        await get_redis().delete("events:post.created")
+
+    report = {}
+    for relays in args.relays:
+        for batch_size in args.batch_sizes:
+            await fill(args.events)
+            started = time.perf_counter()
+            await asyncio.gather(*(drain(sink, batch_size) for _ in range(relays)))
+            elapsed = time.perf_counter() - started
+            report[f"relays={relays} batch={batch_size}"] = round(args.events / elapsed)
+
+    await close_redis()
+    await engine.dispose()
+    print(json.dumps({"sink": args.sink, "events_per_second": report}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--relays", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--sink", choices=["null", "streams", "celery"], default="null")
+    args = parser.parse_args()
+    if "bench" not in settings.DB_NAME and "test" not in settings.DB_NAME:
+        sys.exit("DB_NAME must point at a dedicated *bench* or *test* database")
+    command.upgrade(Config("alembic.ini"), "head")
+    asyncio.run(main(args))
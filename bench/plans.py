@@ -0,0 +1,476 @@
+"""Query plan regression check: EXPLAIN every query the API runs.
+
+Rebuilds the migrated schema in a dedicated database (its name must contain
+``bench`` or ``test``), loads the synthetic corpus of bench/dataset.py, then
+calls every route of bench/routes.py once and runs
+``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)`` on each statement it issued,
+inside a transaction that is rolled back.
+
+Each plan is reduced to a fingerprint: the node tree with its relations and
+indexes, without costs, row counts or partition names. ``--check`` exits
+with 1 when a statement seq-scans a table of ``--large-table`` rows or more
+(outside ``ALLOWED_SEQ_SCANS``), when its fingerprint differs from the one
+stored in bench/plans.json, or when it has none stored yet. Plans that
+filter away most of what they read, or sort what an index could return in
+order, yield composite index proposals; ``--migration`` writes them as an
+Alembic revision.
+
+    python -m bench.plans --check
+    python -m bench.plans --reuse --update
+    python -m bench.plans --reuse --migration "composite indexes"
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import sys
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from alembic.util import rev_id
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from bench.dataset import (
+    add_arguments,
+    generate,
+    require_scratch_database,
+    reset_schema,
+)
+from bench.routes import CALLS, Seed
+from src.config.database import engine, replica_engine
+from src.config.settings import settings
+from src.users.auth import create_access_token
+from tests.query_recorder import QueryRecorder, normalize
+
+BASELINE = Path(__file__).with_name("plans.json")
+
+# Routes whose seq scans are expected, with the reason.
+ALLOWED_SEQ_SCANS = {
+    "GET /comments/get_all/": "exports the whole table",
+    "GET /posts/get_all/": "exports the whole table",
+    "GET /subreddit/get_all/": "exports the whole table",
+    "GET /users/get_all/": "exports the whole table",
+    "GET /posts/find/": "substring search, no btree index can serve ILIKE '%..%'",
+    "GET /users/find/": "substring search, no btree index can serve ILIKE '%..%'",
+    "GET /subreddit/find/": "substring search, no btree index can serve ILIKE '%..%'",
+    "GET /posts/lenta/ [hot]": "ranks every post of the window by an expression",
+    "GET /posts/lenta/ [top]": "ranks every post of the followed subreddits",
+    "GET /posts/my_posts": "unpaginated, and user 1 wrote about 15% of the posts",
+    "GET /posts/user_posts/": "unpaginated, and user 1 wrote about 15% of the posts",
+}
+
+PARTITION = re.compile(r"_y\d{4}m\d{2}")
+INDEX_SUFFIX = re.compile(r"_idx\d+$")
+EQUALITY = re.compile(
+    r"\((?:\w+\.)?(\w+) = (?:\$\d+|'[^']*'(?:::[\w ]+)?|-?\d+|true|false)\)"
+)
+ANY = re.compile(r"\((?:\w+\.)?(\w+) = ANY \(")
+SORT_KEY = re.compile(r"^(?:(\w+)\.)?(\w+)(?: DESC| ASC)?(?: NULLS \w+)?$")
+# Nodes that pass their input through in the same order.
+ORDER_PRESERVING = {"Limit", "Append", "Result", "Materialize", "Memoize", "Gather"}
+
+
+def parent_name(name: str) -> str:
+    return INDEX_SUFFIX.sub("_idx", PARTITION.sub("", name))
+
+
+async def pick_seed() -> Seed:
+    """The ids the route calls use: the heaviest user, the busiest thread and
+    one of the subreddits that user created."""
+
+    async def one(query: str) -> int:
+        async with engine.connect() as connection:
+            return (await connection.execute(text(query))).scalar_one()
+
+    post = await one("SELECT id FROM posts ORDER BY comments_count DESC LIMIT 1")
+    comment = await one(
+        f"SELECT id FROM comments WHERE post_id = {post} "
+        "AND parent_comment_id IS NULL ORDER BY id LIMIT 1"
+    )
+    return Seed(
+        user=1,
+        admin=2,
+        other=3,
+        unverified=4,
+        subreddit=await one(
+            "SELECT id FROM subreddits WHERE created_by_id = 1 ORDER BY id LIMIT 1"
+        ),
+        post=post,
+        comment=comment,
+        reply=await one(
+            "SELECT id FROM comments WHERE user_id = 1 "
+            "AND parent_comment_id IS NOT NULL ORDER BY id LIMIT 1"
+        ),
+        voted_post=await one(
+            "SELECT post_id FROM votes WHERE user_id = 1 AND post_id IS NOT NULL "
+            f"AND post_id <> {post} LIMIT 1"
+        ),
+        voted_comment=await one(
+            "SELECT comment_id FROM votes WHERE user_id = 1 "
+            "AND comment_id IS NOT NULL LIMIT 1"
+        ),
+        subscription=await one(
+            "SELECT id FROM subscriptions WHERE user_id = 3 LIMIT 1"
+        ),
+    )
+
+
+def plan_shape(node: dict) -> list[str]:
+    """The plan tree as indented lines, stable across data volumes and months:
+    partitions are named after their parent and repeated siblings under an
+    Append are listed once."""
+    label = node["Node Type"]
+    if node.get("Scan Direction") == "Backward":
+        label += " Backward"
+    if "Join Type" in node:
+        label = f"{node['Join Type']} {label}"
+    if "Relation Name" in node:
+        label += f" on {parent_name(node['Relation Name'])}"
+    if "Index Name" in node:
+        label += f" using {parent_name(node['Index Name'])}"
+    children = [plan_shape(child) for child in node.get("Plans", [])]
+    if node["Node Type"] in ("Append", "Merge Append"):
+        children = [list(c) for c in sorted({tuple(c) for c in children})]
+    return [label, *("  " + line for child in children for line in child)]
+
+
+def fingerprint(shape: list[str]) -> str:
+    return hashlib.sha1("\n".join(shape).encode()).hexdigest()[:12]
+
+
+def walk(node: dict, parents=()):
+    yield node, parents
+    for child in node.get("Plans", []):
+        yield from walk(child, (*parents, node))
+
+
+def seq_scans(plan: dict, table_rows: dict, large_table: int) -> list[str]:
+    """Tables read by a seq scan over a relation of ``large_table`` rows or
+    more; small partitions of a large table don't count."""
+    return sorted(
+        {
+            parent_name(node["Relation Name"])
+            for node, _ in walk(plan)
+            if node["Node Type"] == "Seq Scan"
+            and table_rows.get(node["Relation Name"], 0) >= large_table
+        }
+    )
+
+
+def ordering(parents: tuple, table: str, columns: dict) -> tuple[list[str], int]:
+    """Columns of ``table`` a ``Sort`` above the scan orders by, and how many
+    rows it sorts."""
+    for node in reversed(parents):
+        if node["Node Type"] in ("Sort", "Incremental Sort"):
+            keys = [SORT_KEY.match(key) for key in node["Sort Key"]]
+            if not all(keys) or any(k[2] not in columns[table] for k in keys):
+                return [], 0
+            rows = node["Plans"][0]["Actual Rows"] * node["Plans"][0]["Actual Loops"]
+            return [k[2] for k in keys], rows
+        if node["Node Type"] not in ORDER_PRESERVING:
+            break
+    return [], 0
+
+
+def propose_indexes(
+    plan: dict, columns: dict, indexes: dict, min_rows: int
+) -> set[tuple[str, tuple[str, ...]]]:
+    """Composite indexes that would let a scan read only the rows it keeps:
+    the columns it compares with ``=`` first, then the ones it is sorted by."""
+    proposals = set()
+    for node, parents in walk(plan):
+        if "Relation Name" not in node:
+            continue
+        table = parent_name(node["Relation Name"])
+        conditions = " ".join(
+            node.get(key, "") for key in ("Index Cond", "Recheck Cond", "Filter")
+        )
+        equal = list(dict.fromkeys(EQUALITY.findall(conditions)))
+        listed = ANY.findall(conditions)
+        loops = node.get("Actual Loops", 1)
+        removed = node.get("Rows Removed by Filter", 0) * loops
+        kept = node.get("Actual Rows", 0) * loops
+
+        order, sorted_rows = ordering(parents, table, columns)
+        if not order and "Index Name" in node and not node.get("Index Cond"):
+            # The index only provides the order; the filter does the work.
+            order = indexes.get(node["Index Name"], (table, []))[1]
+
+        if equal and not listed and sorted_rows >= min_rows:
+            candidate = [*equal, *order]
+        elif removed >= min_rows and removed > 10 * kept and (equal or listed):
+            candidate = [*equal, *listed, *order]
+        else:
+            continue
+        candidate = tuple(dict.fromkeys(candidate))
+        covered = any(
+            indexed == table and tuple(existing[: len(candidate)]) == candidate
+            for indexed, existing in indexes.values()
+        )
+        if not covered:
+            proposals.add((table, candidate))
+    return proposals
+
+
+async def catalog() -> tuple[dict, dict, dict]:
+    """Row counts per relation, and columns per table and per index with
+    partitions folded into their parent."""
+    async with engine.connect() as connection:
+        rows = await connection.execute(
+            text(
+                "SELECT relname, reltuples FROM pg_class "
+                "WHERE relnamespace = 'public'::regnamespace AND relkind = 'r'"
+            )
+        )
+        table_rows = {name: max(int(count), 0) for name, count in rows}
+
+        rows = await connection.execute(
+            text(
+                "SELECT table_name, column_name FROM information_schema.columns "
+                "WHERE table_schema = 'public'"
+            )
+        )
+        columns = defaultdict(set)
+        for table, column in rows:
+            columns[parent_name(table)].add(column)
+
+        rows = await connection.execute(
+            text(
+                "SELECT t.relname, ic.relname, "
+                "array_agg(a.attname ORDER BY k.ord) "
+                "FROM pg_index i "
+                "JOIN pg_class t ON t.oid = i.indrelid "
+                "JOIN pg_class ic ON ic.oid = i.indexrelid "
+                "CROSS JOIN unnest(i.indkey) WITH ORDINALITY k(attnum, ord) "
+                "JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum "
+                "WHERE t.relnamespace = 'public'::regnamespace "
+                "GROUP BY t.relname, ic.relname"
+            )
+        )
+        indexes = {index: (parent_name(table), cols) for table, index, cols in rows}
+    return table_rows, columns, indexes
+
+
+async def explain(statement: str, parameters) -> dict:
+    """``EXPLAIN ANALYZE`` of one recorded statement; whatever it changes is
+    rolled back."""
+    async with engine.connect() as connection:
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters
+        )
+        plan = result.scalar_one()
+        await connection.rollback()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def ordered_calls() -> dict:
+    """Deletes last, so no call removes what a later one needs, and the
+    code is verified before resend-code replaces it."""
+    return dict(
+        sorted(
+            CALLS.items(),
+            key=lambda item: (
+                item[0].startswith("DELETE"),
+                item[0] == "POST /users/resend-code/",
+                item[0],
+            ),
+        )
+    )
+
+
+async def record_routes(seed: Seed) -> dict[str, dict]:
+    """Call every route once; returns the statements each one ran, keyed by
+    their normalized SQL, with the parameters of their first run."""
+    from src.main import app
+    from src.tasks.send_email import send_verification_email
+
+    send_verification_email.apply_async = lambda *args, **kwargs: None
+    recorder = QueryRecorder(engine, replica_engine)
+    recorder.install()
+    recorded = {}
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for route, make_call in ordered_calls().items():
+            call = make_call(seed)
+            client.cookies.clear()
+            if call.as_user:
+                token = create_access_token({"sub": str(getattr(seed, call.as_user))})
+                client.cookies.set("users_access_token", token)
+            overridden = {name: getattr(settings, name) for name in call.settings}
+            for name, value in call.settings.items():
+                setattr(settings, name, value)
+            with recorder.record() as queries:
+                response = await client.request(
+                    route.split(" ", 1)[0],
+                    f"{settings.API_V1_STR}{call.url}",
+                    json=call.json,
+                    params=call.params,
+                    data=call.data,
+                )
+            for name, value in overridden.items():
+                setattr(settings, name, value)
+            if response.status_code >= 400:
+                print(f"{route}: {response.status_code}", file=sys.stderr)
+            statements = recorded[route] = {}
+            for statement, parameters in zip(
+                queries.statements, queries.parameters, strict=True
+            ):
+                if statement.lstrip().upper().startswith("INSERT"):
+                    continue
+                statements.setdefault(normalize(statement), (statement, parameters))
+    recorder.remove()
+    return recorded
+
+
+async def analyze(args) -> tuple[dict, dict]:
+    table_rows, columns, indexes = await catalog()
+    recorded = await record_routes(await pick_seed())
+    report, proposals = {}, defaultdict(set)
+    for route, statements in recorded.items():
+        report[route] = {}
+        for sql, (statement, parameters) in statements.items():
+            try:
+                plan = await explain(statement, parameters)
+            except DBAPIError as err:
+                report[route][sql] = {"error": str(err.orig).splitlines()[0]}
+                continue
+            shape = plan_shape(plan)
+            report[route][sql] = {
+                "fingerprint": fingerprint(shape),
+                "plan": shape,
+                "seq_scans": seq_scans(plan, table_rows, args.large_table),
+            }
+            for proposal in propose_indexes(plan, columns, indexes, args.min_rows):
+                proposals[proposal].add(route)
+    return report, proposals
+
+
+def problems(report: dict, baseline: dict) -> list[str]:
+    found = []
+    for route, statements in report.items():
+        for sql, result in statements.items():
+            if "error" in result:
+                continue
+            if result["seq_scans"] and route not in ALLOWED_SEQ_SCANS:
+                found.append(
+                    f"{route}: seq scan on {', '.join(result['seq_scans'])}\n    {sql}"
+                )
+            known = baseline.get(route, {}).get(sql)
+            if known is None:
+                found.append(f"{route}: no stored plan for\n    {sql}")
+            elif known["fingerprint"] != result["fingerprint"]:
+                before = "\n      ".join(known["plan"])
+                after = "\n      ".join(result["plan"])
+                found.append(
+                    f"{route}: plan changed for\n    {sql}\n"
+                    f"    was:\n      {before}\n    now:\n      {after}"
+                )
+    return found
+
+
+MIGRATION = '''"""{message}
+
+Revision ID: {revision}
+Revises: {down_revision}
+Create Date: {date}
+
+Proposed by bench/plans.py for:
+{reasons}
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "{revision}"
+down_revision: Union[str, None] = "{down_revision}"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+{upgrade}
+
+
+def downgrade() -> None:
+{downgrade}
+'''
+
+
+def write_migration(message: str, proposals: dict) -> Path:
+    script = ScriptDirectory.from_config(Config("alembic.ini"))
+    revision, upgrade, downgrade, reasons = rev_id(), [], [], []
+    for (table, index_columns), routes in sorted(proposals.items()):
+        name = f"ix_{table}_{'_'.join(index_columns)}"
+        upgrade.append(
+            f'    op.create_index("{name}", "{table}", {json.dumps(index_columns)})'
+        )
+        downgrade.insert(0, f'    op.drop_index("{name}", table_name="{table}")')
+        reasons.append(f"{name}: {', '.join(sorted(routes))}")
+    slug = re.sub(r"\W+", "_", message.lower())
+    path = Path(script.versions) / f"{revision}_{slug}.py"
+    path.write_text(
+        MIGRATION.format(
+            message=message,
+            revision=revision,
+            down_revision=script.get_current_head(),
+            date=datetime.now(),
+            reasons="\n".join(reasons),
+            upgrade="\n".join(upgrade),
+            downgrade="\n".join(downgrade),
+        )
+    )
+    return path
+
+
+async def main(args):
+    if not args.reuse:
+        await generate(args)
+    report, proposals = await analyze(args)
+    await engine.dispose()
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    found = problems(report, baseline)
+    summary = {
+        "statements": sum(len(statements) for statements in report.values()),
+        "problems": found,
+        "proposed_indexes": {
+            f"{table}({', '.join(cols)})": sorted(routes)
+            for (table, cols), routes in sorted(proposals.items())
+        },
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.update:
+        BASELINE.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+    if args.migration and proposals:
+        print(f"wrote {write_migration(args.migration, proposals)}", file=sys.stderr)
+    if args.check and found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--update", action="store_true", help="store the plans")
+    parser.add_argument("--migration", metavar="MESSAGE")
+    parser.add_argument("--reuse", action="store_true", help="skip reset and seed")
+    parser.add_argument("--large-table", type=int, default=10000)
+    parser.add_argument("--min-rows", type=int, default=1000)
+    add_arguments(parser)
+    args = parser.parse_args()
+    require_scratch_database()
+    if not args.reuse:
+        asyncio.run(reset_schema())
+        command.upgrade(Config("alembic.ini"), "head")
+    asyncio.run(main(args))
@@ -0,0 +1,258 @@
+"""Every API route: how to call it against the fixture rows and how many
+SQL statements it may run. Routes whose parameters pick another query get
+one entry per variant, as ``"<route> [<variant>]"``.
+
+tests/test_query_budgets.py holds each route to its budget;
+bench/plans.py makes the same calls to EXPLAIN what they run.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+@dataclass
+class Seed:
+    user: int
+    admin: int
+    other: int
+    unverified: int
+    subreddit: int
+    post: int
+    comment: int
+    reply: int
+    voted_post: int
+    voted_comment: int
+    subscription: int
+
+
+# Maximum number of SQL statements per request, including the one spent by the
+# auth dependency. Raising a budget should come with a reason in the review.
+# Writes to posts, comments, votes and subscriptions spend one INSERT on the
+# outbox (src/outbox), votes one on the per-voter advisory lock.
+QUERY_BUDGETS = {
+    "POST /comments/create/": 4,
+    "POST /comments/reply_to_comment/{comment_id}": 6,
+    "GET /comments/get_all/": 2,
+    "PUT /comments/{comment_id}": 3,
+    "DELETE /comments/delete/{comment_id}": 6,
+    "POST /comments/upvote/{comment_id}": 6,
+    "POST /comments/delete_upvote/{comment_id}": 5,
+    "GET /comments/comments/by_post/{post_id}": 4,
+    "GET /comments/{comment_id}": 1,
+    "GET /monitoring/slow-queries/": 1,
+    "GET /notifications/": 2,
+    "GET /notifications/unread-count/": 2,
+    "POST /notifications/read/": 2,
+    "POST /posts/create/": 3,
+    "GET /posts/get_all/": 2,
+    "GET /posts/find/": 2,
+    "PUT /posts/update/{post_id}": 3,
+    "DELETE /posts/delete/{post_id}": 3,
+    "POST /posts/upvote/{post_id}": 6,
+    "POST /posts/delete_upvote/{post_id}": 5,
+    "GET /posts/lenta/": 5,
+    "GET /posts/lenta/ [hot]": 4,
+    "GET /posts/lenta/ [top]": 5,
+    "GET /posts/lenta/new/": 4,
+    "GET /posts/my_posts": 4,
+    "GET /posts/{post_id}": 1,
+    "GET /posts/{post_id}/live": 1,
+    "GET /posts/user_posts/": 3,
+    "GET /posts/votes/by-user": 3,
+    "GET /posts/by-subreddit/{subreddit_id}": 1,
+    "POST /subreddit/create/": 2,
+    "GET /subreddit/get_all/": 2,
+    "GET /subreddit/find/": 1,
+    "PUT /subreddit/{subreddit_id}": 3,
+    "DELETE /subreddit/{subreddit_id}": 3,
+    "POST /subreddit/create_subscribe/{subreddit_id}": 4,
+    "GET /subreddit/get_all_subscriptions/": 2,
+    "DELETE /subreddit/delete_subscription/{subscription_id}": 5,
+    "POST /subreddit/subscriptions/bulk/": 5,
+    "GET /subreddit/{subreddit_id}": 1,
+    "GET /subreddit/my-subreddits/": 2,
+    "POST /users/register/": 2,
+    "POST /users/login/": 1,
+    "POST /users/logout/": 0,
+    "POST /users/verify-email/": 2,
+    "POST /users/resend-code/": 2,
+    "GET /users/get_all/": 2,
+    "GET /users/find/": 1,
+    "GET /users/me/": 1,
+    "PUT /users/role_update/": 2,
+    "DELETE /users/delete/": 2,
+    "DELETE /users/delete_by_id/{user_id}": 3,
+    "PUT /users/update_user/": 2,
+    "POST /users/refresh-token/": 1,
+    "GET /users/avatar/{user_id}": 0,
+}
+
+
+@dataclass
+class Call:
+    url: str
+    as_user: str | None = "user"
+    json: dict | None = None
+    params: dict = field(default_factory=dict)
+    data: dict | None = None
+    # Settings overridden for the call.
+    settings: dict = field(default_factory=dict)
+
+
+def refresh_token(user_id: int) -> str:
+    from src.users.auth import create_refresh_token
+
+    return create_refresh_token({"sub": str(user_id)})
+
+
+CALLS: dict[str, Callable[..., Call]] = {
+    "POST /comments/create/": lambda s: Call(
+        "/comments/create/", json={"post_id": s.post, "content": "new"}
+    ),
+    "POST /comments/reply_to_comment/{comment_id}": lambda s: Call(
+        f"/comments/reply_to_comment/{s.comment}",
+        json={"post_id": s.post, "content": "reply"},
+    ),
+    "GET /comments/get_all/": lambda s: Call("/comments/get_all/", as_user="admin"),
+    "PUT /comments/{comment_id}": lambda s: Call(
+        f"/comments/{s.reply}", json={"content": "edited"}
+    ),
+    "DELETE /comments/delete/{comment_id}": lambda s: Call(
+        f"/comments/delete/{s.reply}"
+    ),
+    "POST /comments/upvote/{comment_id}": lambda s: Call(
+        f"/comments/upvote/{s.comment}", params={"is_upvote": True}
+    ),
+    "POST /comments/delete_upvote/{comment_id}": lambda s: Call(
+        f"/comments/delete_upvote/{s.voted_comment}"
+    ),
+    "GET /comments/comments/by_post/{post_id}": lambda s: Call(
+        f"/comments/comments/by_post/{s.post}"
+    ),
+    "GET /comments/{comment_id}": lambda s: Call(
+        f"/comments/{s.comment}", as_user=None
+    ),
+    "GET /monitoring/slow-queries/": lambda s: Call(
+        "/monitoring/slow-queries/", as_user="admin"
+    ),
+    "GET /notifications/": lambda s: Call("/notifications/"),
+    "GET /notifications/unread-count/": lambda s: Call("/notifications/unread-count/"),
+    "POST /notifications/read/": lambda s: Call("/notifications/read/", json={}),
+    "POST /posts/create/": lambda s: Call(
+        "/posts/create/",
+        data={"subreddit_id": s.subreddit, "title": "new", "content": "body"},
+    ),
+    "GET /posts/get_all/": lambda s: Call("/posts/get_all/", as_user="admin"),
+    "GET /posts/find/": lambda s: Call(
+        "/posts/find/", as_user=None, params={"search": "post"}
+    ),
+    "PUT /posts/update/{post_id}": lambda s: Call(
+        f"/posts/update/{s.post}",
+        json={"title": "edited", "content": "body", "subreddit_id": s.subreddit},
+    ),
+    "DELETE /posts/delete/{post_id}": lambda s: Call(f"/posts/delete/{s.post}"),
+    "POST /posts/upvote/{post_id}": lambda s: Call(
+        f"/posts/upvote/{s.post}", params={"is_upvote": True}
+    ),
+    "POST /posts/delete_upvote/{post_id}": lambda s: Call(
+        f"/posts/delete_upvote/{s.voted_post}"
+    ),
+    "GET /posts/lenta/": lambda s: Call("/posts/lenta/", params={"sort_by": "new"}),
+    "GET /posts/lenta/ [hot]": lambda s: Call(
+        "/posts/lenta/", params={"sort_by": "hot"}
+    ),
+    "GET /posts/lenta/ [top]": lambda s: Call(
+        "/posts/lenta/", params={"sort_by": "top"}
+    ),
+    "GET /posts/lenta/new/": lambda s: Call("/posts/lenta/new/"),
+    "GET /posts/my_posts": lambda s: Call("/posts/my_posts"),
+    "GET /posts/{post_id}": lambda s: Call(f"/posts/{s.post}", as_user=None),
+    # Ends the stream right after the snapshot.
+    "GET /posts/{post_id}/live": lambda s: Call(
+        f"/posts/{s.post}/live", as_user=None, settings={"LIVE_CONNECTION_SECONDS": 0}
+    ),
+    "GET /posts/user_posts/": lambda s: Call(
+        "/posts/user_posts/", as_user=None, params={"user_id": s.user}
+    ),
+    "GET /posts/votes/by-user": lambda s: Call(
+        "/posts/votes/by-user", params={"ids": f"{s.post},{s.voted_post}"}
+    ),
+    "GET /posts/by-subreddit/{subreddit_id}": lambda s: Call(
+        f"/posts/by-subreddit/{s.subreddit}", as_user=None
+    ),
+    "POST /subreddit/create/": lambda s: Call(
+        "/subreddit/create/", json={"name": "golang", "description": "gophers"}
+    ),
+    "GET /subreddit/get_all/": lambda s: Call("/subreddit/get_all/", as_user="admin"),
+    "GET /subreddit/find/": lambda s: Call(
+        "/subreddit/find/", as_user=None, params={"name": "py"}
+    ),
+    "PUT /subreddit/{subreddit_id}": lambda s: Call(
+        f"/subreddit/{s.subreddit}", json={"description": "still snakes"}
+    ),
+    "DELETE /subreddit/{subreddit_id}": lambda s: Call(f"/subreddit/{s.subreddit}"),
+    "POST /subreddit/create_subscribe/{subreddit_id}": lambda s: Call(
+        f"/subreddit/create_subscribe/{s.subreddit}", as_user="admin"
+    ),
+    "GET /subreddit/get_all_subscriptions/": lambda s: Call(
+        "/subreddit/get_all_subscriptions/"
+    ),
+    "DELETE /subreddit/delete_subscription/{subscription_id}": lambda s: Call(
+        f"/subreddit/delete_subscription/{s.subscription}", as_user="other"
+    ),
+    "POST /subreddit/subscriptions/bulk/": lambda s: Call(
+        "/subreddit/subscriptions/bulk/",
+        as_user="admin",
+        json={"subscribe": [s.subreddit], "unsubscribe": [s.subreddit + 1]},
+    ),
+    "GET /subreddit/{subreddit_id}": lambda s: Call(
+        f"/subreddit/{s.subreddit}", as_user=None
+    ),
+    "GET /subreddit/my-subreddits/": lambda s: Call("/subreddit/my-subreddits/"),
+    "POST /users/register/": lambda s: Call(
+        "/users/register/",
+        as_user=None,
+        json={
+            "username": "newbie",
+            "email": "newbie@example.com",
+            "date_of_birth": "2000-01-01",
+            "gender": "other",
+            "password": "password123",
+        },
+    ),
+    "POST /users/login/": lambda s: Call(
+        "/users/login/",
+        as_user=None,
+        json={"email": "user@example.com", "password": "password123"},
+    ),
+    "POST /users/logout/": lambda s: Call("/users/logout/"),
+    "POST /users/verify-email/": lambda s: Call(
+        "/users/verify-email/", as_user="unverified", json={"code": "123456"}
+    ),
+    "POST /users/resend-code/": lambda s: Call(
+        "/users/resend-code/", as_user="unverified"
+    ),
+    "GET /users/get_all/": lambda s: Call("/users/get_all/", as_user="admin"),
+    "GET /users/find/": lambda s: Call(
+        "/users/find/", as_user=None, params={"username": "user"}
+    ),
+    "GET /users/me/": lambda s: Call("/users/me/"),
+    "PUT /users/role_update/": lambda s: Call(
+        "/users/role_update/", as_user="admin", json={"user_id": s.other, "role_id": 2}
+    ),
+    "DELETE /users/delete/": lambda s: Call("/users/delete/"),
+    "DELETE /users/delete_by_id/{user_id}": lambda s: Call(
+        f"/users/delete_by_id/{s.other}", as_user="admin"
+    ),
+    "PUT /users/update_user/": lambda s: Call(
+        "/users/update_user/", json={"nickname": "nick"}
+    ),
+    "POST /users/refresh-token/": lambda s: Call(
+        "/users/refresh-token/",
+        as_user=None,
+        json={"refresh_token": refresh_token(s.user)},
+    ),
+    "GET /users/avatar/{user_id}": lambda s: Call(
+        f"/users/avatar/{s.user}", as_user=None
+    ),
+}
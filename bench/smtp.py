@@ -0,0 +1,120 @@
+"""SMTP throughput: a connection per email vs the pool of src/tasks/mailer.py.
+
+Sends ``--messages`` emails ``--runs`` times with each strategy and prints
+messages/sec:
+
+- ``per_message``: connect, EHLO, (STARTTLS, AUTH,) send and QUIT for every
+  email, as ``send_verification_email`` used to;
+- ``pool``: ``SMTPPool.send`` per email, one task after another;
+- ``send_many``: ``SMTPPool.send_many`` over the whole list, like
+  ``send_emails``.
+
+Starts an in-process aiosmtpd server that discards the mail when aiosmtpd is
+installed and no ``--host`` is given; the numbers then show the protocol
+overhead only. Point it at a real relay to see what TLS and the network add.
+
+    python -m bench.smtp --messages 500
+    python -m bench.smtp --host localhost --port 1025 --no-starttls
+"""
+
+import argparse
+import json
+import smtplib
+import socket
+import time
+from email.message import EmailMessage
+
+from src.tasks.mailer import SMTPPool
+
+
+class Discard:
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+def message(i: int) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = "Подтверждение регистрации"
+    msg["From"] = "bench@example.com"
+    msg["To"] = f"user{i}@example.com"
+    msg.set_content(f"Ваш код подтверждения: {i:06d}")
+    return msg
+
+
+def per_message(args, messages: list[EmailMessage]):
+    for msg in messages:
+        with smtplib.SMTP(args.host, args.port, timeout=10) as server:
+            if args.starttls:
+                server.starttls()
+            if args.password:
+                server.login(args.username, args.password)
+            server.send_message(msg)
+
+
+def pooled(pool: SMTPPool, messages: list[EmailMessage]):
+    for msg in messages:
+        pool.send(msg)
+
+
+def batched(pool: SMTPPool, messages: list[EmailMessage]):
+    if errors := pool.send_many(messages):
+        raise next(iter(errors.values()))
+
+
+def rate(call, count: int, runs: int) -> float:
+    best = 0.0
+    for _ in range(runs):
+        started = time.perf_counter()
+        call()
+        best = max(best, count / (time.perf_counter() - started))
+    return round(best, 1)
+
+
+def main(args):
+    messages = [message(i) for i in range(args.messages)]
+    pool = SMTPPool(
+        args.host,
+        args.port,
+        args.username,
+        args.password,
+        starttls=args.starttls,
+        max_messages=args.max_messages,
+    )
+    report = {
+        "per_message": rate(
+            lambda: per_message(args, messages), len(messages), args.runs
+        ),
+        "pool": rate(lambda: pooled(pool, messages), len(messages), args.runs),
+        "send_many": rate(lambda: batched(pool, messages), len(messages), args.runs),
+    }
+    pool.close()
+    print(json.dumps({"messages_per_second": report}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--no-starttls", dest="starttls", action="store_false")
+    parser.add_argument("--max-messages", type=int, default=100)
+    args = parser.parse_args()
+
+    controller = None
+    if args.host is None:
+        from aiosmtpd.controller import Controller
+
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            args.port = sock.getsockname()[1]
+        args.host, args.starttls = "localhost", False
+        controller = Controller(Discard(), hostname=args.host, port=args.port)
+        controller.start()
+    try:
+        main(args)
+    finally:
+        if controller is not None:
+            controller.stop()
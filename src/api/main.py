@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 
+from src.monitoring import router as router_monitoring
+from src.notifications import router as router_notifications
 from src.posts import router_comment, router_post, router_subreddit
 from src.users import router
 
@@ -9,3 +11,5 @@ api_router.include_router(router_comment.router)
 api_router.include_router(router_post.router)
 api_router.include_router(router_subreddit.router)
 api_router.include_router(router.router)
+api_router.include_router(router_notifications.router)
+api_router.include_router(router_monitoring.admin_router)
@@ -1,6 +1,6 @@
 from celery import Celery
 
-from src.config.settings import get_redis_url
+from src.config.settings import get_redis_url, settings
 
 redis_url = get_redis_url()
 
@@ -12,4 +12,30 @@ celery_app = Celery(
 )
 
 celery_app.conf.timezone = "UTC"
-celery_app.autodiscover_tasks(['src.tasks', 'src.tasks.hi', 'src.tasks.send_email'])
+celery_app.conf.beat_schedule = {
+    "collect-media-garbage": {
+        "task": "src.tasks.media_gc.collect_media_garbage",
+        "schedule": 60 * 60,
+    },
+    "reconcile-counters": {
+        "task": "src.tasks.counters.reconcile_counters",
+        "schedule": 6 * 60 * 60,
+    },
+    "create-partitions": {
+        "task": "src.tasks.partitions.create_partitions",
+        "schedule": 24 * 60 * 60,
+    },
+    "archive-old-posts": {
+        "task": "src.tasks.archive.archive_old_posts",
+        "schedule": 24 * 60 * 60,
+    },
+    "send-notification-digests": {
+        "task": "src.tasks.notifications.send_notification_digests",
+        "schedule": settings.NOTIFICATIONS_DIGEST_MINUTES * 60,
+    },
+}
+celery_app.autodiscover_tasks(
+    ['src.tasks', 'src.tasks.hi', 'src.tasks.send_email', 'src.tasks.media_gc',
+     'src.tasks.counters', 'src.tasks.partitions', 'src.tasks.archive',
+     'src.tasks.notifications']
+)
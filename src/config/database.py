@@ -1,25 +1,169 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Annotated
+from typing import Annotated, AsyncIterator, Awaitable, Callable
+from uuid import uuid4
 
-from sqlalchemy import func
+from sqlalchemy import CTE, Select, func, text
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.orm import DeclarativeBase, Mapped, declared_attr, mapped_column
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    Session,
+    declared_attr,
+    mapped_column,
+)
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.dml import UpdateBase
+
+from src.config.settings import (
+    get_db_replica_url,
+    get_db_url,
+    get_replica_settings,
+    settings,
+)
+from src.monitoring.metrics import InstrumentedPool, instrument_engine
+from src.monitoring.slow_queries import slow_query_log
+from src.monitoring.timing import instrument_timing
 
-from src.config.settings import get_db_url
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = get_db_url()
+REPLICA_URL = get_db_replica_url()
+replica_settings = get_replica_settings()
+
+
+def engine_options(name: str) -> dict:
+    """asyncpg prepares every statement and caches it per connection. Behind
+    PgBouncer in transaction mode consecutive statements may land on
+    different server connections, so ``DB_PGBOUNCER`` turns the cache off,
+    makes statement names unique and leaves pooling to PgBouncer."""
+    options = {"query_cache_size": settings.DB_COMPILED_CACHE_SIZE}
+    if settings.DB_PGBOUNCER:
+        options["poolclass"] = NullPool
+        options["connect_args"] = {
+            "prepared_statement_cache_size": 0,
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+        return options
+    options["connect_args"] = {
+        "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+    }
+    if settings.METRICS_ENABLED:
+        options.update(poolclass=InstrumentedPool, pool_logging_name=name)
+    return options
+
+
+def make_engine(url: str, name: str):
+    new_engine = create_async_engine(url, **engine_options(name))
+    if settings.METRICS_ENABLED:
+        instrument_engine(new_engine, name)
+    instrument_timing(new_engine)
+    if settings.SLOW_QUERY_THRESHOLD_MS is not None:
+        slow_query_log.install(new_engine)
+    return new_engine
+
+
+engine = make_engine(DATABASE_URL, "primary")
+replica_engine = make_engine(REPLICA_URL, "replica") if REPLICA_URL else None
+
+# Set by UnitOfWorkMiddleware for GET and HEAD requests: only their reads may
+# go to the replica. Writes, background tasks and scripts read the primary.
+read_from_replica: ContextVar[bool] = ContextVar("read_from_replica", default=False)
+# Set for reads that must see the latest writes even inside such a request,
+# e.g. a cache refill.
+read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+
+class ReplicaState:
+    healthy = False
+    lag: float | None = None
+
+
+replica_state = ReplicaState()
+
+
+def writes(clause: Select) -> bool:
+    """Whether ``clause`` runs an INSERT, UPDATE or DELETE in a CTE."""
+    return any(
+        isinstance(element, CTE) and isinstance(element.element, UpdateBase)
+        for element in visitors.iterate(clause)
+    )
+
+
+class RoutingSession(Session):
+    """Sends the plain SELECTs of read-only requests to the replica and
+    everything else to the primary.
+
+    Once a session has written, it stays on the primary so the rest of the
+    request reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if replica_engine is None:
+            return engine.sync_engine
+        if not isinstance(clause, Select) or self._flushing:
+            self.info["wrote"] = True
+            return engine.sync_engine
+        if (
+            read_from_replica.get()
+            and not read_from_primary.get()
+            and replica_state.healthy
+            and clause._for_update_arg is None
+            and not self.info.get("wrote")
+        ):
+            if not writes(clause):
+                return replica_engine.sync_engine
+            self.info["wrote"] = True
+        return engine.sync_engine
+
+
+async_session_maker = async_sessionmaker(
+    sync_session_class=RoutingSession, expire_on_commit=False
+)
+
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
 
 
-engine = create_async_engine(DATABASE_URL)
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+async def monitor_replica_lag():
+    """Keep ``replica_state`` current; reads fall back to the primary when the
+    replica lags more than ``DB_REPLICA_MAX_LAG_SECONDS`` or is unreachable."""
+    if replica_engine is None:
+        return
+    while True:
+        try:
+            async with replica_engine.connect() as connection:
+                lag = (await connection.execute(REPLICA_LAG_QUERY)).scalar()
+            replica_state.lag = float(lag or 0)
+            replica_state.healthy = (
+                replica_state.lag <= replica_settings["max_lag_seconds"]
+            )
+        except Exception:
+            logger.warning("Replica lag check failed", exc_info=True)
+            replica_state.lag = None
+            replica_state.healthy = False
+        await asyncio.sleep(replica_settings["lag_check_seconds"])
+
 
 int_pk = Annotated[int, mapped_column(primary_key=True)]
 created_at = Annotated[datetime, mapped_column(server_default=func.now(), index=True)]
+# created_at of the tables partitioned by it (src/config/partitions.py): the
+# partition key has to be part of the primary key.
+partition_key = Annotated[
+    datetime, mapped_column(server_default=func.now(), index=True, primary_key=True)
+]
 updated_at = Annotated[
     datetime,
     mapped_column(server_default=func.now(), onupdate=datetime.now, index=True),
@@ -37,6 +181,62 @@ class Base(AsyncAttrs, DeclarativeBase):
     updated_at: Mapped[updated_at]
 
 
-async def get_async_session() -> AsyncSession:
+# Set by UnitOfWorkMiddleware: every DAO call made while handling a request
+# shares this session, i.e. one connection and one transaction per request.
+current_session: ContextVar[AsyncSession | None] = ContextVar(
+    "current_session", default=None
+)
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable]):
+    """Await ``callback()`` once the session's transaction has committed, e.g.
+    to update a cache; it is dropped if the transaction rolls back."""
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+async def finish_session(session: AsyncSession):
+    transaction = session.sync_session.get_transaction()
+    callbacks = session.info.pop("after_commit", [])
+    if transaction is None:
+        return
+    if not transaction.is_active:
+        await session.rollback()
+        return
+    await session.commit()
+    for callback in callbacks:
+        # The data is committed; a failing follow-up must not fail the request.
+        try:
+            await callback()
+        except Exception:
+            logger.exception("after_commit callback failed")
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    session = current_session.get()
+    if session is not None:
+        yield session
+        return
     async with async_session_maker() as session:
         yield session
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[AsyncSession]:
+    """Write scope: joins the request transaction or commits on its own."""
+    session = current_session.get()
+    if session is not None:
+        yield session
+        return
+    async with async_session_maker() as session:
+        try:
+            yield session
+        except BaseException:
+            await session.rollback()
+            raise
+        await finish_session(session)
+
+
+async def get_async_session() -> AsyncSession:
+    async with session_scope() as session:
+        yield session
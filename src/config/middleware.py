@@ -0,0 +1,154 @@
+import json
+import logging
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config.database import (
+    async_session_maker,
+    current_session,
+    engine,
+    finish_session,
+    read_from_replica,
+    replica_engine,
+    replica_settings,
+)
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "db_primary"
+SAFE_METHODS = ("GET", "HEAD")
+
+
+@dataclass
+class RequestDbStats:
+    checkouts: int = 0
+
+
+request_db_stats: ContextVar[RequestDbStats | None] = ContextVar(
+    "request_db_stats", default=None
+)
+
+
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    stats = request_db_stats.get()
+    if stats is not None:
+        stats.checkouts += 1
+
+
+def count_checkouts(target: AsyncEngine):
+    """Count ``target``'s pool checkouts in ``X-DB-Checkouts``."""
+    event.listen(target.sync_engine, "checkout", count_checkout)
+
+
+count_checkouts(engine)
+if replica_engine is not None:
+    count_checkouts(replica_engine)
+
+
+class UnitOfWorkMiddleware:
+    """One session, one connection and one transaction per HTTP request.
+
+    The session is committed (or rolled back for error statuses and failed
+    flushes) right before the response starts, so a failed commit still turns
+    into a 500 instead of a silently lost write. Pool checkouts made while
+    handling the request are reported in ``X-DB-Checkouts``.
+
+    With a replica configured, GET and HEAD requests read from it. A request
+    that wrote sets a short-lived cookie that pins the client's following
+    requests to the primary, so users read their own writes while the
+    replica catches up.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestDbStats()
+        failed = False
+        started = False
+        # Only reads may see a lagging replica: a write request reads the
+        # rows it is about to change from the primary.
+        replica_reads = (
+            replica_engine is not None
+            and scope["method"] in SAFE_METHODS
+            and STICKY_COOKIE not in HTTPConnection(scope).cookies
+        )
+
+        async with async_session_maker() as session:
+            session_token = current_session.set(session)
+            stats_token = request_db_stats.set(stats)
+            replica_token = read_from_replica.set(replica_reads)
+
+            async def send_wrapper(message: Message):
+                nonlocal failed, started
+                if failed:
+                    return
+                if message["type"] == "http.response.start" and not started:
+                    started = True
+                    try:
+                        if message["status"] < 400:
+                            await finish_session(session)
+                        else:
+                            await session.rollback()
+                    except SQLAlchemyError:
+                        logger.exception("Request transaction failed to commit")
+                        failed = True
+                        await self._send_error(send, stats)
+                        return
+                    headers = [
+                        *message.get("headers", []),
+                        (b"x-db-checkouts", str(stats.checkouts).encode()),
+                    ]
+                    if replica_engine is not None and session.info.get("wrote"):
+                        headers.append((b"set-cookie", self._sticky_cookie()))
+                    message["headers"] = headers
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+                await finish_session(session)
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                current_session.reset(session_token)
+                request_db_stats.reset(stats_token)
+                read_from_replica.reset(replica_token)
+                logger.debug(
+                    "%s %s: %d db checkouts",
+                    scope["method"],
+                    scope["path"],
+                    stats.checkouts,
+                )
+
+    @staticmethod
+    def _sticky_cookie() -> bytes:
+        max_age = replica_settings["sticky_seconds"]
+        return (
+            f"{STICKY_COOKIE}=1; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+        ).encode()
+
+    @staticmethod
+    async def _send_error(send: Send, stats: RequestDbStats):
+        body = json.dumps({"detail": "Internal Server Error"}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 500,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-db-checkouts", str(stats.checkouts).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
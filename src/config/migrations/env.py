@@ -1,4 +1,5 @@
 import asyncio
+import re
 import sys
 from logging.config import fileConfig
 from os.path import abspath, dirname
@@ -9,10 +10,25 @@ from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from src.config.database import DATABASE_URL, Base
+from src.media.models import MediaBlob
+from src.notifications.models import Notification
+from src.outbox.models import OutboxEvent
 from src.posts.models import Comment, Post, Subreddit, Subscription, Vote
 from src.users.models import Role, SocialLink, User
 
-_ = User, Role, SocialLink, Post, Comment, Subreddit, Subscription, Vote
+_ = (
+    User,
+    Role,
+    SocialLink,
+    Post,
+    Comment,
+    Subreddit,
+    Subscription,
+    Vote,
+    MediaBlob,
+    OutboxEvent,
+    Notification,
+)
 
 sys.path.insert(0, dirname(dirname(abspath(__file__))))
 
@@ -32,6 +48,15 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+# Monthly partitions (src/config/partitions.py) are created at runtime, not
+# from the models; autogenerate must not try to drop them.
+PARTITION_NAME = re.compile(r"^\w+_y\d{4}m\d{2}$")
+
+
+def include_name(name, type_, parent_names):
+    return not (type_ == "table" and PARTITION_NAME.match(name))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -54,6 +79,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -63,7 +89,11 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
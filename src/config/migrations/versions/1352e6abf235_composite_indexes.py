@@ -0,0 +1,32 @@
+"""composite indexes
+
+Revision ID: 1352e6abf235
+Revises: 4e7b1c9d2f60
+Create Date: 2026-10-19 14:49:12.429003
+
+Proposed by bench/plans.py for:
+ix_posts_subreddit_id_created_at: GET /posts/by-subreddit/{subreddit_id}
+ix_posts_user_id_created_at: GET /posts/my_posts, GET /posts/user_posts/
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "1352e6abf235"
+down_revision: Union[str, None] = "4e7b1c9d2f60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_posts_subreddit_id_created_at", "posts", ["subreddit_id", "created_at"]
+    )
+    op.create_index("ix_posts_user_id_created_at", "posts", ["user_id", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_posts_user_id_created_at", table_name="posts")
+    op.drop_index("ix_posts_subreddit_id_created_at", table_name="posts")
@@ -0,0 +1,66 @@
+"""media blobs
+
+Revision ID: 3b7d2e9c41a5
+Revises: f1dd7f272a20
+Create Date: 2025-07-08 19:12:44.103218
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b7d2e9c41a5"
+down_revision: Union[str, None] = "f1dd7f272a20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mediablobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("hash", sa.String(length=64), nullable=False),
+        sa.Column("key", sa.String(length=300), nullable=False),
+        sa.Column("path", sa.String(length=300), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("key"),
+    )
+    op.create_index(op.f("ix_mediablobs_hash"), "mediablobs", ["hash"], unique=True)
+    op.create_index(op.f("ix_mediablobs_path"), "mediablobs", ["path"], unique=True)
+    op.create_index(
+        op.f("ix_mediablobs_ref_count"), "mediablobs", ["ref_count"], unique=False
+    )
+    op.create_index(
+        op.f("ix_mediablobs_created_at"), "mediablobs", ["created_at"], unique=False
+    )
+    op.create_index(
+        op.f("ix_mediablobs_updated_at"), "mediablobs", ["updated_at"], unique=False
+    )
+    op.create_index(
+        "ix_posts_image_path",
+        "posts",
+        ["image_path"],
+        unique=False,
+        postgresql_where=sa.text("image_path IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_posts_image_path", table_name="posts")
+    op.drop_index(op.f("ix_mediablobs_updated_at"), table_name="mediablobs")
+    op.drop_index(op.f("ix_mediablobs_created_at"), table_name="mediablobs")
+    op.drop_index(op.f("ix_mediablobs_ref_count"), table_name="mediablobs")
+    op.drop_index(op.f("ix_mediablobs_path"), table_name="mediablobs")
+    op.drop_index(op.f("ix_mediablobs_hash"), table_name="mediablobs")
+    op.drop_table("mediablobs")
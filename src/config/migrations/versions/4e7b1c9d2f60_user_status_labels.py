@@ -0,0 +1,34 @@
+"""user status labels
+
+Revision ID: 4e7b1c9d2f60
+Revises: 9d4b6e1f2a07
+Create Date: 2026-10-19 14:31:08.115920
+
+The enum was created with upper-case labels while ``UserStatus`` stores its
+lower-case member names, so inserting a user failed on migrated databases.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4e7b1c9d2f60"
+down_revision: Union[str, None] = "9d4b6e1f2a07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LABELS = ("active", "banned", "deleted")
+
+
+def upgrade() -> None:
+    for label in LABELS:
+        op.execute(f"ALTER TYPE userstatus RENAME VALUE '{label.upper()}' TO '{label}'")
+    op.alter_column("users", "status", server_default="active")
+
+
+def downgrade() -> None:
+    for label in LABELS:
+        op.execute(f"ALTER TYPE userstatus RENAME VALUE '{label}' TO '{label.upper()}'")
+    op.alter_column("users", "status", server_default="ACTIVE")
@@ -0,0 +1,30 @@
+"""comment replies count
+
+Revision ID: 5c1e8a0d7f42
+Revises: 3b7d2e9c41a5
+Create Date: 2025-07-09 11:02:17.518940
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e8a0d7f42"
+down_revision: Union[str, None] = "3b7d2e9c41a5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "comments",
+        sa.Column("replies_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    # Existing counts are filled in by the reconcile_counters task, in batches.
+
+
+def downgrade() -> None:
+    op.drop_column("comments", "replies_count")
@@ -0,0 +1,42 @@
+"""outbox
+
+Revision ID: 6a2f8d3c1b94
+Revises: 1352e6abf235
+Create Date: 2026-10-19 18:05:41.207316
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "6a2f8d3c1b94"
+down_revision: Union[str, None] = "1352e6abf235"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("topic", sa.String(length=64), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    pending = op.get_bind().execute(sa.text("SELECT count(*) FROM outbox"))
+    if pending.scalar_one():
+        raise RuntimeError("outbox is not empty: run the relay until it drains")
+    op.drop_table("outbox")
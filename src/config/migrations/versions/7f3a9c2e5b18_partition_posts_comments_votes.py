@@ -0,0 +1,241 @@
+"""partition posts, comments and votes by created_at month
+
+Revision ID: 7f3a9c2e5b18
+Revises: 5c1e8a0d7f42
+Create Date: 2025-07-14 16:40:03.214871
+
+Every table is copied into a new table partitioned by month, which then
+replaces it. By default the copy runs in the migration transaction with
+writes blocked. With ``alembic -x partition_copy=online upgrade head`` the
+app keeps running: triggers mirror live writes into the new tables while the
+existing rows are copied in committed batches of ``-x partition_batch``
+ids, and the tables are only locked for the final swap.
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+
+from src.config.partitions import (
+    CREATE_PARTITIONS_FUNCTION,
+    PARTITIONED_TABLES,
+    cascade_statements,
+)
+from src.config.settings import settings
+
+# revision identifiers, used by Alembic.
+revision: str = "7f3a9c2e5b18"
+down_revision: Union[str, None] = "5c1e8a0d7f42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "posts": {
+        "ix_posts_created_at": "(created_at)",
+        "ix_posts_updated_at": "(updated_at)",
+        "ix_posts_title": "(title)",
+        "ix_posts_image_path": "(image_path) WHERE image_path IS NOT NULL",
+    },
+    "comments": {
+        "ix_comments_created_at": "(created_at)",
+        "ix_comments_updated_at": "(updated_at)",
+        "ix_comments_post_id": "(post_id)",
+        "ix_comments_parent_comment_id": "(parent_comment_id)",
+        "ix_comments_user_id": "(user_id)",
+    },
+    "votes": {
+        "ix_votes_created_at": "(created_at)",
+        "ix_votes_updated_at": "(updated_at)",
+        "ix_votes_post_id": "(post_id)",
+        "ix_votes_comment_id": "(comment_id)",
+        "ix_votes_user_id": "(user_id)",
+    },
+}
+# Not recreated: the (id, created_at) primary key serves lookups by id.
+ID_INDEXES = {"posts": "ix_posts_id", "comments": "ix_comments_id"}
+FOREIGN_KEYS = {
+    "posts": {
+        "posts_user_id_fkey": "(user_id) REFERENCES users(id) ON DELETE SET NULL",
+        "posts_subreddit_id_fkey": (
+            "(subreddit_id) REFERENCES subreddits(id) ON DELETE CASCADE"
+        ),
+    },
+    "comments": {"comments_user_id_fkey": "(user_id) REFERENCES users(id)"},
+    "votes": {
+        "votes_user_id_fkey": "(user_id) REFERENCES users(id) ON DELETE SET NULL",
+    },
+}
+# Can't point at a partitioned table; the cascade triggers replace them.
+CASCADE_FOREIGN_KEYS = {
+    "comments": {
+        "comments_post_id_fkey": "(post_id) REFERENCES posts(id) ON DELETE CASCADE",
+        "comments_parent_comment_id_fkey": (
+            "(parent_comment_id) REFERENCES comments(id) ON DELETE CASCADE"
+        ),
+    },
+    "votes": {
+        "votes_post_id_fkey": "(post_id) REFERENCES posts(id) ON DELETE CASCADE",
+        "votes_comment_id_fkey": (
+            "(comment_id) REFERENCES comments(id) ON DELETE CASCADE"
+        ),
+    },
+}
+
+MIRROR_FUNCTION = """
+CREATE OR REPLACE FUNCTION partition_copy_mirror() RETURNS trigger AS $$
+DECLARE
+    target text := TG_TABLE_NAME || '_partitioned';
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format('DELETE FROM %I WHERE id = $1', target) USING OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        EXECUTE format('INSERT INTO %I SELECT ($1::%I).*', target, TG_TABLE_NAME)
+            USING NEW;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _create_partitioned(table: str) -> None:
+    new = f"{table}_partitioned"
+    op.execute(
+        f"CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute(
+        f"ALTER TABLE {new} ADD CONSTRAINT {table}_pkey_partitioned "
+        "PRIMARY KEY (id, created_at)"
+    )
+    for name, definition in INDEXES[table].items():
+        op.execute(f"CREATE INDEX {name}_partitioned ON {new} {definition}")
+    for name, definition in FOREIGN_KEYS[table].items():
+        op.execute(f"ALTER TABLE {new} ADD CONSTRAINT {name} FOREIGN KEY {definition}")
+    op.execute(
+        f"SELECT create_monthly_partitions('{new}', "
+        f"coalesce((SELECT min(created_at) FROM {table}), now()::timestamp), "
+        f"now()::timestamp + interval '{settings.PARTITION_MONTHS_AHEAD} months', "
+        f"'{table}')"
+    )
+
+
+def _verify_copy(table: str) -> None:
+    # One statement, one snapshot: with the mirror triggers in place the two
+    # counts agree at any point in time.
+    source, copied = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                f"SELECT (SELECT count(*) FROM {table}), "
+                f"(SELECT count(*) FROM {table}_partitioned)"
+            )
+        )
+        .one()
+    )
+    if source != copied:
+        raise RuntimeError(f"{table}: copied {copied} of {source} rows")
+
+
+def _copy_offline() -> None:
+    op.execute(f"LOCK TABLE {', '.join(PARTITIONED_TABLES)} IN EXCLUSIVE MODE")
+    for table in PARTITIONED_TABLES:
+        op.execute(f"INSERT INTO {table}_partitioned SELECT * FROM {table}")
+        _verify_copy(table)
+
+
+def _copy_online(batch_size: int) -> None:
+    with op.get_context().autocommit_block():
+        op.execute(MIRROR_FUNCTION)
+        for table in PARTITIONED_TABLES:
+            op.execute(
+                f"CREATE TRIGGER {table}_partition_copy "
+                f"AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                "FOR EACH ROW EXECUTE FUNCTION partition_copy_mirror()"
+            )
+        bind = op.get_bind()
+        for table in PARTITIONED_TABLES:
+            max_id = bind.execute(
+                sa.text(f"SELECT coalesce(max(id), 0) FROM {table}")
+            ).scalar_one()
+            # FOR SHARE waits for concurrent writers, so a row deleted or
+            # updated meanwhile is never copied in a stale version; rows the
+            # trigger already mirrored are skipped.
+            for start in range(0, max_id + 1, batch_size):
+                op.execute(
+                    f"INSERT INTO {table}_partitioned "
+                    f"SELECT * FROM {table} "
+                    f"WHERE id >= {start} AND id < {start + batch_size} FOR SHARE "
+                    "ON CONFLICT DO NOTHING"
+                )
+            _verify_copy(table)
+
+
+def _swap(table: str) -> None:
+    new = f"{table}_partitioned"
+    op.execute(f"DROP TRIGGER IF EXISTS {table}_partition_copy ON {table}")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {new}.id")
+    op.execute(f"DROP TABLE {table} CASCADE")
+    op.execute(f"ALTER TABLE {new} RENAME TO {table}")
+    op.execute(f"ALTER INDEX {table}_pkey_partitioned RENAME TO {table}_pkey")
+    for name in INDEXES[table]:
+        op.execute(f"ALTER INDEX {name}_partitioned RENAME TO {name}")
+
+
+def upgrade() -> None:
+    options = context.get_x_argument(as_dictionary=True)
+    mode = options.get("partition_copy", "offline")
+    if mode not in ("offline", "online"):
+        raise ValueError(f"partition_copy must be offline or online, not {mode}")
+
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+    for table in PARTITIONED_TABLES:
+        _create_partitioned(table)
+
+    if mode == "online":
+        _copy_online(int(options.get("partition_batch", 50000)))
+    else:
+        _copy_offline()
+
+    op.execute(f"LOCK TABLE {', '.join(PARTITIONED_TABLES)} IN ACCESS EXCLUSIVE MODE")
+    for table in PARTITIONED_TABLES:
+        _swap(table)
+    for table in PARTITIONED_TABLES:
+        for statement in cascade_statements(table):
+            op.execute(statement)
+    op.execute("DROP FUNCTION IF EXISTS partition_copy_mirror()")
+
+
+def downgrade() -> None:
+    op.execute(f"LOCK TABLE {', '.join(PARTITIONED_TABLES)} IN ACCESS EXCLUSIVE MODE")
+    for table in PARTITIONED_TABLES:
+        plain = f"{table}_plain"
+        op.execute(f"CREATE TABLE {plain} (LIKE {table} INCLUDING DEFAULTS)")
+        op.execute(f"INSERT INTO {plain} SELECT * FROM {table}")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {plain}.id")
+        op.execute(f"DROP TABLE {table} CASCADE")
+        op.execute(f"ALTER TABLE {plain} RENAME TO {table}")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        indexes = dict(INDEXES[table])
+        if table in ID_INDEXES:
+            indexes[ID_INDEXES[table]] = "(id)"
+        for name, definition in indexes.items():
+            op.execute(f"CREATE INDEX {name} ON {table} {definition}")
+        for name, definition in FOREIGN_KEYS[table].items():
+            op.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY {definition}"
+            )
+    for table, foreign_keys in CASCADE_FOREIGN_KEYS.items():
+        for name, definition in foreign_keys.items():
+            op.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY {definition}"
+            )
+    for table in ("posts", "comments"):
+        op.execute(f"DROP FUNCTION IF EXISTS {table}_delete_children()")
+    op.execute(
+        "DROP FUNCTION IF EXISTS create_monthly_partitions"
+        "(text, timestamp, timestamp, text)"
+    )
@@ -0,0 +1,76 @@
+"""post archives
+
+Revision ID: 9d4b6e1f2a07
+Revises: 7f3a9c2e5b18
+Create Date: 2025-07-16 10:21:48.630512
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+from src.config.partitions import cascade_statements
+
+# revision identifiers, used by Alembic.
+revision: str = "9d4b6e1f2a07"
+down_revision: Union[str, None] = "7f3a9c2e5b18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+POSTS_DELETE_CHILDREN = """
+CREATE OR REPLACE FUNCTION posts_delete_children() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM comments WHERE post_id = OLD.id;
+    DELETE FROM votes WHERE post_id = OLD.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.add_column("posts", sa.Column("archived_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ix_posts_unarchived_created_at",
+        "posts",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text("archived_at IS NULL"),
+    )
+    op.create_table(
+        "postarchives",
+        sa.Column("post_id", sa.Integer(), nullable=False),
+        sa.Column("thread", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("votes", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("post_id"),
+    )
+    op.create_index(
+        op.f("ix_postarchives_created_at"), "postarchives", ["created_at"], unique=False
+    )
+    op.create_index(
+        op.f("ix_postarchives_updated_at"), "postarchives", ["updated_at"], unique=False
+    )
+    # Deleting a post now also deletes its archive.
+    for statement in cascade_statements("posts"):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    archived = op.get_bind().execute(sa.text("SELECT count(*) FROM postarchives"))
+    if archived.scalar_one():
+        raise RuntimeError("postarchives is not empty: archived threads would be lost")
+    op.execute(POSTS_DELETE_CHILDREN)
+    op.drop_index(op.f("ix_postarchives_updated_at"), table_name="postarchives")
+    op.drop_index(op.f("ix_postarchives_created_at"), table_name="postarchives")
+    op.drop_table("postarchives")
+    op.drop_index("ix_posts_unarchived_created_at", table_name="posts")
+    op.drop_column("posts", "archived_at")
@@ -0,0 +1,36 @@
+"""check the parents of comments and votes
+
+Revision ID: d5a7c3e9b160
+Revises: 8c5e1a7d4f20
+Create Date: 2026-10-19 20:41:53.270614
+
+Partitioning posts and comments dropped the foreign keys pointing at them,
+so an insert racing the delete of its post could leave an orphan. Constraint
+triggers check the parents of new comments and votes again; existing rows
+are not re-checked.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from src.config.partitions import PARENTS, parent_check_statements
+
+# revision identifiers, used by Alembic.
+revision: str = "d5a7c3e9b160"
+down_revision: Union[str, None] = "8c5e1a7d4f20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in PARENTS:
+        for statement in parent_check_statements(table):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    for table in PARENTS:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_check_parents ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS {table}_check_parents()")
@@ -0,0 +1,159 @@
+"""Monthly range partitioning of posts, comments and votes by ``created_at``.
+
+There is no default partition, so inserts need the month's partition to
+exist: ``create_future_partitions`` (run daily by Celery beat) keeps
+``PARTITION_MONTHS_AHEAD`` months ready. Foreign keys can't reference a
+partitioned table, so both what they checked on insert and the delete
+cascades they did are triggers.
+"""
+
+from datetime import timedelta
+
+from sqlalchemy import Table, event, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.config.settings import settings
+
+PARTITIONED_TABLES = ("posts", "comments", "votes")
+
+# Comments and votes are never older than their post by more than this, so
+# ``created_at >= post.created_at - CREATED_AT_SLACK`` is always true and lets
+# Postgres skip the partitions before the post.
+CREATED_AT_SLACK = timedelta(days=1)
+
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_monthly_partitions(
+    parent text, from_date timestamp, to_date timestamp, prefix text DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    month timestamp := date_trunc('month', from_date);
+    partition text;
+    created integer := 0;
+BEGIN
+    WHILE month <= to_date LOOP
+        partition := coalesce(prefix, parent) || to_char(month, '"_y"YYYY"m"MM');
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                partition, parent, month, month + interval '1 month'
+            );
+            created := created + 1;
+        END IF;
+        month := month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+"""
+
+DELETE_CHILDREN = {
+    "posts": (
+        "DELETE FROM comments WHERE post_id = OLD.id",
+        "DELETE FROM votes WHERE post_id = OLD.id",
+        "DELETE FROM postarchives WHERE post_id = OLD.id",
+    ),
+    "comments": (
+        "DELETE FROM comments WHERE parent_comment_id = OLD.id",
+        "DELETE FROM votes WHERE comment_id = OLD.id",
+    ),
+}
+
+# (column, parent table) of the foreign keys into partitioned tables.
+PARENTS = {
+    "comments": (("post_id", "posts"), ("parent_comment_id", "comments")),
+    "votes": (("post_id", "posts"), ("comment_id", "comments")),
+}
+
+
+def cascade_statements(table: str) -> list[str]:
+    """DDL of the ``AFTER DELETE`` trigger replacing ``ON DELETE CASCADE``
+    foreign keys that pointed at ``table``."""
+    if table not in DELETE_CHILDREN:
+        return []
+    body = "".join(f"    {statement};\n" for statement in DELETE_CHILDREN[table])
+    name = f"{table}_delete_children"
+    return [
+        f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$\n"
+        f"BEGIN\n{body}    RETURN NULL;\nEND\n$$ LANGUAGE plpgsql",
+        f"DROP TRIGGER IF EXISTS {name} ON {table}",
+        f"CREATE TRIGGER {name} AFTER DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {name}()",
+    ]
+
+
+def parent_check_statements(table: str) -> list[str]:
+    """DDL of the constraint trigger replacing the foreign keys from ``table``
+    into partitioned tables.
+
+    Like the foreign keys, it checks at the end of the statement, so the DAOs
+    still get an ``IntegrityError`` on flush, and it takes a ``FOR KEY SHARE``
+    lock on the parent, so a concurrent delete waits and its cascade sees
+    the new row. It is ``DEFERRABLE`` for bulk loads that insert children
+    before their parents.
+    """
+    if table not in PARENTS:
+        return []
+    body = "".join(
+        f"    IF NEW.{column} IS NOT NULL THEN\n"
+        f"        PERFORM FROM {parent} WHERE id = NEW.{column} FOR KEY SHARE;\n"
+        f"        IF NOT FOUND THEN\n"
+        f"            RAISE foreign_key_violation USING MESSAGE = format(\n"
+        f"                '{table}.{column} %s is not in {parent}', NEW.{column}\n"
+        f"            );\n"
+        f"        END IF;\n"
+        f"    END IF;\n"
+        for column, parent in PARENTS[table]
+    )
+    columns = ", ".join(column for column, _ in PARENTS[table])
+    name = f"{table}_check_parents"
+    return [
+        f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$\n"
+        f"BEGIN\n{body}    RETURN NULL;\nEND\n$$ LANGUAGE plpgsql",
+        f"DROP TRIGGER IF EXISTS {name} ON {table}",
+        f"CREATE CONSTRAINT TRIGGER {name} AFTER INSERT OR UPDATE OF {columns} "
+        f"ON {table} DEFERRABLE INITIALLY IMMEDIATE "
+        f"FOR EACH ROW EXECUTE FUNCTION {name}()",
+    ]
+
+
+def create_partitions_statement(
+    table: str, months_back: int = 0, months_ahead: int | None = None
+) -> str:
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+    return (
+        f"SELECT create_monthly_partitions('{table}', "
+        f"now()::timestamp - interval '{months_back} months', "
+        f"now()::timestamp + interval '{months_ahead} months')"
+    )
+
+
+async def create_future_partitions(
+    connection: AsyncConnection, months_ahead: int | None = None
+) -> dict[str, int]:
+    """Create the missing partitions up to ``months_ahead`` months from now;
+    returns how many were created per table."""
+    created = {}
+    for table in PARTITIONED_TABLES:
+        result = await connection.execute(
+            text(create_partitions_statement(table, months_ahead=months_ahead))
+        )
+        created[table] = result.scalar_one()
+    return created
+
+
+def install_partitioning(table: Table):
+    """Make ``metadata.create_all`` leave ``table`` usable: the partition
+    helper, partitions around the current month and the cascade and parent
+    check triggers.
+    Migrated databases get the same objects from the migration."""
+
+    @event.listens_for(table, "after_create")
+    def _after_create(target, connection, **kw):
+        for statement in [
+            CREATE_PARTITIONS_FUNCTION,
+            create_partitions_statement(target.name, months_back=1),
+            *cascade_statements(target.name),
+            *parent_check_statements(target.name),
+        ]:
+            connection.execute(text(statement))
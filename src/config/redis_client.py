@@ -0,0 +1,23 @@
+"""The app's asyncio Redis client (Celery tasks open their own, per run)."""
+
+from redis.asyncio import Redis
+
+from src.config.settings import get_redis_url
+
+_client: Redis | None = None
+
+
+def get_redis() -> Redis:
+    global _client
+    if _client is None:
+        _client = Redis.from_url(
+            get_redis_url(), socket_connect_timeout=1, socket_timeout=1
+        )
+    return _client
+
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -11,6 +11,17 @@ class Environment(str, Enum):
     prod = "prod"
 
 
+class MediaBackend(str, Enum):
+    local = "local"
+    s3 = "s3"
+
+
+class EmailBackend(str, Enum):
+    celery = "celery"
+    inprocess = "inprocess"
+    outbox = "outbox"
+
+
 def parse_cors(v: Any) -> list[str] | str:
     if isinstance(v, str) and not v.startswith("["):
         return [i.strip() for i in v.split(",")]
@@ -26,6 +37,15 @@ class Settings(BaseSettings):
     FRONTEND_HOST: str = "http://localhost:3000"
 
     SENTRY_DSN: Optional[str] = None
+    METRICS_ENABLED: bool = True
+    SERVER_TIMING_SAMPLE_RATE: float = 0.01
+    SLOW_QUERY_THRESHOLD_MS: Optional[float] = None
+    SLOW_QUERY_EXPLAIN: bool = True
+    SLOW_QUERY_MAX_FINGERPRINTS: int = 1000
+    LOOP_LAG_ENABLED: bool = True
+    # Defaults to 0.1 s, and 1 s in prod.
+    LOOP_LAG_SAMPLE_SECONDS: Optional[float] = None
+    LOOP_LAG_THRESHOLD_MS: float = 100
 
     BACKEND_CORS_ORIGINS: Annotated[
         list[AnyUrl] | str, BeforeValidator(parse_cors)
@@ -52,6 +72,16 @@ class Settings(BaseSettings):
     DB_NAME: str
     DB_USER: str
     POSTGRES_PASSWORD: str
+    DB_REPLICA_HOST: Optional[str] = None
+    DB_REPLICA_PORT: Optional[int] = None
+    DB_REPLICA_MAX_LAG_SECONDS: float = 2.0
+    DB_REPLICA_LAG_CHECK_SECONDS: float = 1.0
+    DB_REPLICA_STICKY_SECONDS: int = 5
+    # Behind PgBouncer (transaction pooling): no client-side pool and no
+    # cached prepared statements.
+    DB_PGBOUNCER: bool = False
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+    DB_COMPILED_CACHE_SIZE: int = 1000
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
@@ -59,8 +89,57 @@ class Settings(BaseSettings):
     SMTP_PORT: int
     EMAIL_FROM: str
     EMAIL_PASSWORD: str
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT_SECONDS: float = 10
+    # Connections kept open per worker process, see src/tasks/mailer.py.
+    SMTP_POOL_SIZE: int = 2
+    SMTP_KEEPALIVE_SECONDS: float = 30
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    SMTP_MAX_RETRIES: int = 5
+    SMTP_RETRY_BACKOFF_SECONDS: float = 5
+    SMTP_RETRY_BACKOFF_MAX_SECONDS: float = 600
+    EMAIL_BACKEND: EmailBackend = EmailBackend.celery
+    # inprocess only: SMTP sessions sending at once, messages waiting for one
+    # and how long shutdown waits for the queue, see src/notifications.
+    EMAIL_CONCURRENCY: int = 4
+    EMAIL_QUEUE_SIZE: int = 1000
+    EMAIL_DRAIN_TIMEOUT_SECONDS: float = 10
     REDIS_URL: str
 
+    MEDIA_BACKEND: MediaBackend = MediaBackend.local
+    MEDIA_ROOT: str = "media"
+    MEDIA_GC_GRACE_MINUTES: int = 60
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_PUBLIC_URL: Optional[str] = None
+    S3_BUCKET: str = "media"
+    S3_ACCESS_KEY: Optional[str] = None
+    S3_SECRET_KEY: Optional[str] = None
+
+    COUNTERS_RECONCILE_BATCH_SIZE: int = 10000
+    PARTITION_MONTHS_AHEAD: int = 3
+    FEED_HOT_WINDOW_DAYS: Optional[int] = 30
+    FEED_HEAD_SIZE: int = 100
+    FEED_HEAD_TTL_SECONDS: int = 86400
+    FEED_LATERAL_MAX_SUBREDDITS: int = 100
+    ARCHIVE_AFTER_DAYS: int = 180
+    ARCHIVE_BATCH_SIZE: int = 100
+    SUBSCRIPTION_CACHE_TTL_SECONDS: int = 86400
+    SUBSCRIPTION_CACHE_LOCAL_SIZE: int = 10000
+    SUBSCRIPTION_CACHE_LOCAL_TTL_SECONDS: float = 10
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_POLL_SECONDS: float = 0.5
+    OUTBOX_RETRY_SECONDS: float = 5
+    OUTBOX_STREAM_MAXLEN: int = 100000
+    NOTIFICATIONS_UNREAD_TTL_SECONDS: int = 86400
+    NOTIFICATIONS_DIGEST_MINUTES: int = 60
+    NOTIFICATIONS_DIGEST_BATCH_SIZE: int = 500
+    LIVE_COALESCE_SECONDS: float = 0.5
+    LIVE_MAX_CONNECTIONS: int = 10000
+    LIVE_MAX_PENDING_COMMENTS: int = 50
+    LIVE_HEARTBEAT_SECONDS: float = 15
+    LIVE_CONNECTION_SECONDS: float = 600
+    LIVE_RETRY_SECONDS: float = 1
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -76,6 +155,24 @@ def get_db_url():
     )
 
 
+def get_db_replica_url():
+    if not settings.DB_REPLICA_HOST:
+        return None
+    return (
+        f"postgresql+asyncpg://{settings.DB_USER}:{settings.POSTGRES_PASSWORD}@"
+        f"{settings.DB_REPLICA_HOST}:{settings.DB_REPLICA_PORT or settings.DB_PORT}/"
+        f"{settings.DB_NAME}"
+    )
+
+
+def get_replica_settings():
+    return {
+        "max_lag_seconds": settings.DB_REPLICA_MAX_LAG_SECONDS,
+        "lag_check_seconds": settings.DB_REPLICA_LAG_CHECK_SECONDS,
+        "sticky_seconds": settings.DB_REPLICA_STICKY_SECONDS,
+    }
+
+
 def get_auth_data():
     return {
         "secret_key": settings.SECRET_KEY,
@@ -90,8 +187,33 @@ def get_email_settings():
         "smtp_port": settings.SMTP_PORT,
         "email_from": settings.EMAIL_FROM,
         "email_password": settings.EMAIL_PASSWORD,
+        "starttls": settings.SMTP_STARTTLS,
+        "timeout": settings.SMTP_TIMEOUT_SECONDS,
+        "pool_size": settings.SMTP_POOL_SIZE,
+        "keepalive_seconds": settings.SMTP_KEEPALIVE_SECONDS,
+        "max_messages_per_connection": settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+        "max_retries": settings.SMTP_MAX_RETRIES,
+        "retry_backoff_seconds": settings.SMTP_RETRY_BACKOFF_SECONDS,
+        "retry_backoff_max_seconds": settings.SMTP_RETRY_BACKOFF_MAX_SECONDS,
+        "backend": settings.EMAIL_BACKEND,
+        "concurrency": settings.EMAIL_CONCURRENCY,
+        "queue_size": settings.EMAIL_QUEUE_SIZE,
+        "drain_timeout": settings.EMAIL_DRAIN_TIMEOUT_SECONDS,
     }
 
 
 def get_redis_url():
     return settings.REDIS_URL
+
+
+def get_media_settings():
+    return {
+        "backend": settings.MEDIA_BACKEND,
+        "root": settings.MEDIA_ROOT,
+        "gc_grace_minutes": settings.MEDIA_GC_GRACE_MINUTES,
+        "s3_endpoint_url": settings.S3_ENDPOINT_URL,
+        "s3_public_url": settings.S3_PUBLIC_URL,
+        "s3_bucket": settings.S3_BUCKET,
+        "s3_access_key": settings.S3_ACCESS_KEY,
+        "s3_secret_key": settings.S3_SECRET_KEY,
+    }
@@ -1,25 +1,65 @@
-from alembic.util import err
+from itertools import batched
+from typing import AsyncIterator, Callable
+
 from fastapi import HTTPException
-from sqlalchemy import String, cast, select, update
+from sqlalchemy import (
+    Executable,
+    String,
+    bindparam,
+    cast,
+    column,
+    insert,
+    select,
+    update,
+    values,
+)
 from sqlalchemy import delete as sqlalchemy_delete
-from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError
+
+from src.config.database import async_session_maker, session_scope, transaction
+from src.monitoring.context import label_dao_methods
 
-from src.config.database import async_session_maker
+# asyncpg refuses statements with more bind parameters than this.
+MAX_BIND_PARAMS = 32767
 
 
 class BaseDao:
     model = None
+    _statements: dict[str, Executable] = {}
+    bulk_batch_size = 1000
+    export_batch_size = 1000
+    # Columns never included in exports (see stream_rows / find_page).
+    export_exclude: tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._statements = {}
+        label_dao_methods(cls)
+
+    @classmethod
+    def statement(cls, name: str, build: Callable[[], Executable]) -> Executable:
+        """The statement ``build()`` returns, built once per DAO class.
+
+        Hot queries reuse one statement object, so a call neither rebuilds the
+        construct nor its cache key (memoized on the object) before the
+        compiled-cache lookup. Per-call values are passed as ``bindparam()``s.
+        """
+        query = cls._statements.get(name)
+        if query is None:
+            query = cls._statements[name] = build()
+        return query
 
     @classmethod
     async def find_all(cls):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             query = select(cls.model).order_by(cls.model.created_at.desc())
             book = await session.execute(query)
             return book.scalars().all()
 
     @classmethod
     async def find_by_filter(cls, limit: int, offset: int, **filter_by):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             if not filter_by:
                 return []
             query = select(cls.model)
@@ -35,72 +75,248 @@ class BaseDao:
 
     @classmethod
     async def find_one_or_none(cls, **filter_by):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             query = select(cls.model).filter_by(**filter_by)
             result = await session.execute(query)
             return result.scalar_one_or_none()
 
     @classmethod
     async def find_one_or_none_by_id(cls, data_id: int):
-        async with async_session_maker() as session:
-            query = select(cls.model).filter_by(id=data_id)
-            result = await session.execute(query)
+        query = cls.statement(
+            "by_id", lambda: select(cls.model).where(cls.model.id == bindparam("id"))
+        )
+        async with session_scope() as session:
+            result = await session.execute(query, {"id": data_id})
             return result.scalar_one_or_none()
 
     @classmethod
     async def add(cls, **values):
-        async with async_session_maker() as session:
-            async with session.begin():
-                new_instance = cls.model(**values)
-                session.add(new_instance)
-                try:
-                    await session.commit()
-                except IntegrityError as e:
-                    await session.rollback()
-                    raise e
-                except DataError:
-                    await session.rollback()
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Некорректные данные (например, слишком длинный email)",
-                    ) from err
-                except SQLAlchemyError as e:
-                    await session.rollback()
-                    raise e
-                return new_instance
+        async with transaction() as session:
+            new_instance = cls.model(**values)
+            session.add(new_instance)
+            try:
+                await session.flush()
+            except DataError as err:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Некорректные данные (например, слишком длинный email)",
+                ) from err
+            return new_instance
 
     @classmethod
     async def update(cls, filter_by, **values):
-        async with async_session_maker() as session:
-            async with session.begin():
-                query = (
-                    update(cls.model)
-                    .where(*[getattr(cls.model, k) == v for k, v in filter_by.items()])
-                    .values(**values)
-                    .execution_options(synchronize_session="fetch")
-                    .returning(cls.model)
-                )
-                result = await session.execute(query)
-                try:
-                    await session.commit()
-                except SQLAlchemyError as e:
-                    await session.rollback()
-                    raise e
-                return result.scalars().one_or_none()
+        async with transaction() as session:
+            query = (
+                update(cls.model)
+                .where(*[getattr(cls.model, k) == v for k, v in filter_by.items()])
+                .values(**values)
+                .execution_options(synchronize_session="fetch")
+                .returning(cls.model)
+            )
+            result = await session.execute(query)
+            return result.scalars().one_or_none()
 
     @classmethod
     async def delete_by_id(cls, obj_id: int):
+        async with transaction() as session:
+            query = (
+                sqlalchemy_delete(cls.model).filter_by(id=obj_id).returning(cls.model)
+            )
+            result = await session.execute(query)
+            return result.scalars().one_or_none()
+
+    @classmethod
+    def _export_query(cls, after: int | None):
+        columns = [
+            c for c in cls.model.__table__.columns if c.name not in cls.export_exclude
+        ]
+        query = select(*columns).order_by(cls.model.id)
+        if after is not None:
+            query = query.where(cls.model.id > after)
+        return query
+
+    @classmethod
+    def export_columns(cls) -> list[str]:
+        return list(cls._export_query(None).selected_columns.keys())
+
+    @classmethod
+    async def find_page(cls, after: int | None, limit: int):
+        """Keyset page of plain rows ordered by id; returns the rows and the
+        cursor for the next page (``None`` on the last one)."""
+        async with session_scope() as session:
+            result = await session.execute(cls._export_query(after).limit(limit))
+            rows = [dict(row) for row in result.mappings()]
+        next_cursor = rows[-1]["id"] if len(rows) == limit else None
+        return rows, next_cursor
+
+    @classmethod
+    async def stream_rows(
+        cls, after: int | None = None, batch_size: int | None = None
+    ) -> AsyncIterator[list[dict]]:
+        """Yield the whole table as lists of plain rows from a server-side
+        cursor, so memory stays constant however large the table is.
+
+        Uses its own session: the request session is committed as soon as a
+        streaming response starts, before the body is produced.
+        """
+        query = cls._export_query(after).execution_options(
+            yield_per=batch_size or cls.export_batch_size
+        )
         async with async_session_maker() as session:
-            async with session.begin():
+            result = await session.stream(query)
+            async for partition in result.mappings().partitions():
+                yield [dict(row) for row in partition]
+
+    @classmethod
+    def _batches(cls, rows, batch_size: int | None, width: int = 1):
+        size = min(batch_size or cls.bulk_batch_size, MAX_BIND_PARAMS // width)
+        return batched(rows, max(size, 1))
+
+    @classmethod
+    async def add_many(
+        cls, rows: list[dict], batch_size: int | None = None, copy: bool = False
+    ) -> int:
+        """Insert ``rows`` in batches, one round trip per batch.
+
+        With ``copy=True`` the rows are streamed with ``COPY``, which is the
+        fastest path for large imports but skips ORM events; Python-side
+        column defaults are still applied.
+        """
+        if not rows:
+            return 0
+        if copy:
+            return await cls._copy_many(rows, batch_size)
+        async with transaction() as session:
+            for batch in cls._batches(rows, batch_size):
+                await session.execute(insert(cls.model), list(batch))
+        return len(rows)
+
+    @classmethod
+    async def _copy_many(cls, rows: list[dict], batch_size: int | None) -> int:
+        table = cls.model.__table__
+        names = list(rows[0])
+        defaults = {
+            c.name: c.default.arg
+            for c in table.columns
+            if c.name not in names and c.default is not None and c.default.is_scalar
+        }
+        columns = [table.c[name] for name in [*names, *defaults]]
+
+        async with transaction() as session:
+            connection = await session.connection()
+            processors = [c.type.bind_processor(connection.dialect) for c in columns]
+            # The driver opens the transaction lazily on the first statement,
+            # and COPY below bypasses the cursor.
+            await connection.exec_driver_sql("SELECT 1")
+            raw = await connection.get_raw_connection()
+            for batch in batched(rows, batch_size or cls.bulk_batch_size):
+                records = [
+                    [
+                        process(value) if process else value
+                        for process, value in zip(
+                            processors,
+                            [*(row[name] for name in names), *defaults.values()],
+                            strict=True,
+                        )
+                    ]
+                    for row in batch
+                ]
+                await raw.driver_connection.copy_records_to_table(
+                    table.name, records=records, columns=[c.name for c in columns]
+                )
+        return len(rows)
+
+    @classmethod
+    async def update_many(
+        cls, rows: list[dict], key: str = "id", batch_size: int | None = None
+    ) -> int:
+        """Apply per-row updates with one ``UPDATE ... FROM (VALUES ...)`` per
+        batch. Every row must have the same keys, including ``key``."""
+        if not rows:
+            return 0
+        table = cls.model.__table__
+        names = list(rows[0])
+        updated = 0
+        async with transaction() as session:
+            for batch in cls._batches(rows, batch_size, len(names)):
+                data = values(
+                    *[column(name, table.c[name].type) for name in names],
+                    name="data",
+                ).data([tuple(row[name] for name in names) for row in batch])
                 query = (
-                    sqlalchemy_delete(cls.model)
-                    .filter_by(id=obj_id)
-                    .returning(cls.model)
+                    update(table)
+                    .where(table.c[key] == data.c[key])
+                    .values({name: data.c[name] for name in names if name != key})
                 )
                 result = await session.execute(query)
-                try:
-                    await session.commit()
-                except SQLAlchemyError as e:
-                    await session.rollback()
-                    raise e
-                return result.scalars().one_or_none()
+                updated += result.rowcount
+        return updated
+
+    @classmethod
+    async def upsert_many(
+        cls,
+        rows: list[dict],
+        index_elements: tuple[str, ...] = ("id",),
+        update_columns: list[str] | None = None,
+        batch_size: int | None = None,
+    ) -> int:
+        """Insert ``rows``; on a conflict on ``index_elements`` overwrite
+        ``update_columns`` (every other given column by default)."""
+        if not rows:
+            return 0
+        if update_columns is None:
+            update_columns = [name for name in rows[0] if name not in index_elements]
+        affected = 0
+        async with transaction() as session:
+            for batch in cls._batches(rows, batch_size, len(rows[0])):
+                query = pg_insert(cls.model).values(list(batch))
+                if update_columns:
+                    query = query.on_conflict_do_update(
+                        index_elements=index_elements,
+                        set_={name: query.excluded[name] for name in update_columns},
+                    )
+                else:
+                    query = query.on_conflict_do_nothing(index_elements=index_elements)
+                result = await session.execute(query)
+                affected += result.rowcount
+        return affected
+
+    @classmethod
+    async def delete_many(cls, filter_by: dict, batch_size: int | None = None):
+        """Delete matching rows ``batch_size`` at a time and return their ids.
+
+        Outside a request every chunk commits on its own, so a large cleanup
+        never holds its locks for the whole run. List values match with IN.
+        Rows another transaction has locked are waited for, not skipped, so
+        every match is gone once this returns.
+        """
+        if not filter_by:
+            raise ValueError(f"{cls.__name__}.delete_many needs a filter")
+        conditions = [
+            getattr(cls.model, k).in_(v)
+            if isinstance(v, list | tuple | set)
+            else getattr(cls.model, k) == v
+            for k, v in filter_by.items()
+        ]
+        chunk = (
+            select(cls.model.id)
+            .where(*conditions)
+            .limit(batch_size or cls.bulk_batch_size)
+            .with_for_update()
+        )
+        query = (
+            sqlalchemy_delete(cls.model)
+            .where(cls.model.id.in_(chunk.scalar_subquery()))
+            .returning(cls.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = []
+        while True:
+            async with transaction() as session:
+                ids = (await session.execute(query)).scalars().all()
+            if not ids:
+                return deleted
+            deleted.extend(ids)
+
+
+label_dao_methods(BaseDao)
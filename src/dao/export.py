@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from src.dao.base import BaseDao
+
+
+class ExportFormat(str, Enum):
+    json = "json"
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class ExportQuery(BaseModel):
+    format: ExportFormat = ExportFormat.json
+    cursor: Optional[int] = Field(None, description="Последний полученный id")
+    limit: Optional[int] = Field(
+        None, ge=1, le=1000, description="Размер страницы; без него — вся таблица"
+    )
+
+
+MEDIA_TYPES = {
+    ExportFormat.json: "application/json",
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv; charset=utf-8",
+}
+
+
+def encode_value(value):
+    if isinstance(value, datetime | date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+
+def dumps(row: dict) -> str:
+    return json.dumps(row, default=encode_value, ensure_ascii=False)
+
+
+async def json_chunks(batches: AsyncIterator[list[dict]]):
+    yield b"["
+    separator = ""
+    async for rows in batches:
+        yield (separator + ",".join(dumps(row) for row in rows)).encode()
+        separator = ","
+    yield b"]"
+
+
+async def ndjson_chunks(batches: AsyncIterator[list[dict]]):
+    async for rows in batches:
+        yield "".join(f"{dumps(row)}\n" for row in rows).encode()
+
+
+async def csv_chunks(batches: AsyncIterator[list[dict]], columns: list[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in batches:
+        for row in rows:
+            writer.writerow(
+                [
+                    value
+                    if value is None or isinstance(value, str | int | float)
+                    else encode_value(value)
+                    for value in row.values()
+                ]
+            )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def export_response(dao: type[BaseDao], query: ExportQuery):
+    """Admin dump of a table: one keyset page when ``limit`` is given,
+    otherwise the whole table streamed as JSON, NDJSON or CSV."""
+    if query.limit is not None:
+        items, next_cursor = await dao.find_page(query.cursor, query.limit)
+        return {"items": items, "next_cursor": next_cursor}
+
+    batches = dao.stream_rows(after=query.cursor)
+    if query.format == ExportFormat.csv:
+        chunks = csv_chunks(batches, dao.export_columns())
+    elif query.format == ExportFormat.ndjson:
+        chunks = ndjson_chunks(batches)
+    else:
+        chunks = json_chunks(batches)
+    filename = f"{dao.model.__tablename__}.{query.format.value}"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[query.format],
+        headers={"content-disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,11 +1,24 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import sentry_sdk
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
-from fastapi.staticfiles import StaticFiles
 from starlette.middleware.cors import CORSMiddleware
 
 from src.api.main import api_router
+from src.config.database import monitor_replica_lag
+from src.config.middleware import UnitOfWorkMiddleware
+from src.config.redis_client import close_redis
 from src.config.settings import settings
+from src.media.serving import MediaFiles
+from src.monitoring.loop_lag import loop_lag_monitor
+from src.monitoring.middleware import MetricsMiddleware
+from src.monitoring.router import router as monitoring_router
+from src.monitoring.slow_queries import close_slow_query_log
+from src.monitoring.timing import ServerTimingMiddleware
+from src.notifications.dispatcher import close_dispatcher
+from src.posts.live import close_live_hub
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -25,8 +38,23 @@ if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    replica_monitor = asyncio.create_task(monitor_replica_lag())
+    if settings.LOOP_LAG_ENABLED:
+        loop_lag_monitor.start()
+    yield
+    loop_lag_monitor.stop()
+    replica_monitor.cancel()
+    await close_dispatcher()
+    await close_live_hub()
+    await close_slow_query_log()
+    await close_redis()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
 )
@@ -42,9 +70,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UnitOfWorkMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
 
 
-app.mount("/media", StaticFiles(directory="media"), name="media")
+app.mount("/media", MediaFiles(directory=settings.MEDIA_ROOT), name="media")
 
 
 @app.get("/")
@@ -53,3 +85,5 @@ async def root():
 
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+if settings.METRICS_ENABLED:
+    app.include_router(monitoring_router)
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from functools import partial
+
+from sqlalchemy import delete as sqlalchemy_delete
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from src.config.database import after_commit, async_session_maker, transaction
+from src.dao.base import BaseDao
+from src.media.models import MediaBlob
+from src.media.storage import MediaStorage, StagedBlob
+from src.posts.models import Post
+
+
+class MediaDao(BaseDao):
+    model = MediaBlob
+
+    @classmethod
+    async def store(cls, storage: MediaStorage, staged: StagedBlob) -> str:
+        """Take a reference on the blob and publish it once it is committed.
+
+        A new blob is published only after the transaction commits, so a
+        rolled back upload never leaves a file without a row; its staging
+        file is left for ``collect_garbage`` to sweep.
+        """
+        key = staged.key
+        async with transaction() as session:
+            query = (
+                insert(MediaBlob)
+                .values(
+                    hash=staged.hash,
+                    key=key,
+                    path=storage.url(key),
+                    size=staged.size,
+                    ref_count=1,
+                )
+                .on_conflict_do_update(
+                    index_elements=[MediaBlob.hash],
+                    set_={"ref_count": MediaBlob.ref_count + 1},
+                )
+                .returning(MediaBlob.key, MediaBlob.path, MediaBlob.ref_count)
+            )
+            blob = (await session.execute(query)).one()
+            if blob.ref_count == 1:
+                after_commit(session, partial(storage.publish, staged, blob.key))
+            else:
+                await storage.discard(staged)
+        return blob.path
+
+    @classmethod
+    async def release(cls, path: str):
+        async with transaction() as session:
+            await session.execute(
+                update(MediaBlob)
+                .where(MediaBlob.path == path)
+                .values(ref_count=func.greatest(MediaBlob.ref_count - 1, 0))
+            )
+
+    @classmethod
+    async def reconcile(cls) -> int:
+        """Recount references from posts (cascade deletes bypass ``release``)."""
+        refs = (
+            select(func.count())
+            .where(Post.image_path == MediaBlob.path)
+            .scalar_subquery()
+        )
+        async with transaction() as session:
+            result = await session.execute(
+                update(MediaBlob)
+                .where(MediaBlob.ref_count != refs)
+                .values(ref_count=refs)
+            )
+        return result.rowcount
+
+    @classmethod
+    async def collect_garbage(
+        cls, storage: MediaStorage, grace_minutes: int, batch_size: int = 100
+    ) -> int:
+        deadline = datetime.now() - timedelta(minutes=grace_minutes)
+        await storage.purge_staged(deadline)
+        removed = 0
+        while True:
+            async with async_session_maker() as session:
+                async with session.begin():
+                    query = (
+                        select(MediaBlob.id, MediaBlob.key)
+                        .where(
+                            MediaBlob.ref_count <= 0, MediaBlob.updated_at < deadline
+                        )
+                        .limit(batch_size)
+                        .with_for_update(skip_locked=True)
+                    )
+                    blobs = (await session.execute(query)).all()
+                    if not blobs:
+                        return removed
+                    for blob in blobs:
+                        await storage.delete(blob.key)
+                    await session.execute(
+                        sqlalchemy_delete(MediaBlob).where(
+                            MediaBlob.id.in_([blob.id for blob in blobs])
+                        )
+                    )
+            removed += len(blobs)
@@ -0,0 +1,16 @@
+from sqlalchemy import BigInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.config.database import Base, int_pk
+
+
+class MediaBlob(Base):
+    id: Mapped[int_pk]
+    hash: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    key: Mapped[str] = mapped_column(String(300), unique=True)
+    path: Mapped[str] = mapped_column(String(300), unique=True, index=True)
+    size: Mapped[int] = mapped_column(BigInteger)
+    ref_count: Mapped[int] = mapped_column(default=0, server_default="0", index=True)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(id={self.id}, hash='{self.hash}')"
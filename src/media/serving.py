@@ -0,0 +1,111 @@
+import os
+import re
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+CONTENT_ADDRESSED = re.compile(
+    r"^[0-9a-f]{2}/[0-9a-f]{2}/(?P<hash>[0-9a-f]{64})\.?\w*$"
+)
+IMMUTABLE = "public, max-age=31536000, immutable"
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "image/svg+xml",
+    "application/json",
+    "application/javascript",
+)
+
+
+def accepted_encodings(header: str) -> dict[str, float]:
+    """``Accept-Encoding`` as ``{coding: q}``; ``*`` stands for the rest."""
+    accepted = {}
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+class MediaFiles(StaticFiles):
+    """Static files tuned for content-addressed media.
+
+    Files stored as ``ab/cd/<sha256>.ext`` never change, so they get a strong
+    ETag equal to their hash and ``Cache-Control: immutable``. Byte ranges and
+    ``304`` responses come from :class:`FileResponse`; ``.br``/``.gz``
+    siblings are served to clients that accept them.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if path.startswith(".tmp"):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        root = os.path.realpath(self.directory)
+        relative = os.path.relpath(full_path, root).replace(os.sep, "/")
+        match = CONTENT_ADDRESSED.match(relative)
+
+        headers = {}
+        encoding = None
+        response = FileResponse(
+            full_path, status_code=status_code, stat_result=stat_result
+        )
+        if response.media_type.startswith(COMPRESSIBLE_TYPES):
+            headers["vary"] = "Accept-Encoding"
+            encoding, variant = self._precompressed(full_path, request_headers)
+            if encoding:
+                response = FileResponse(
+                    variant[0],
+                    status_code=status_code,
+                    stat_result=variant[1],
+                    media_type=response.media_type,
+                )
+                headers["content-encoding"] = encoding
+        if match:
+            tag = match["hash"] if encoding is None else f"{match['hash']}-{encoding}"
+            headers["etag"] = f'"{tag}"'
+            headers["cache-control"] = IMMUTABLE
+        response.headers.update(headers)
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _precompressed(full_path, request_headers: Headers):
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        wildcard = accepted.get("*", 0.0)
+        # The client's preference first, ours (smallest first) among equals.
+        preferred = sorted(
+            PRECOMPRESSED, key=lambda variant: -accepted.get(variant[0], wildcard)
+        )
+        for encoding, suffix in preferred:
+            if accepted.get(encoding, wildcard) <= 0:
+                continue
+            try:
+                variant_stat = os.stat(f"{full_path}{suffix}")
+            except OSError:
+                continue
+            return encoding, (f"{full_path}{suffix}", variant_stat)
+        return None, None
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+
+from starlette.concurrency import run_in_threadpool
+
+from src.config.settings import MediaBackend, get_media_settings
+
+media_settings = get_media_settings()
+
+CHUNK_SIZE = 1024 * 1024
+MAX_EXT_LENGTH = 10
+
+
+@dataclass
+class StagedBlob:
+    hash: str
+    size: int
+    ext: str
+    tmp_path: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.hash[:2]}/{self.hash[2:4]}/{self.hash}{self.ext}"
+
+
+def clean_ext(filename: str | None) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if len(ext) > MAX_EXT_LENGTH or not ext[1:].isalnum():
+        return ""
+    return ext
+
+
+class MediaStorage(ABC):
+    """Content-addressed blob storage.
+
+    Uploads are first hashed into a local staging file, then published under
+    ``ab/cd/<sha256><ext>``. Backends only need to know how to publish,
+    delete and build a public URL for a key.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, ".tmp")
+
+    async def stage(self, fileobj, filename: str | None) -> StagedBlob:
+        return await run_in_threadpool(self._stage, fileobj, clean_ext(filename))
+
+    def _stage(self, fileobj, ext: str) -> StagedBlob:
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := fileobj.read(CHUNK_SIZE):
+                digest.update(chunk)
+                buffer.write(chunk)
+                size += len(chunk)
+        return StagedBlob(
+            hash=digest.hexdigest(), size=size, ext=ext, tmp_path=tmp_path
+        )
+
+    async def discard(self, staged: StagedBlob):
+        await run_in_threadpool(self._discard, staged.tmp_path)
+
+    @staticmethod
+    def _discard(tmp_path: str):
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    async def purge_staged(self, deadline: datetime) -> int:
+        """Remove staging files of uploads whose transaction never committed."""
+        return await run_in_threadpool(self._purge_staged, deadline.timestamp())
+
+    def _purge_staged(self, deadline: float) -> int:
+        removed = 0
+        try:
+            entries = list(os.scandir(self.tmp_dir))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < deadline:
+                self._discard(entry.path)
+                removed += 1
+        return removed
+
+    @abstractmethod
+    async def publish(self, staged: StagedBlob, key: str): ...
+
+    @abstractmethod
+    async def delete(self, key: str): ...
+
+    @abstractmethod
+    def url(self, key: str) -> str: ...
+
+
+class LocalStorage(MediaStorage):
+    def full_path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    async def publish(self, staged: StagedBlob, key: str):
+        await run_in_threadpool(self._publish, staged.tmp_path, self.full_path(key))
+
+    @staticmethod
+    def _publish(tmp_path: str, target: str):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self._discard, self.full_path(key))
+
+    def url(self, key: str) -> str:
+        return f"{self.root}/{key}"
+
+
+class S3Storage(MediaStorage):
+    """S3-compatible backend (AWS, MinIO). Requires the ``s3`` extra."""
+
+    def __init__(
+        self,
+        root: str,
+        bucket: str,
+        endpoint_url: str | None = None,
+        public_url: str | None = None,
+        access_key: str | None = None,
+        secret_key: str | None = None,
+    ):
+        super().__init__(root)
+        import boto3
+
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+        )
+        base_url = public_url or f"{endpoint_url}/{bucket}"
+        self.base_url = base_url.rstrip("/")
+
+    async def publish(self, staged: StagedBlob, key: str):
+        await run_in_threadpool(self._publish, staged.tmp_path, key)
+
+    def _publish(self, tmp_path: str, key: str):
+        with open(tmp_path, "rb") as body:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=body,
+                CacheControl="public, max-age=31536000, immutable",
+            )
+        self._discard(tmp_path)
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+_storage: MediaStorage | None = None
+
+
+def get_storage() -> MediaStorage:
+    global _storage
+    if _storage is None:
+        if media_settings["backend"] == MediaBackend.s3:
+            _storage = S3Storage(
+                root=media_settings["root"],
+                bucket=media_settings["s3_bucket"],
+                endpoint_url=media_settings["s3_endpoint_url"],
+                public_url=media_settings["s3_public_url"],
+                access_key=media_settings["s3_access_key"],
+                secret_key=media_settings["s3_secret_key"],
+            )
+        else:
+            _storage = LocalStorage(root=media_settings["root"])
+    return _storage
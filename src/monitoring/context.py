@@ -0,0 +1,61 @@
+import functools
+import inspect
+from contextvars import ContextVar
+from typing import Callable
+
+from starlette.types import Scope
+
+# The ASGI scope of the request being handled. The router fills in
+# scope["route"] after the middleware ran, so labels are resolved lazily.
+current_scope: ContextVar[Scope | None] = ContextVar("current_scope", default=None)
+current_dao: ContextVar[str | None] = ContextVar("current_dao", default=None)
+
+
+def route_label(scope: Scope | None = None) -> str:
+    scope = scope if scope is not None else current_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def dao_label() -> str:
+    return current_dao.get() or "raw"
+
+
+def _label_classmethod(name: str, func: Callable) -> classmethod:
+    @functools.wraps(func)
+    async def wrapper(cls, *args, **kwargs):
+        token = current_dao.set(f"{cls.__name__}.{name}")
+        try:
+            return await func(cls, *args, **kwargs)
+        finally:
+            current_dao.reset(token)
+
+    return classmethod(wrapper)
+
+
+def _label_staticmethod(label: str, func: Callable) -> staticmethod:
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = current_dao.set(label)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_dao.reset(token)
+
+    return staticmethod(wrapper)
+
+
+def label_dao_methods(cls: type):
+    """Tag queries issued from ``cls``'s async methods with ``Dao.method``."""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("__"):
+            continue
+        if isinstance(attr, classmethod) and inspect.iscoroutinefunction(attr.__func__):
+            setattr(cls, name, _label_classmethod(name, attr.__func__))
+        elif isinstance(attr, staticmethod) and inspect.iscoroutinefunction(
+            attr.__func__
+        ):
+            label = f"{cls.__name__}.{name}"
+            setattr(cls, name, _label_staticmethod(label, attr.__func__))
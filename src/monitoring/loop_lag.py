@@ -0,0 +1,96 @@
+"""Event loop lag, and the code that blocked the loop.
+
+A watchdog thread schedules a callback on the loop every
+``LOOP_LAG_SAMPLE_SECONDS`` and times how long it waits to run: that is the
+lag every coroutine of the worker sees at that moment. It goes to the
+``event_loop_lag_seconds`` histogram. When the callback hasn't run after
+``LOOP_LAG_THRESHOLD_MS`` something is holding the loop (sync I/O, bcrypt,
+a big serialization), so the thread takes the loop thread's stack right
+then and logs it, with the task it was in, once the loop is back.
+
+Sampling every 0.1 s (the default outside ``prod``) catches most stalls
+past the threshold; every second, the ``prod`` default, costs one callback
+a second and still fills the histogram.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from src.config.settings import Environment, settings
+from src.monitoring.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """Watch the running loop; call it from the loop's thread."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-lag-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            ran = threading.Event()
+            started = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(ran.set)
+            except RuntimeError:
+                return  # The loop is closed.
+            if ran.wait(self.threshold):
+                EVENT_LOOP_LAG.observe(time.perf_counter() - started)
+                continue
+
+            task, stack = self._blocking_stack()
+            while not ran.wait(self.interval):
+                if self._stop.is_set():
+                    return
+            lag = time.perf_counter() - started
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_BLOCKS.inc()
+            logger.warning(
+                "Event loop blocked for %.0f ms in %s:\n%s", lag * 1000, task, stack
+            )
+
+    def _blocking_stack(self) -> tuple[str, str]:
+        task = asyncio.current_task(self._loop)
+        frame = sys._current_frames().get(self._loop_thread)
+        frames = traceback.extract_stack(frame) if frame is not None else []
+        # Drop the loop's own frames, down to the callback it is running.
+        for i in range(len(frames) - 1, -1, -1):
+            if frames[i].filename == asyncio.events.__file__:
+                frames = frames[i + 1 :]
+                break
+        name = task.get_name() if task is not None else "a callback"
+        return name, "".join(traceback.format_list(frames))
+
+
+def default_interval() -> float:
+    if settings.LOOP_LAG_SAMPLE_SECONDS is not None:
+        return settings.LOOP_LAG_SAMPLE_SECONDS
+    return 1.0 if settings.ENVIRONMENT == Environment.prod else 0.1
+
+
+loop_lag_monitor = LoopLagMonitor(
+    default_interval(), settings.LOOP_LAG_THRESHOLD_MS / 1000
+)
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Query, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from src.config.settings import settings
+from src.monitoring.slow_queries import slow_query_log
+from src.monitoring.timing import TimedRoute
+from src.users.dependencies import get_current_super_admin_user
+
+router = APIRouter(tags=["monitoring"])
+admin_router = APIRouter(
+    prefix="/monitoring", tags=["monitoring"], route_class=TimedRoute
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@admin_router.get(
+    "/slow-queries/", dependencies=[Depends(get_current_super_admin_user)]
+)
+async def slow_queries(limit: int = Query(20, ge=1, le=100)):
+    return {
+        "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        "queries": slow_query_log.report(limit),
+    }
@@ -0,0 +1,201 @@
+"""Slow-query log: statements slower than ``SLOW_QUERY_THRESHOLD_MS``.
+
+Off unless the threshold is set. Each slow statement is logged with the
+types of its parameters (never their values), the DAO method and the route
+that ran it, and counted under its fingerprint: the SQL with parameters,
+literals, ``IN`` lists and ``VALUES`` rows folded, so the same query with
+other arguments lands on the same entry. The first time a fingerprint is
+seen its plan is fetched with ``EXPLAIN (FORMAT JSON)`` in the background,
+on a connection of its own, with the parameters of that run. Plain EXPLAIN
+doesn't execute the statement, so writes are safe to explain.
+
+Aggregates live in the worker's memory, for at most
+``SLOW_QUERY_MAX_FINGERPRINTS`` fingerprints; slow statements past that are
+still logged. ``GET /monitoring/slow-queries/`` lists the worst ones.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.config.settings import settings
+from src.monitoring.context import dao_label, route_label
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(
+    r"\$\d+(?:::(?:TIMESTAMP|TIME) WITH(?:OUT)? TIME ZONE|::\w+(?:\[\])?)?"
+    r"|%\(\w+\)s|'(?:[^']|'')*'|\b\d+\b"
+)
+_IN_LIST = re.compile(r"IN \([^)]*\)", re.I)
+_VALUES = re.compile(r"(\([?, ]+\))(?:, \([?, ]+\))+")
+_EXPLAINABLE = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.I)
+
+# Set while a plan is fetched, so the EXPLAIN itself isn't logged.
+explaining: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "explaining", default=False
+)
+
+
+def fingerprint(statement: str) -> str:
+    statement = _IN_LIST.sub("IN (...)", statement)
+    statement = " ".join(_LITERALS.sub("?", statement).split())
+    return _VALUES.sub(r"\1, ...", statement)
+
+
+def parameter_shape(parameters: Any) -> Any:
+    def shape(value: Any) -> str:
+        if isinstance(value, list | tuple):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if isinstance(parameters, dict):
+        return {name: shape(value) for name, value in parameters.items()}
+    return [shape(value) for value in parameters or ()]
+
+
+@dataclass(slots=True)
+class QueryStats:
+    fingerprint: str
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    parameters: Any = None
+    callers: Counter = field(default_factory=Counter)
+    # None until the first EXPLAIN returns; {"error": ...} if it failed.
+    plan: Any = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": hashlib.sha1(self.fingerprint.encode()).hexdigest()[:12],
+            "statement": self.fingerprint,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 1),
+            "mean_ms": round(self.total / self.count * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+            "parameters": self.parameters,
+            "callers": dict(self.callers.most_common()),
+            "plan": self.plan,
+        }
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, explain: bool, max_fingerprints: int):
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self.max_fingerprints = max_fingerprints
+        self.stats: dict[str, QueryStats] = {}
+        self._listeners: dict[AsyncEngine, tuple] = {}
+        self._explains: set[asyncio.Task] = set()
+
+    def install(self, engine: AsyncEngine):
+        def before(conn, cursor, statement, parameters, context, executemany):
+            context._slow_query_started = time.perf_counter()
+
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - context._slow_query_started
+            if elapsed >= self.threshold and not explaining.get():
+                if executemany:
+                    parameters = parameters[0] if parameters else ()
+                self.record(engine, statement, parameters, elapsed)
+
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", before)
+        event.listen(sync_engine, "after_cursor_execute", after)
+        self._listeners[engine] = (before, after)
+
+    def remove(self, engine: AsyncEngine):
+        before, after = self._listeners.pop(engine)
+        event.remove(engine.sync_engine, "before_cursor_execute", before)
+        event.remove(engine.sync_engine, "after_cursor_execute", after)
+
+    def record(
+        self, engine: AsyncEngine, statement: str, parameters: Any, elapsed: float
+    ):
+        key = fingerprint(statement)
+        route, dao = route_label(), dao_label()
+        shape = parameter_shape(parameters)
+        logger.warning(
+            "Slow query %.1f ms route=%s dao=%s parameters=%s: %s",
+            elapsed * 1000,
+            route,
+            dao,
+            shape,
+            key,
+        )
+
+        stats = self.stats.get(key)
+        if stats is None:
+            if len(self.stats) >= self.max_fingerprints:
+                return
+            stats = self.stats[key] = QueryStats(key)
+            if self.explain and _EXPLAINABLE.match(statement):
+                self._start_explain(engine, stats, statement, parameters)
+        stats.count += 1
+        stats.total += elapsed
+        stats.max = max(stats.max, elapsed)
+        stats.parameters = shape
+        stats.callers[f"{route} {dao}"] += 1
+
+    def _start_explain(
+        self, engine: AsyncEngine, stats: QueryStats, statement: str, parameters
+    ):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # A context of its own: the request's timings and labels stay out.
+        task = loop.create_task(
+            self._explain(engine, stats, statement, parameters),
+            context=contextvars.Context(),
+        )
+        self._explains.add(task)
+        task.add_done_callback(self._explains.discard)
+
+    async def _explain(
+        self, engine: AsyncEngine, stats: QueryStats, statement: str, parameters
+    ):
+        explaining.set(True)
+        try:
+            async with engine.connect() as connection:
+                result = await connection.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {statement}", parameters
+                )
+                stats.plan = result.scalar()
+        except (SQLAlchemyError, OSError) as err:
+            logger.warning("Slow query log: EXPLAIN failed: %s", err)
+            stats.plan = {"error": str(err)}
+
+    def report(self, limit: int) -> list[dict]:
+        """The ``limit`` fingerprints that took the most time in total."""
+        worst = sorted(self.stats.values(), key=lambda s: s.total, reverse=True)
+        return [stats.to_dict() for stats in worst[:limit]]
+
+    def clear(self):
+        self.stats.clear()
+
+    async def close(self):
+        for task in list(self._explains):
+            task.cancel()
+        await asyncio.gather(*self._explains, return_exceptions=True)
+
+
+slow_query_log = SlowQueryLog(
+    settings.SLOW_QUERY_THRESHOLD_MS or 0,
+    settings.SLOW_QUERY_EXPLAIN,
+    settings.SLOW_QUERY_MAX_FINGERPRINTS,
+)
+
+
+async def close_slow_query_log():
+    await slow_query_log.close()
@@ -0,0 +1,175 @@
+from collections import Counter, defaultdict
+
+from sqlalchemy import Integer, case, column, func, insert, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from src.config.database import session_scope, transaction
+from src.dao.base import BaseDao
+from src.notifications.models import Notification
+from src.notifications.unread import unread
+from src.outbox.events import emit
+from src.posts.models import Comment, Post
+from src.tasks.mailer import digest_message
+from src.users.models import User
+
+
+class NotificationDao(BaseDao):
+    model = Notification
+
+    @staticmethod
+    async def record_comments(session: AsyncSession, comments: list[dict]):
+        """Notify the author of the parent comment, or of the post for a
+        top-level comment, of each ``comment.created`` payload, with one
+        INSERT for the whole batch. Nobody is notified of their own
+        comments."""
+        created = values(
+            column("comment_id", Integer),
+            column("post_id", Integer),
+            column("parent_comment_id", Integer),
+            column("actor_id", Integer),
+            name="created",
+        ).data(
+            [
+                (c["id"], c["post_id"], c["parent_comment_id"], c["user_id"])
+                for c in comments
+            ]
+        )
+        parent = aliased(Comment)
+        recipient = func.coalesce(parent.user_id, Post.user_id)
+        notified = (
+            select(
+                recipient,
+                case((created.c.parent_comment_id.is_(None), "comment"), else_="reply"),
+                created.c.actor_id,
+                created.c.post_id,
+                created.c.comment_id,
+            )
+            .select_from(created)
+            .outerjoin(parent, parent.id == created.c.parent_comment_id)
+            .outerjoin(
+                Post,
+                (Post.id == created.c.post_id) & created.c.parent_comment_id.is_(None),
+            )
+            .where(recipient.is_distinct_from(created.c.actor_id))
+            .where(recipient.is_not(None))
+        )
+        result = await session.execute(
+            insert(Notification)
+            .from_select(
+                ["user_id", "kind", "actor_id", "post_id", "comment_id"], notified
+            )
+            .returning(Notification.user_id)
+        )
+        unread.changed(session, Counter(result.scalars()))
+
+    @staticmethod
+    async def find_for_user(user_id: int, limit: int, before: int | None = None):
+        query = (
+            select(Notification, User.username)
+            .outerjoin(User, User.id == Notification.actor_id)
+            .where(Notification.user_id == user_id)
+            .order_by(Notification.id.desc())
+            .limit(limit)
+        )
+        if before is not None:
+            query = query.where(Notification.id < before)
+        async with session_scope() as session:
+            rows = (await session.execute(query)).all()
+        return [
+            {
+                "id": notification.id,
+                "kind": notification.kind,
+                "actor": {"id": notification.actor_id, "username": username},
+                "post_id": notification.post_id,
+                "comment_id": notification.comment_id,
+                "is_read": notification.read_at is not None,
+                "created_at": notification.created_at,
+            }
+            for notification, username in rows
+        ]
+
+    @staticmethod
+    async def mark_read(user_id: int, ids: list[int] | None = None) -> int:
+        """Mark ``ids``, or all of the user's notifications, as read; returns
+        how many were unread."""
+        query = (
+            update(Notification)
+            .where(Notification.user_id == user_id, Notification.read_at.is_(None))
+            .values(read_at=func.now())
+            .returning(Notification.id)
+        )
+        if ids is not None:
+            query = query.where(Notification.id.in_(ids))
+        async with transaction() as session:
+            result = await session.execute(query)
+            read = len(result.all())
+            unread.changed(session, {user_id: -read})
+        return read
+
+    @staticmethod
+    async def send_digests(after_user_id: int, limit: int) -> tuple[int | None, int]:
+        """Queue one email for each of the next ``limit`` users after
+        ``after_user_id`` with unread notifications no digest covered yet.
+
+        The notifications are marked as emailed and the emails written to the
+        outbox in one transaction. Returns the last user handled, ``None``
+        once there are none left, and the number of emails.
+        """
+        pending = (Notification.read_at.is_(None), Notification.emailed_at.is_(None))
+        recipients = (
+            select(Notification.user_id)
+            .where(*pending, Notification.user_id > after_user_id)
+            .group_by(Notification.user_id)
+            .order_by(Notification.user_id)
+            .limit(limit)
+            .cte("recipients")
+        )
+        # The UPDATE ... RETURNING is the statement itself, so it always
+        # runs on the primary. It goes through the table rather than the ORM
+        # entity to return the recipient's columns from UPDATE ... FROM; the
+        # actor and the post come from subqueries, as that can't outer join.
+        notification = Notification.__table__
+        actor = aliased(User)
+        digested = (
+            update(notification)
+            .where(
+                notification.c.read_at.is_(None),
+                notification.c.emailed_at.is_(None),
+                notification.c.user_id == recipients.c.user_id,
+                User.id == notification.c.user_id,
+            )
+            .values(emailed_at=func.now())
+            .returning(
+                notification.c.user_id,
+                notification.c.id,
+                notification.c.kind,
+                User.email,
+                User.is_verified,
+                select(actor.username)
+                .where(actor.id == notification.c.actor_id)
+                .scalar_subquery()
+                .label("username"),
+                select(Post.title)
+                .where(Post.id == notification.c.post_id)
+                .scalar_subquery()
+                .label("title"),
+            )
+        )
+        async with transaction() as session:
+            rows = (await session.execute(digested)).all()
+            rows.sort(key=lambda row: (row.user_id, -row.id))
+            items, emails = defaultdict(list), {}
+            for row in rows:
+                if row.is_verified:
+                    emails[row.user_id] = row.email
+                    items[row.user_id].append(
+                        {"kind": row.kind, "actor": row.username, "title": row.title}
+                    )
+            messages = [
+                digest_message(email, items[user_id])
+                for user_id, email in emails.items()
+            ]
+            if messages:
+                emit(session, "email.send", messages=messages)
+        return (rows[-1].user_id if rows else None), len(messages)
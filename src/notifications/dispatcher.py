@@ -0,0 +1,294 @@
+"""Where the app hands off the emails it sends.
+
+Both ``celery`` and ``inprocess`` hand emails off once the request's writes
+have committed, so a rolled-back registration sends nothing.
+
+``EMAIL_BACKEND=celery`` queues them for the workers of
+src/tasks/send_email.py. ``inprocess`` sends them from the app itself, for
+deployments without Redis and a worker fleet: ``EMAIL_CONCURRENCY`` asyncio
+workers take messages from a queue of ``EMAIL_QUEUE_SIZE``, each over its own
+aiosmtplib session kept open between messages. Failures that may pass are
+queued again with backoff, and shutdown waits up to
+``EMAIL_DRAIN_TIMEOUT_SECONDS`` for the queue to empty. Unlike with Celery,
+what is still queued when the process dies is lost.
+
+``outbox`` records the emails in the outbox table with the request's writes;
+src/outbox/relay.py queues the Celery tasks once they have committed, so an
+email is neither lost nor sent for a rolled-back registration.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+from functools import partial
+from typing import Awaitable, Callable
+
+import aiosmtplib
+from starlette.concurrency import run_in_threadpool
+
+from src.config.database import after_commit, current_session, transaction
+from src.config.settings import EmailBackend, get_email_settings
+from src.outbox.events import emit
+from src.tasks.mailer import build_message, verification_message
+
+logger = logging.getLogger(__name__)
+
+email_settings = get_email_settings()
+
+
+def is_transient(err: Exception) -> bool:
+    if isinstance(err, aiosmtplib.SMTPRecipientsRefused):
+        return all(400 <= refused.code < 500 for refused in err.recipients)
+    if isinstance(err, aiosmtplib.SMTPResponseException):
+        return 400 <= err.code < 500
+    # Disconnects and timeouts, aiosmtplib's included.
+    return isinstance(err, OSError)
+
+
+class EmailDispatcher(ABC):
+    @abstractmethod
+    async def send(self, messages: list[dict]):
+        """Hand off ``{"to", "subject", "body"}`` messages for delivery."""
+
+    async def send_verification(self, email: str, code: str):
+        await self.send([verification_message(email, code)])
+
+    async def close(self):  # noqa: B027 - only queueing dispatchers need it.
+        pass
+
+    @staticmethod
+    async def _once_committed(hand_off: Callable[[], Awaitable]):
+        """Await ``hand_off()`` once the request's transaction has committed;
+        right away without one."""
+        session = current_session.get()
+        if session is not None and session.in_transaction():
+            after_commit(session, hand_off)
+        else:
+            await hand_off()
+
+
+class CeleryDispatcher(EmailDispatcher):
+
+    async def send(self, messages: list[dict]):
+        from src.tasks.send_email import send_emails
+
+        await self._queue(send_emails, messages)
+
+    async def send_verification(self, email: str, code: str):
+        from src.tasks.send_email import send_verification_email
+
+        await self._queue(send_verification_email, email, code)
+
+    async def _queue(self, task, *args):
+        await self._once_committed(
+            partial(run_in_threadpool, task.apply_async, args=list(args))
+        )
+
+
+class OutboxDispatcher(EmailDispatcher):
+    async def send(self, messages: list[dict]):
+        async with transaction() as session:
+            emit(session, "email.send", messages=messages)
+
+    async def send_verification(self, email: str, code: str):
+        async with transaction() as session:
+            emit(session, "email.verification", email=email, code=code)
+
+
+class Session:
+    """The SMTP session of one worker, opened on first use and reused."""
+
+    def __init__(self, dispatcher: "AsyncioDispatcher"):
+        self.dispatcher = dispatcher
+        self.smtp: aiosmtplib.SMTP | None = None
+        self.sent = 0
+        self.last_used = 0.0
+
+    async def send(self, message: EmailMessage, reconnect: bool = True):
+        if self.smtp is None or not await self._usable():
+            await self.close()
+            await self._open()
+            reconnect = False
+        try:
+            await self.smtp.send_message(message)
+        except OSError:
+            await self.close()
+            if not reconnect:
+                raise
+            # The server dropped a session that looked alive.
+            return await self.send(message, reconnect=False)
+        self.sent += 1
+        self.last_used = time.monotonic()
+
+    async def _usable(self) -> bool:
+        if self.sent >= self.dispatcher.max_messages:
+            return False
+        if time.monotonic() - self.last_used < self.dispatcher.keepalive:
+            return True
+        try:
+            await self.smtp.noop()
+        except aiosmtplib.SMTPException:
+            return False
+        return True
+
+    async def _open(self):
+        d = self.dispatcher
+        smtp = aiosmtplib.SMTP(
+            hostname=d.host, port=d.port, timeout=d.timeout, start_tls=d.starttls
+        )
+        await smtp.connect()
+        try:
+            if d.password and smtp.supports_extension("auth"):
+                await smtp.login(d.username, d.password)
+        except BaseException:
+            smtp.close()
+            raise
+        self.smtp, self.sent = smtp, 0
+
+    async def close(self):
+        if self.smtp is None:
+            return
+        smtp, self.smtp = self.smtp, None
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+
+class AsyncioDispatcher(EmailDispatcher):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        starttls: bool = True,
+        timeout: float = 10,
+        concurrency: int = 4,
+        queue_size: int = 1000,
+        drain_timeout: float = 10,
+        keepalive: float = 30,
+        max_messages: int = 100,
+        max_retries: int = 5,
+        backoff: float = 5,
+        backoff_max: float = 600,
+    ):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.drain_timeout = drain_timeout
+        self.keepalive = keepalive
+        self.max_messages = max_messages
+        self.max_retries = max_retries
+        self.backoff, self.backoff_max = backoff, backoff_max
+        self._queue: asyncio.Queue[tuple[dict, int]] | None = None
+        self._workers: list[asyncio.Task] = []
+        self._retrying: set[asyncio.Task] = set()
+
+    async def send(self, messages: list[dict]):
+        await self._once_committed(partial(self._put, messages))
+
+    async def _put(self, messages: list[dict]):
+        """Queue ``messages``; waits only while the queue is full."""
+        if not self._workers:
+            self._queue = asyncio.Queue(self.queue_size)
+            self._workers = [
+                asyncio.create_task(self._work()) for _ in range(self.concurrency)
+            ]
+        for message in messages:
+            await self._queue.put((message, 0))
+
+    async def close(self):
+        """Wait for the queued messages to go out, then stop the workers."""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+        except TimeoutError:
+            logger.error(
+                "Email queue not drained, dropping %d messages",
+                self._queue.qsize() + len(self._retrying),
+            )
+        tasks = [*self._workers, *self._retrying]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers, self._retrying = [], set()
+
+    async def _work(self):
+        session = Session(self)
+        try:
+            while True:
+                message, retries = await self._queue.get()
+                try:
+                    await session.send(build_message(**message))
+                except Exception as err:
+                    self._failed(message, retries, err)
+                else:
+                    self._queue.task_done()
+        finally:
+            await session.close()
+
+    def _failed(self, message: dict, retries: int, err: Exception):
+        if not is_transient(err) or retries >= self.max_retries:
+            logger.error("Email to %s not sent: %s", message["to"], err)
+            self._queue.task_done()
+            return
+        delay = min(self.backoff * 2**retries, self.backoff_max)
+        task = asyncio.create_task(
+            self._requeue(message, retries + 1, delay * random.uniform(0.5, 1))
+        )
+        self._retrying.add(task)
+        task.add_done_callback(self._retrying.discard)
+
+    async def _requeue(self, message: dict, retries: int, delay: float):
+        # Counted as unfinished until it is back in the queue, so close()
+        # waits for it too.
+        try:
+            await asyncio.sleep(delay)
+            await self._queue.put((message, retries))
+        finally:
+            self._queue.task_done()
+
+
+_dispatcher: EmailDispatcher | None = None
+
+
+def get_dispatcher() -> EmailDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        if email_settings["backend"] == EmailBackend.inprocess:
+            _dispatcher = AsyncioDispatcher(
+                email_settings["smtp_server"],
+                email_settings["smtp_port"],
+                email_settings["email_from"],
+                email_settings["email_password"],
+                starttls=email_settings["starttls"],
+                timeout=email_settings["timeout"],
+                concurrency=email_settings["concurrency"],
+                queue_size=email_settings["queue_size"],
+                drain_timeout=email_settings["drain_timeout"],
+                keepalive=email_settings["keepalive_seconds"],
+                max_messages=email_settings["max_messages_per_connection"],
+                max_retries=email_settings["max_retries"],
+                backoff=email_settings["retry_backoff_seconds"],
+                backoff_max=email_settings["retry_backoff_max_seconds"],
+            )
+        elif email_settings["backend"] == EmailBackend.outbox:
+            _dispatcher = OutboxDispatcher()
+        else:
+            _dispatcher = CeleryDispatcher()
+    return _dispatcher
+
+
+async def close_dispatcher():
+    global _dispatcher
+    if _dispatcher is not None:
+        await _dispatcher.close()
+    _dispatcher = None
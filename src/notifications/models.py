@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, ForeignKey, Identity, Index, String, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.config.database import Base
+
+
+class Notification(Base):
+    """Something that happened to ``user_id``, e.g. a reply to their comment.
+
+    Keyed by recipient first, so one user's notifications are neighbours in
+    the primary key index. ``emailed_at`` is set once a digest covered it.
+    Rows are inserted in bulk, so the timestamps carry no index.
+    """
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32))
+    actor_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("users.id", ondelete="SET NULL"), nullable=True
+    )
+    post_id: Mapped[int]
+    comment_id: Mapped[int]
+    read_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+    emailed_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(), onupdate=datetime.now
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_notifications_unread",
+            "user_id",
+            postgresql_where=text("read_at IS NULL"),
+        ),
+        Index(
+            "ix_notifications_undigested",
+            "user_id",
+            postgresql_where=text("read_at IS NULL AND emailed_at IS NULL"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(user_id={self.user_id}, id={self.id})"
@@ -0,0 +1,35 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from src.monitoring.timing import TimedRoute
+from src.notifications.dao import NotificationDao
+from src.notifications.schemas import NotificationReadSchema
+from src.notifications.unread import unread
+from src.users.dependencies import get_current_user
+from src.users.models import User
+
+router = APIRouter(
+    prefix="/notifications", tags=["notifications"], route_class=TimedRoute
+)
+
+
+@router.get("/")
+async def get_notifications(
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[int] = Query(None),
+    user: User = Depends(get_current_user),
+):
+    return await NotificationDao.find_for_user(user.id, limit, before)
+
+
+@router.get("/unread-count/")
+async def get_unread_count(user: User = Depends(get_current_user)):
+    return {"unread": await unread.get(user.id)}
+
+
+@router.post("/read/")
+async def mark_notifications_read(
+    body: NotificationReadSchema, user: User = Depends(get_current_user)
+):
+    return {"read": await NotificationDao.mark_read(user.id, body.ids)}
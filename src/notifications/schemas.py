@@ -0,0 +1,8 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class NotificationReadSchema(BaseModel):
+    # None marks all of them as read.
+    ids: Optional[list[int]] = Field(None, max_length=100)
@@ -0,0 +1,113 @@
+"""Unread notification counts, served from Redis.
+
+``notifications:unread:{user_id}`` holds a user's count. New and read
+notifications move it by their delta once their transaction has committed,
+and only while it exists. A miss counts the unread rows (a scan of
+``ix_notifications_unread``). The result is stored only when nothing changed
+since the count started (``notifications:unread:{user_id}:version``), as in
+``subscription_cache``. Without Redis every read counts.
+"""
+
+import logging
+
+from redis.exceptions import RedisError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.database import after_commit, read_from_primary, session_scope
+from src.config.redis_client import get_redis
+from src.config.settings import settings
+from src.monitoring.metrics import CACHE_REQUESTS
+from src.notifications.models import Notification
+
+logger = logging.getLogger(__name__)
+
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then return 0 end
+redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[2])
+return 1
+"""
+
+ADD_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+return redis.call('INCRBY', KEYS[1], ARGV[1])
+"""
+
+
+class UnreadCounter:
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _keys(user_id: int) -> list[str]:
+        key = f"notifications:unread:{user_id}"
+        return [key, f"{key}:version"]
+
+    async def get(self, user_id: int) -> int:
+        keys = self._keys(user_id)
+        try:
+            cached, version = await get_redis().mget(keys)
+        except RedisError as err:
+            logger.warning("Unread counter: Redis unavailable: %s", err)
+            return await self._count(user_id)
+        if cached is not None:
+            CACHE_REQUESTS.labels("notifications_unread", "redis").inc()
+            return int(cached)
+
+        CACHE_REQUESTS.labels("notifications_unread", "miss").inc()
+        count = await self._count(user_id)
+        try:
+            await get_redis().register_script(LOAD_SCRIPT)(
+                keys=keys, args=[version or b"0", self.ttl, count]
+            )
+        except RedisError as err:
+            logger.warning("Unread counter: Redis unavailable: %s", err)
+        return count
+
+    def changed(self, session: AsyncSession, deltas: dict[int, int]):
+        """Move the counts by ``{user_id: delta}`` once ``session`` commits."""
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if deltas:
+            after_commit(session, lambda: self._apply(deltas))
+
+    async def clear(self):
+        try:
+            redis = get_redis()
+            async for key in redis.scan_iter("notifications:unread:*"):
+                await redis.delete(key)
+        except RedisError as err:
+            logger.warning("Unread counter: Redis unavailable: %s", err)
+
+    @staticmethod
+    async def _count(user_id: int) -> int:
+        # Cached until the next change, so it must not come from a lagging
+        # replica.
+        token = read_from_primary.set(True)
+        try:
+            async with session_scope() as session:
+                return await session.scalar(
+                    select(func.count()).where(
+                        Notification.user_id == user_id,
+                        Notification.read_at.is_(None),
+                    )
+                )
+        finally:
+            read_from_primary.reset(token)
+
+    async def _apply(self, deltas: dict[int, int]):
+        add = get_redis().register_script(ADD_SCRIPT)
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for user_id, delta in deltas.items():
+                    await add(
+                        keys=self._keys(user_id), args=[delta, self.ttl], client=pipe
+                    )
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("Unread counter: write-through failed: %s", err)
+
+
+unread = UnreadCounter(settings.NOTIFICATIONS_UNREAD_TTL_SECONDS)
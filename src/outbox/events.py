@@ -0,0 +1,9 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.outbox.models import OutboxEvent
+
+
+def emit(session: AsyncSession, topic: str, **payload):
+    """Record ``topic`` with the session's pending writes: it reaches the
+    relay only if they commit, and at least once if they do."""
+    session.add(OutboxEvent(topic=topic, payload=payload))
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.config.database import Base
+
+
+class OutboxEvent(Base):
+    """A side effect of a committed write, waiting for src/outbox/relay.py.
+
+    Rows live from the transaction that wrote them until the relay has
+    handed them on, so the table stays small and carries no index besides
+    the primary key.
+    """
+
+    __tablename__ = "outbox"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    topic: Mapped[str] = mapped_column(String(64))
+    payload: Mapped[dict] = mapped_column(JSONB)
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(id={self.id}, topic='{self.topic}')"
@@ -0,0 +1,151 @@
+"""Hands the events of the outbox table on to Celery and Redis streams.
+
+A batch is claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` and deleted in
+the same statement, then published before that transaction commits: several
+relays share the table without waiting on each other, and a batch that could
+not be published comes back with the rollback. A relay that dies between
+publishing and committing publishes its batch again, so delivery is at least
+once; consumers dedupe on the event id (the ``outbox-{id}`` Celery task id,
+the ``id`` field of a stream entry). Order holds within a batch only.
+
+Topics listed in ``TASKS`` become Celery tasks, called with the payload as
+keyword arguments; every other topic is appended to the ``events:{topic}``
+stream, capped at about ``OUTBOX_STREAM_MAXLEN`` entries. Topics in
+``HANDLERS`` are also applied to the database in the claiming transaction, a
+batch of payloads at a time, so they take effect exactly once.
+
+    python -m src.outbox.relay
+"""
+
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Sequence
+
+from sqlalchemy import Row, delete, select
+
+from src.celery_app import celery_app
+from src.config.database import engine, transaction
+from src.config.redis_client import close_redis, get_redis
+from src.config.settings import settings
+from src.notifications.dao import NotificationDao
+from src.outbox.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+TASKS = {
+    "email.send": "src.tasks.send_email.send_emails",
+    "email.verification": "src.tasks.send_email.send_verification_email",
+}
+
+HANDLERS = {
+    "comment.created": NotificationDao.record_comments,
+}
+
+
+class Sink(ABC):
+    @abstractmethod
+    async def publish(self, events: Sequence[Row]): ...
+
+
+class CelerySink(Sink):
+    def __init__(self, app=celery_app):
+        self.app = app
+
+    async def publish(self, events: Sequence[Row]):
+        await asyncio.to_thread(self._publish, events)
+
+    def _publish(self, events: Sequence[Row]):
+        for event in events:
+            self.app.send_task(
+                TASKS[event.topic], kwargs=event.payload, task_id=f"outbox-{event.id}"
+            )
+
+
+class StreamSink(Sink):
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+
+    async def publish(self, events: Sequence[Row]):
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.xadd(
+                    f"events:{event.topic}",
+                    {"id": event.id, "payload": json.dumps(event.payload)},
+                    maxlen=self.maxlen,
+                    approximate=True,
+                )
+            await pipe.execute()
+
+
+class RoutingSink(Sink):
+    def __init__(self, tasks: Sink, streams: Sink):
+        self.tasks = tasks
+        self.streams = streams
+
+    async def publish(self, events: Sequence[Row]):
+        if tasks := [event for event in events if event.topic in TASKS]:
+            await self.tasks.publish(tasks)
+        if streams := [event for event in events if event.topic not in TASKS]:
+            await self.streams.publish(streams)
+
+
+def claim_query(batch_size: int):
+    claimed = (
+        select(OutboxEvent.id)
+        .order_by(OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .cte("claimed")
+    )
+    return (
+        delete(OutboxEvent)
+        .where(OutboxEvent.id == claimed.c.id)
+        .returning(OutboxEvent.id, OutboxEvent.topic, OutboxEvent.payload)
+    )
+
+
+async def relay_once(sink: Sink, batch_size: int) -> int:
+    """Publish and delete up to ``batch_size`` events; returns how many."""
+    async with transaction() as session:
+        result = await session.execute(claim_query(batch_size))
+        events = sorted(result.all())
+        for topic, handle in HANDLERS.items():
+            if payloads := [event.payload for event in events if event.topic == topic]:
+                await handle(session, payloads)
+        if events:
+            await sink.publish(events)
+    return len(events)
+
+
+async def run(sink: Sink, batch_size: int, poll_seconds: float, retry_seconds: float):
+    while True:
+        try:
+            relayed = await relay_once(sink, batch_size)
+        except Exception:
+            logger.warning("Outbox relay failed, retrying", exc_info=True)
+            await asyncio.sleep(retry_seconds)
+            continue
+        # A full batch means more are probably waiting.
+        if relayed < batch_size:
+            await asyncio.sleep(poll_seconds)
+
+
+async def main():
+    sink = RoutingSink(CelerySink(), StreamSink(settings.OUTBOX_STREAM_MAXLEN))
+    try:
+        await run(
+            sink,
+            settings.OUTBOX_BATCH_SIZE,
+            settings.OUTBOX_POLL_SECONDS,
+            settings.OUTBOX_RETRY_SECONDS,
+        )
+    finally:
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""Denormalized counters, kept in step with their source rows.
+
+Writers call the helpers below inside the transaction that inserts or deletes
+the source row; every change is a single ``UPDATE ... SET x = x + :delta``, so
+concurrent writers never lose increments. ``reconcile`` recomputes the
+counters from the source tables in id ranges to repair any drift.
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import Integer, case, column, func, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from src.config.database import session_scope, transaction
+from src.posts.models import Comment, Post, Subreddit, Subscription, Vote
+
+# Rows without a vote (outer join) count as 0.
+VOTE_VALUE = case((Vote.is_upvote, 1), (~Vote.is_upvote, -1), else_=0)
+
+
+@dataclass(frozen=True)
+class Counter:
+    name: str
+    column: object  # the counter, e.g. Post.comments_count
+    source_key: object  # source column pointing at the counted row
+    value: object = None  # aggregated per source row; None counts rows
+    # Target rows with this column set are frozen (archived posts): ``add``
+    # skips them and ``reconcile`` leaves them alone, their sources are gone.
+    archived: object = None
+
+    @property
+    def model(self):
+        return self.column.class_
+
+    async def add(self, session: AsyncSession, obj_id: int, delta: int):
+        """Apply ``delta`` and return the new value, ``None`` if the row is
+        missing or frozen."""
+        query = update(self.model).where(self.model.id == obj_id)
+        if self.archived is not None:
+            query = query.where(self.archived.is_(None))
+        result = await session.execute(
+            query.values({self.column: self.column + delta}).returning(self.column)
+        )
+        return result.scalar_one_or_none()
+
+    async def add_many(self, session: AsyncSession, deltas: dict[int, int]):
+        """Apply a delta per row with one ``UPDATE ... FROM (VALUES ...)``."""
+        deltas = {obj_id: delta for obj_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        data = values(
+            column("id", Integer), column("delta", Integer), name="deltas"
+        ).data(sorted(deltas.items()))
+        query = update(self.model).where(self.model.id == data.c.id)
+        if self.archived is not None:
+            query = query.where(self.archived.is_(None))
+        await session.execute(query.values({self.column: self.column + data.c.delta}))
+
+    def reconcile_query(self, start: int, end: int):
+        """Correct the counters of ids in ``[start, end)``.
+
+        The correction is applied as a delta against the value read together
+        with the source rows, so a write committed while the batch runs is not
+        overwritten. Only the target rows that drifted are updated and locked.
+        """
+        target = aliased(self.model)
+        counted = getattr(target, self.column.key)
+        value = (
+            func.count(self.source_key)
+            if self.value is None
+            else func.coalesce(func.sum(self.value), 0)
+        )
+        fresh = (
+            select(target.id, counted.label("seen"), value.label("actual"))
+            .outerjoin(self.source_key.table, self.source_key == target.id)
+            .where(target.id >= start, target.id < end)
+            .group_by(target.id, counted)
+        )
+        if self.archived is not None:
+            fresh = fresh.where(getattr(target, self.archived.key).is_(None))
+        fresh = fresh.subquery("fresh")
+        return (
+            update(self.model)
+            .where(self.model.id == fresh.c.id, fresh.c.actual != fresh.c.seen)
+            .values({self.column: self.column + (fresh.c.actual - fresh.c.seen)})
+        )
+
+    async def reconcile(self, start: int, end: int) -> int:
+        async with transaction() as session:
+            result = await session.execute(self.reconcile_query(start, end))
+        return result.rowcount
+
+    async def max_id(self) -> int:
+        async with session_scope() as session:
+            result = await session.execute(select(func.max(self.model.id)))
+        return result.scalar() or 0
+
+
+subscribers = Counter(
+    "subscribers", Subreddit.subscribers_count, Subscription.subreddit_id
+)
+comments = Counter(
+    "comments", Post.comments_count, Comment.post_id, archived=Post.archived_at
+)
+replies = Counter("replies", Comment.replies_count, Comment.parent_comment_id)
+post_votes = Counter(
+    "post_votes", Post.upvote, Vote.post_id, VOTE_VALUE, archived=Post.archived_at
+)
+comment_votes = Counter("comment_votes", Comment.upvote, Vote.comment_id, VOTE_VALUE)
+
+COUNTERS = (subscribers, comments, replies, post_votes, comment_votes)
+
+
+def votes_for(model) -> Counter:
+    return post_votes if model is Post else comment_votes
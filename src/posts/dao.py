@@ -1,166 +1,316 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+
 from asyncpg import UniqueViolationError
 from fastapi import HTTPException
-from sqlalchemy import String, cast, or_, select
+from sqlalchemy import (
+    String,
+    bindparam,
+    cast,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy import delete as sqlalchemy_delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm import aliased, joinedload, selectinload
 
-from src.config.database import async_session_maker
+from src.config.database import session_scope, transaction
+from src.config.partitions import CREATED_AT_SLACK
 from src.dao.base import BaseDao
-from src.posts.models import Comment, Post, Subreddit, Subscription, Vote
+from src.outbox.events import emit
+from src.posts import counters, live
+from src.posts.feed import feed_heads
+from src.posts.models import (
+    Comment,
+    Post,
+    PostArchive,
+    Subreddit,
+    Subscription,
+    Vote,
+)
 from src.posts.schemas import PostResponse
+from src.posts.subscription_cache import subscription_cache
+
+logger = logging.getLogger(__name__)
+
+
+def created_since_post(model, post_id: int):
+    """Lower bound on ``model.created_at`` for rows belonging to ``post_id``,
+    so Postgres skips the partitions older than the post at execution time."""
+    post_created_at = select(Post.created_at).where(Post.id == post_id)
+    return model.created_at >= post_created_at.scalar_subquery() - CREATED_AT_SLACK
+
+
+def comment_tree(comments: list[Comment]) -> list[dict]:
+    """Nest ``comments`` (with ``user`` loaded) under their parents and
+    return the roots, keeping the given order at every level."""
+    comment_dict = {}
+    for comment in comments:
+        data = comment.to_dict(include_replies=False)
+        data["children"] = []
+
+        if comment.user:
+            data["user"] = {
+                "id": comment.user.id,
+                "username": comment.user.username,
+                "nickname": comment.user.nickname,
+            }
+        else:
+            data["user"] = None
+        comment_dict[comment.id] = data
+
+    root_comments = []
+    for comment in comments:
+        if comment.parent_comment_id is None:
+            root_comments.append(comment_dict[comment.id])
+        else:
+            parent = comment_dict.get(comment.parent_comment_id)
+            if parent:
+                parent["children"].append(comment_dict[comment.id])
+            else:
+                logger.warning(
+                    "Не найден родительский комментарий для comment_id %s: parent_comment_id %s",
+                    comment.id,
+                    comment.parent_comment_id,
+                )
+    return root_comments
+
+
+def post_responses(posts: list[Post], votes: dict[int, bool]) -> list[PostResponse]:
+    """``posts`` with the viewer's vote from ``votes``, keyed by post id."""
+    return [
+        PostResponse(
+            id=post.id,
+            title=post.title,
+            content=post.content,
+            subreddit_id=post.subreddit_id,
+            user_id=post.user_id,
+            upvote=post.upvote,
+            created_at=post.created_at,
+            user_vote=votes.get(post.id),
+        )
+        for post in posts
+    ]
 
 
-class ForumDao(BaseDao):
-    model = None
+def thread_ids(roots: list[dict]) -> list[int]:
+    """Ids of every comment in the ``comment_tree`` threads of ``roots``."""
+    ids = []
 
-    @classmethod
-    async def add_forum(cls, data, user):
-        async with async_session_maker() as session:
-            async with session.begin():
-                new_instance = cls.model(**data)
-                new_instance.user = user
-                session.add(new_instance)
-                try:
-                    await session.commit()
-                except IntegrityError:
-                    await session.rollback()
-                except SQLAlchemyError as e:
-                    await session.rollback()
-                    return {
-                        "error": "An unexpected error occurred while adding the post.",
-                        "message": e,
-                    }
-                return {"data": new_instance}
+    def collect(comment: dict):
+        ids.append(comment["id"])
+        for child in comment["children"]:
+            collect(child)
 
-    @classmethod
-    async def up_vote(cls, obj_id, is_upvote, user):
-        async with async_session_maker() as session:
-            async with session.begin():
-                post = await session.execute(select(cls.model).filter_by(id=obj_id))
-                post = post.scalars().first()
+    for root in roots:
+        collect(root)
+    return ids
 
-                if not post:
-                    return {"error": "Post or comment not found."}
 
-                if isinstance(post, Post):
-                    vote_query = select(Vote).filter_by(user_id=user.id, post_id=obj_id)
-                else:
-                    vote_query = select(Vote).filter_by(
-                        user_id=user.id, comment_id=obj_id
-                    )
+def assign_votes(roots: list[dict], votes: dict[int, bool]):
+    """Set ``user_vote`` on every comment in the threads of ``roots``."""
 
-                vote_result = await session.execute(vote_query)
-                vote = vote_result.scalars().first()
+    def assign(comment: dict):
+        comment["user_vote"] = votes.get(comment["id"])
+        for child in comment["children"]:
+            assign(child)
 
-                if vote:
-                    if is_upvote != vote.is_upvote:
-                        if is_upvote:
-                            post.upvote += 2
-                        else:
-                            post.upvote -= 2
-                        vote.is_upvote = is_upvote
-                else:
-                    if isinstance(post, Post):
-                        new_vote = Vote(
-                            user_id=user.id, post_id=post.id, is_upvote=is_upvote
-                        )
-                    else:
-                        new_vote = Vote(
-                            user_id=user.id, comment_id=post.id, is_upvote=is_upvote
-                        )
-
-                    if is_upvote:
-                        post.upvote += 1
-                        new_vote.is_upvote = True
-                    else:
-                        post.upvote -= 1
-                        new_vote.is_upvote = False
-                    session.add(new_vote)
-
-                try:
-                    await session.commit()
-                except IntegrityError:
-                    await session.rollback()
-                except SQLAlchemyError:
-                    await session.rollback()
-                    return {
-                        "error": "An unexpected error occurred while adding the vote."
-                    }
-                return {"message": "upvoted!", "upvotes": post.upvote}
+    for root in roots:
+        assign(root)
+
+
+async def reject_if_archived(session: AsyncSession, post_id: int):
+    """Only called once a write found no live row, to tell an archived post
+    from a missing one; the happy path never pays for it."""
+    archived_at = await session.scalar(
+        select(Post.archived_at).where(Post.id == post_id)
+    )
+    if archived_at is not None:
+        raise HTTPException(
+            status_code=409, detail="Пост в архиве и доступен только для чтения"
+        )
+
+
+class ForumDao(BaseDao):
+    model = None
 
     @classmethod
-    async def remove_vote(cls, obj_id, user):
-        async with async_session_maker() as session:
-            async with session.begin():
-                post = await session.execute(select(cls.model).filter_by(id=obj_id))
-                post = post.scalars().first()
-                if not post:
-                    return {"error": "Post not found."}
-
-                if isinstance(post, Post):
-                    vote_query = select(Vote).filter_by(user_id=user.id, post_id=obj_id)
-                else:
-                    vote_query = select(Vote).filter_by(
-                        user_id=user.id, comment_id=obj_id
-                    )
-                vote_result = await session.execute(vote_query)
-                vote = vote_result.scalars().first()
+    async def add_forum(cls, data, user):
+        async with transaction() as session:
+            new_instance = cls.model(**data)
+            new_instance.user = user
+            session.add(new_instance)
+            try:
+                await session.flush()
+            except IntegrityError as err:
+                # The request's transaction is aborted: fail the request, so
+                # it is rolled back, rather than carry on writing to it.
+                raise HTTPException(
+                    status_code=400, detail="Сабреддит не найден"
+                ) from err
+            except SQLAlchemyError as err:
+                raise HTTPException(
+                    status_code=500,
+                    detail="An unexpected error occurred while adding the post.",
+                ) from err
+            if cls.model is Post:
+                feed_heads.pushed(session, new_instance)
+                emit(
+                    session,
+                    "post.created",
+                    id=new_instance.id,
+                    subreddit_id=new_instance.subreddit_id,
+                    user_id=user.id,
+                )
+            return {"data": new_instance}
 
-                if vote:
-                    if vote.is_upvote:
-                        post.upvote -= 1
-                    else:
-                        post.upvote += 1
+    @classmethod
+    def _vote_target(cls, obj_id) -> dict:
+        if cls.model is Post:
+            return {"post_id": obj_id}
+        return {"comment_id": obj_id}
 
-                    await session.delete(vote)
+    @classmethod
+    async def _lock_vote(cls, session: AsyncSession, user_id: int, obj_id: int):
+        """Serialize the vote writes of one user on one post or comment until
+        the transaction ends. ``votes`` has no unique key (it is partitioned
+        by ``created_at``), so without it two first votes both insert a row
+        and both count, and two flips both count twice."""
+        key = obj_id if cls.model is Post else -obj_id
+        await session.execute(select(func.pg_advisory_xact_lock(user_id, key)))
 
-                    try:
-                        await session.commit()
-                    except SQLAlchemyError:
-                        await session.rollback()
-                        return {
-                            "error": "An unexpected error occurred while removing the vote."
-                        }
+    @classmethod
+    async def up_vote(cls, obj_id, is_upvote, user):
+        target = cls._vote_target(obj_id)
+        async with transaction() as session:
+            await cls._lock_vote(session, user.id, obj_id)
+            vote_result = await session.execute(
+                select(Vote).filter_by(user_id=user.id, **target)
+            )
+            vote = vote_result.scalars().first()
+
+            value = 1 if is_upvote else -1
+            if vote is None:
+                delta = value
+            elif vote.is_upvote != is_upvote:
+                delta = 2 * value
+            else:
+                delta = 0
+
+            upvotes = await counters.votes_for(cls.model).add(session, obj_id, delta)
+            if upvotes is None:
+                if cls.model is Post:
+                    await reject_if_archived(session, obj_id)
+                return {"error": "Post or comment not found."}
+
+            if vote is None:
+                session.add(Vote(user_id=user.id, is_upvote=is_upvote, **target))
+            else:
+                vote.is_upvote = is_upvote
+            if delta:
+                emit(
+                    session, "vote.cast", user_id=user.id, is_upvote=is_upvote, **target
+                )
+                if cls.model is Post:
+                    live.post_changed(session, obj_id, upvotes=upvotes)
+
+            try:
+                await session.flush()
+            except SQLAlchemyError as err:
+                raise HTTPException(
+                    status_code=500,
+                    detail="An unexpected error occurred while adding the vote.",
+                ) from err
+            return {"message": "upvoted!", "upvotes": upvotes}
 
-                    return {"message": "Vote removed!", "upvotes": post.upvote}
+    @classmethod
+    async def remove_vote(cls, obj_id, user):
+        async with transaction() as session:
+            await cls._lock_vote(session, user.id, obj_id)
+            try:
+                result = await session.execute(
+                    sqlalchemy_delete(Vote)
+                    .filter_by(user_id=user.id, **cls._vote_target(obj_id))
+                    .returning(Vote.is_upvote)
+                )
+                removed = result.scalars().all()
+                if not removed:
+                    if await session.get(cls.model, obj_id) is None:
+                        return {"error": "Post not found."}
+                    if cls.model is Post:
+                        await reject_if_archived(session, obj_id)
+                    return {"error": "Vote not found."}
+
+                delta = sum(-1 if is_upvote else 1 for is_upvote in removed)
+                upvotes = await counters.votes_for(cls.model).add(
+                    session, obj_id, delta
+                )
+                emit(
+                    session,
+                    "vote.removed",
+                    user_id=user.id,
+                    **cls._vote_target(obj_id),
+                )
+                if cls.model is Post:
+                    live.post_changed(session, obj_id, upvotes=upvotes)
+            except SQLAlchemyError as err:
+                raise HTTPException(
+                    status_code=500,
+                    detail="An unexpected error occurred while removing the vote.",
+                ) from err
 
-                return {"error": "Vote not found."}
+            return {"message": "Vote removed!", "upvotes": upvotes}
 
 
 class SubredditDao(ForumDao):
     model = Subreddit
 
     @classmethod
-    async def add_subreddit(cls, data, user):
-        async with async_session_maker() as session:
-            async with session.begin():
-                new_instance = cls.model(**data)
-                new_instance.created_by = user
-
-                session.add(new_instance)
-                try:
-                    await session.commit()
-                except IntegrityError as e:
-                    await session.rollback()
-                    if isinstance(e.orig, UniqueViolationError):
-                        raise HTTPException(
-                            status_code=400, detail="Subreddit already exists"
-                        ) from None
-                    return {
-                        "error": "An unexpected error occurred while adding the post."
-                    }
-                except SQLAlchemyError:
-                    await session.rollback()
-                    return {
-                        "error": "An unexpected error occurred while adding the post."
-                    }
+    async def delete_by_id(cls, obj_id: int):
+        async with transaction() as session:
+            result = await session.execute(
+                sqlalchemy_delete(Subreddit).filter_by(id=obj_id).returning(Subreddit)
+            )
+            subreddit = result.scalars().one_or_none()
+            if subreddit is not None:
+                feed_heads.dropped(session, obj_id)
+            return subreddit
 
-                return {"message": f"{cls.model.__name__} added successfully"}
+    @classmethod
+    async def add_subreddit(cls, data, user):
+        async with transaction() as session:
+            new_instance = cls.model(**data)
+            new_instance.created_by = user
+
+            session.add(new_instance)
+            try:
+                await session.flush()
+            except IntegrityError as e:
+                if isinstance(e.orig.__cause__, UniqueViolationError):
+                    raise HTTPException(
+                        status_code=400, detail="Subreddit already exists"
+                    ) from None
+                raise HTTPException(
+                    status_code=400, detail="Некорректные данные сабреддита"
+                ) from e
+            except SQLAlchemyError as err:
+                raise HTTPException(
+                    status_code=500,
+                    detail="An unexpected error occurred while adding the subreddit.",
+                ) from err
+
+            return {"message": f"{cls.model.__name__} added successfully"}
 
     @staticmethod
     async def get_subreddit_with_creator(data_id: int):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             query = (
                 select(Subreddit)
                 .filter_by(id=data_id)
@@ -173,9 +323,56 @@ class SubredditDao(ForumDao):
 class PostDao(ForumDao):
     model = Post
 
+    @classmethod
+    async def update(cls, filter_by, **values):
+        async with transaction() as session:
+            # Subqueries in RETURNING still see the row as it was before.
+            before = aliased(Post)
+            old_subreddit_id = (
+                select(before.subreddit_id)
+                .where(before.id == Post.id, before.created_at == Post.created_at)
+                .scalar_subquery()
+            )
+            result = await session.execute(
+                update(Post)
+                .where(*[getattr(Post, k) == v for k, v in filter_by.items()])
+                .values(**values)
+                .execution_options(synchronize_session="fetch")
+                .returning(Post, old_subreddit_id)
+            )
+            row = result.one_or_none()
+            if row is None:
+                return None
+            post, subreddit_id = row
+            if subreddit_id != post.subreddit_id:
+                feed_heads.removed(session, post, subreddit_id)
+                feed_heads.pushed(session, post)
+            emit(
+                session,
+                "post.updated",
+                id=post.id,
+                subreddit_id=post.subreddit_id,
+                old_subreddit_id=subreddit_id,
+            )
+            return post
+
+    @classmethod
+    async def delete_by_id(cls, obj_id: int):
+        async with transaction() as session:
+            result = await session.execute(
+                sqlalchemy_delete(Post).filter_by(id=obj_id).returning(Post)
+            )
+            post = result.scalars().one_or_none()
+            if post is not None:
+                feed_heads.removed(session, post)
+                emit(
+                    session, "post.deleted", id=post.id, subreddit_id=post.subreddit_id
+                )
+            return post
+
     @classmethod
     async def find_my_posts(cls, **filter_by):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             query_post = (
                 select(Post)
                 .filter_by(**filter_by)
@@ -195,28 +392,11 @@ class PostDao(ForumDao):
             select(Vote).where(Vote.post_id.in_(post_ids), Vote.user_id == user_id)
         )
         votes = vote_query.scalars().all()
-        vote_map = {vote.post_id: vote for vote in votes}
-
-        result = []
-        for post in posts:
-            vote = vote_map.get(post.id)
-            result.append(
-                PostResponse(
-                    id=post.id,
-                    title=post.title,
-                    content=post.content,
-                    subreddit_id=post.subreddit_id,
-                    user_id=post.user_id,
-                    upvotes=post.upvote,
-                    created_at=post.created_at,
-                    user_vote=vote.is_upvote if vote else None,
-                )
-            )
-        return result
+        return post_responses(posts, {vote.post_id: vote.is_upvote for vote in votes})
 
     @classmethod
     async def find_by_search(cls, limit: int, offset: int, search: str = None):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             if not search:
                 return []
             query = (
@@ -238,7 +418,7 @@ class PostDao(ForumDao):
     async def get_posts_by_subreddit_id(
         subreddit_id: int, limit: int = 20, offset: int = 20
     ):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             query = (
                 select(Post)
                 .filter_by(subreddit_id=subreddit_id)
@@ -250,14 +430,22 @@ class PostDao(ForumDao):
             return result.scalars().all()
 
     @staticmethod
-    async def get_post_by_id(post_id: int):
-        async with async_session_maker() as session:
-            query = (
-                select(Post)
-                .filter_by(id=post_id)
-                .options(joinedload(Post.subreddit), joinedload(Post.user))
-            )
-            result = await session.execute(query)
+    async def get_live_state(post_id: int) -> dict | None:
+        query = select(Post.upvote, Post.comments_count).where(Post.id == post_id)
+        async with session_scope() as session:
+            row = (await session.execute(query)).one_or_none()
+        return None if row is None else {"upvotes": row[0], "comments_count": row[1]}
+
+    @classmethod
+    async def get_post_by_id(cls, post_id: int):
+        query = cls.statement(
+            "by_id_with_relations",
+            lambda: select(Post)
+            .where(Post.id == bindparam("id"))
+            .options(joinedload(Post.subreddit), joinedload(Post.user)),
+        )
+        async with session_scope() as session:
+            result = await session.execute(query, {"id": post_id})
             return result.scalar_one_or_none()
 
 
@@ -268,10 +456,11 @@ class CommentDao(ForumDao):
     async def get_comments_with_children_by_post(
         cls, post_id: int, offset: int = 0, limit: int = 20
     ):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             query = (
                 select(cls.model)
                 .filter_by(post_id=post_id)
+                .where(created_since_post(Comment, post_id))
                 .order_by(Comment.created_at.asc())
             )
             result = await session.execute(query)
@@ -305,10 +494,11 @@ class CommentDao(ForumDao):
 
     @staticmethod
     async def get_comment_child(post_id, offset: int = 0, limit: int = 20):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             query = (
                 select(Comment)
                 .filter_by(post_id=post_id)
+                .where(created_since_post(Comment, post_id))
                 .offset(offset)
                 .limit(limit)
                 .order_by(Comment.created_at.asc())
@@ -318,41 +508,100 @@ class CommentDao(ForumDao):
 
     @staticmethod
     async def add_comment(data, user):
-        async with async_session_maker() as session:
-            async with session.begin():
-                new_instance = Comment(**data)
-                new_instance.user = user
-
-                post = await session.get(Post, new_instance.post_id)
-                if not post:
-                    await session.rollback()
-                    return {"error": "Post not found."}
-
-                post.comments_count += 1
-
-                session.add(new_instance)
-                try:
-                    await session.commit()
-                except IntegrityError:
-                    await session.rollback()
-                    return {"error": "Integrity error occurred."}
-                except SQLAlchemyError as e:
-                    await session.rollback()
-                    return {
-                        "error": "An unexpected error occurred while adding the comment.",
-                        "message": str(e),
-                    }
-                return {"data": new_instance}
+        async with transaction() as session:
+            comments_count = await counters.comments.add(session, data["post_id"], 1)
+            if comments_count is None:
+                await reject_if_archived(session, data["post_id"])
+                return {"error": "Post not found."}
+            parent_id = data.get("parent_comment_id")
+            if (
+                parent_id is not None
+                and await counters.replies.add(session, parent_id, 1) is None
+            ):
+                raise HTTPException(
+                    status_code=404, detail="Комментарий для ответа не найден"
+                )
 
-    @staticmethod
-    async def get_comment_by_id(comment_id: int):
-        async with async_session_maker() as session:
-            query = (
-                select(Comment)
-                .filter_by(id=comment_id)
-                .options(joinedload(Comment.user))
+            new_instance = Comment(**data)
+            new_instance.user = user
+            session.add(new_instance)
+            try:
+                await session.flush()
+            except IntegrityError as err:
+                raise HTTPException(
+                    status_code=400, detail="Некорректные данные комментария"
+                ) from err
+            except SQLAlchemyError as err:
+                raise HTTPException(
+                    status_code=500,
+                    detail="An unexpected error occurred while adding the comment.",
+                ) from err
+            emit(
+                session,
+                "comment.created",
+                id=new_instance.id,
+                post_id=new_instance.post_id,
+                parent_comment_id=parent_id,
+                user_id=user.id,
             )
-            book = await session.execute(query)
+            live.post_changed(
+                session,
+                new_instance.post_id,
+                comments_count=comments_count,
+                comment={
+                    "id": new_instance.id,
+                    "parent_comment_id": parent_id,
+                    "user_id": user.id,
+                },
+            )
+            return {"data": new_instance}
+
+    @staticmethod
+    async def delete_with_replies(comment: Comment) -> int:
+        """Delete ``comment`` and its whole reply subtree in one statement and
+        move the post and parent counters by what was actually removed."""
+        subtree = (
+            select(Comment.id)
+            .where(Comment.id == comment.id)
+            .cte("subtree", recursive=True)
+        )
+        subtree = subtree.union_all(
+            select(Comment.id).where(Comment.parent_comment_id == subtree.c.id)
+        )
+        # The DELETE is the statement itself, not a CTE under a SELECT, so
+        # it is routed to the primary like any other write.
+        deleted = (
+            sqlalchemy_delete(Comment)
+            .where(Comment.id.in_(select(subtree.c.id)))
+            .returning(Comment.id)
+            .execution_options(synchronize_session=False)
+        )
+        async with transaction() as session:
+            result = await session.execute(deleted)
+            removed = len(result.all())
+            if removed:
+                await counters.comments.add(session, comment.post_id, -removed)
+                if comment.parent_comment_id is not None:
+                    await counters.replies.add(session, comment.parent_comment_id, -1)
+                emit(
+                    session,
+                    "comment.deleted",
+                    id=comment.id,
+                    post_id=comment.post_id,
+                    removed=removed,
+                )
+        return removed
+
+    @classmethod
+    async def get_comment_by_id(cls, comment_id: int):
+        query = cls.statement(
+            "by_id_with_user",
+            lambda: select(Comment)
+            .where(Comment.id == bindparam("id"))
+            .options(joinedload(Comment.user)),
+        )
+        async with session_scope() as session:
+            book = await session.execute(query, {"id": comment_id})
             return book.scalar_one_or_none()
 
 
@@ -361,20 +610,30 @@ class VoteDao(ForumDao):
 
     @classmethod
     async def get_user_votes_for_comments(cls, user_id, comment_ids: list[int]):
-        async with async_session_maker() as session:
-            query = select(Vote).filter(
-                Vote.user_id == user_id, Vote.comment_id.in_(comment_ids)
+        query = cls.statement(
+            "user_votes_for_comments",
+            lambda: select(Vote).where(
+                Vote.user_id == bindparam("user_id"),
+                Vote.comment_id.in_(bindparam("ids", expanding=True)),
+            ),
+        )
+        async with session_scope() as session:
+            result = await session.execute(
+                query, {"user_id": user_id, "ids": comment_ids}
             )
-            result = await session.execute(query)
             return result.scalars().all()
 
-    @staticmethod
-    async def get_post_votes_by_user(user_id: int, post_ids: list[int]):
-        async with async_session_maker() as session:
-            query = select(Vote).where(
-                Vote.user_id == user_id, Vote.post_id.in_(post_ids)
-            )
-            result = await session.execute(query)
+    @classmethod
+    async def get_post_votes_by_user(cls, user_id: int, post_ids: list[int]):
+        query = cls.statement(
+            "user_votes_for_posts",
+            lambda: select(Vote).where(
+                Vote.user_id == bindparam("user_id"),
+                Vote.post_id.in_(bindparam("ids", expanding=True)),
+            ),
+        )
+        async with session_scope() as session:
+            result = await session.execute(query, {"user_id": user_id, "ids": post_ids})
             votes = result.scalars().all()
 
         return [
@@ -385,9 +644,222 @@ class VoteDao(ForumDao):
 class SubscriptionDao(ForumDao):
     model = Subscription
 
+    @classmethod
+    async def subscribe(cls, subreddit_id: int, user):
+        async with transaction() as session:
+            subscription = Subscription(subreddit_id=subreddit_id)
+            subscription.user = user
+            session.add(subscription)
+            try:
+                await session.flush()
+            except IntegrityError as err:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Subreddit not found or already subscribed.",
+                ) from err
+            except SQLAlchemyError as err:
+                raise HTTPException(
+                    status_code=500,
+                    detail="An unexpected error occurred while subscribing.",
+                ) from err
+            await counters.subscribers.add(session, subreddit_id, 1)
+            subscription_cache.updated(session, user.id, added=[subreddit_id])
+            emit(
+                session,
+                "subscription.changed",
+                user_id=user.id,
+                added=[subreddit_id],
+                removed=[],
+            )
+            return {"data": subscription}
+
+    @classmethod
+    async def unsubscribe(cls, subscription_id: int):
+        async with transaction() as session:
+            result = await session.execute(
+                sqlalchemy_delete(Subscription)
+                .where(Subscription.id == subscription_id)
+                .returning(Subscription.user_id, Subscription.subreddit_id)
+            )
+            row = result.one_or_none()
+            if row is not None:
+                await counters.subscribers.add(session, row.subreddit_id, -1)
+                subscription_cache.updated(
+                    session, row.user_id, removed=[row.subreddit_id]
+                )
+                emit(
+                    session,
+                    "subscription.changed",
+                    user_id=row.user_id,
+                    added=[],
+                    removed=[row.subreddit_id],
+                )
+
+    @classmethod
+    async def bulk_update(
+        cls, user_id: int, subscribe: list[int], unsubscribe: list[int]
+    ):
+        """Subscribe to and unsubscribe from several subreddits in one
+        transaction. Unknown subreddits, existing subscriptions and missing
+        ones are skipped; returns the ids that actually changed."""
+        async with transaction() as session:
+            added, removed = [], []
+            if subscribe:
+                result = await session.execute(
+                    pg_insert(Subscription)
+                    .from_select(
+                        ["subreddit_id", "user_id"],
+                        select(Subreddit.id, literal(user_id)).where(
+                            Subreddit.id.in_(subscribe)
+                        ),
+                    )
+                    .on_conflict_do_nothing(index_elements=["user_id", "subreddit_id"])
+                    .returning(Subscription.subreddit_id)
+                )
+                added = sorted(result.scalars())
+            if unsubscribe:
+                result = await session.execute(
+                    sqlalchemy_delete(Subscription)
+                    .where(
+                        Subscription.user_id == user_id,
+                        Subscription.subreddit_id.in_(unsubscribe),
+                    )
+                    .returning(Subscription.subreddit_id)
+                )
+                removed = sorted(result.scalars())
+
+            deltas = dict.fromkeys(added, 1) | dict.fromkeys(removed, -1)
+            await counters.subscribers.add_many(session, deltas)
+            subscription_cache.updated(session, user_id, added, removed)
+            if added or removed:
+                emit(
+                    session,
+                    "subscription.changed",
+                    user_id=user_id,
+                    added=added,
+                    removed=removed,
+                )
+            return {"subscribed": added, "unsubscribed": removed}
+
     @classmethod
     async def find_all_subscriptions(cls, filter_by):
-        async with async_session_maker() as session:
+        async with session_scope() as session:
             query = select(cls.model).filter_by(**filter_by)
             book = await session.execute(query)
             return book.scalars().all()
+
+
+class PostArchiveDao(BaseDao):
+    model = PostArchive
+
+    @staticmethod
+    async def archive_posts(cutoff: datetime, limit: int) -> int:
+        """Archive up to ``limit`` posts created before ``cutoff``.
+
+        Their comment trees and votes are snapshotted into ``PostArchive``,
+        the live comments and votes are deleted and the posts marked
+        read-only, all in one transaction. Returns how many were archived.
+        """
+        async with transaction() as session:
+            post_ids = (
+                (
+                    await session.execute(
+                        select(Post.id)
+                        .where(Post.archived_at.is_(None), Post.created_at < cutoff)
+                        .order_by(Post.created_at)
+                        .limit(limit)
+                        .with_for_update(skip_locked=True)
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            if not post_ids:
+                return 0
+            comment_ids = select(Comment.id).where(Comment.post_id.in_(post_ids))
+            archived_votes = or_(
+                Vote.post_id.in_(post_ids), Vote.comment_id.in_(comment_ids)
+            )
+
+            comments = (
+                (
+                    await session.execute(
+                        select(Comment)
+                        .where(Comment.post_id.in_(post_ids))
+                        .options(selectinload(Comment.user))
+                        .order_by(Comment.created_at.desc())
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            votes = (
+                await session.execute(
+                    select(
+                        Vote.user_id, Vote.post_id, Vote.comment_id, Vote.is_upvote
+                    ).where(archived_votes)
+                )
+            ).all()
+
+            by_post = defaultdict(list)
+            for comment in comments:
+                by_post[comment.post_id].append(comment)
+            comment_post = {comment.id: comment.post_id for comment in comments}
+            snapshots = {
+                post_id: {"post": {}, "comments": defaultdict(dict)}
+                for post_id in post_ids
+            }
+            for vote in votes:
+                if vote.user_id is None:
+                    continue
+                user_key = str(vote.user_id)
+                if vote.post_id is not None:
+                    snapshots[vote.post_id]["post"][user_key] = vote.is_upvote
+                else:
+                    post_votes = snapshots[comment_post[vote.comment_id]]
+                    post_votes["comments"][user_key][str(vote.comment_id)] = (
+                        vote.is_upvote
+                    )
+
+            await session.execute(
+                insert(PostArchive),
+                [
+                    {
+                        "post_id": post_id,
+                        "thread": comment_tree(by_post[post_id]),
+                        "votes": snapshots[post_id],
+                    }
+                    for post_id in post_ids
+                ],
+            )
+            await session.execute(
+                sqlalchemy_delete(Vote)
+                .where(archived_votes)
+                .execution_options(synchronize_session=False)
+            )
+            await session.execute(
+                sqlalchemy_delete(Comment)
+                .where(Comment.post_id.in_(post_ids))
+                .execution_options(synchronize_session=False)
+            )
+            await session.execute(
+                update(Post)
+                .where(Post.id.in_(post_ids))
+                .values(archived_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+        return len(post_ids)
+
+    @staticmethod
+    async def get_post_votes_by_user(user_id: int, post_ids: list[int]):
+        vote = PostArchive.votes["post"][str(user_id)]
+        async with session_scope() as session:
+            result = await session.execute(
+                select(PostArchive.post_id, vote.as_boolean()).where(
+                    PostArchive.post_id.in_(post_ids), vote.is_not(None)
+                )
+            )
+            return [
+                {"target_id": post_id, "is_upvote": is_upvote}
+                for post_id, is_upvote in result.all()
+            ]
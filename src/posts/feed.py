@@ -0,0 +1,325 @@
+"""The "new" feed: a user's subscribed subreddits merged by ``created_at``.
+
+``Post.subreddit_id IN (...) ORDER BY created_at DESC LIMIT n`` reads and
+sorts the recent posts of every subscribed subreddit to return ``n`` of them.
+Instead each subreddit contributes at most ``n`` ids, newest first, and they
+are merged with a heap:
+
+- from its head in Redis (``feed_heads:{subreddit_id}``), a sorted set of its
+  ``FEED_HEAD_SIZE`` newest post ids scored by ``created_at`` in microseconds.
+  A head that holds the whole subreddit also keeps ``EMPTY`` at score 0, so
+  trimming it drops that marker first;
+- otherwise from Postgres, one ``LATERAL`` subquery per subreddit with its own
+  ``LIMIT`` over the ``(subreddit_id, created_at)`` index. The first page
+  loads the missing heads from the same query. Past
+  ``FEED_LATERAL_MAX_SUBREDDITS`` the probes cost more than walking the
+  ``created_at`` index once with the ``IN`` list (see bench/feed.py), so the
+  page comes from that and the missing heads are left unloaded.
+
+Pages are resumed with an opaque ``created_at:id`` cursor. New, moved and
+deleted posts write through once their transaction has committed; loads are
+guarded by a per-subreddit version like ``subscription_cache``. Without Redis
+every page comes from Postgres.
+"""
+
+import heapq
+import logging
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Sequence
+
+from redis.exceptions import RedisError
+from sqlalchemy import Integer, bindparam, func, or_, select, true
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from src.config.database import after_commit, session_scope
+from src.config.redis_client import get_redis
+from src.config.settings import settings
+from src.monitoring.metrics import CACHE_REQUESTS
+from src.posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+EMPTY = 0
+EPOCH = datetime(1970, 1, 1)
+
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then return 0 end
+redis.call('ZADD', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+PUSH_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[3])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -ARGV[1] - 1)
+return 1
+"""
+
+REMOVE_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return redis.call('ZREM', KEYS[1], ARGV[2])
+"""
+
+# (score, post id), compared newest first.
+Head = tuple[int, int]
+
+
+def score(when: datetime) -> int:
+    return (when - EPOCH) // timedelta(microseconds=1)
+
+
+def created_at(head: Head) -> datetime:
+    return EPOCH + timedelta(microseconds=head[0])
+
+
+def encode_cursor(head: Head) -> str:
+    return f"{head[0]}:{head[1]}"
+
+
+def decode_cursor(cursor: str) -> Head:
+    created, post_id = cursor.split(":")
+    return int(created), int(post_id)
+
+
+def older_than(query, after: Head | None):
+    if after is None:
+        return query
+    return query.where(
+        Post.created_at <= created_at(after),
+        or_(Post.created_at < created_at(after), Post.id < after[1]),
+    )
+
+
+def newest_query(
+    subreddit_ids: Sequence[int],
+    per_subreddit: int,
+    total: int | None = None,
+    after: Head | None = None,
+):
+    """The newest ``per_subreddit`` posts of each subreddit older than
+    ``after``, at most ``total`` in all, as (subreddit_id, id, created_at)."""
+    ids = (
+        func.unnest(
+            bindparam("subreddit_ids", list(subreddit_ids), type_=ARRAY(Integer))
+        )
+        .table_valued("id")
+        .render_derived("subscribed")
+    )
+    newest = older_than(
+        select(Post.id, Post.created_at).where(Post.subreddit_id == ids.c.id), after
+    )
+    newest = (
+        newest.order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(per_subreddit)
+        .lateral("newest")
+    )
+    query = (
+        select(ids.c.id.label("subreddit_id"), newest.c.id, newest.c.created_at)
+        .join(newest, true())
+        .order_by(newest.c.created_at.desc(), newest.c.id.desc())
+    )
+    if total is not None:
+        query = query.limit(total)
+    return query
+
+
+def in_list_query(subreddit_ids: Sequence[int], limit: int, after: Head | None = None):
+    """The same page from one scan of the ``created_at`` index; cheaper than
+    a probe per subreddit once they cover a good part of all posts."""
+    return older_than(
+        select(Post.subreddit_id, Post.id, Post.created_at)
+        .where(Post.subreddit_id.in_(subreddit_ids))
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(limit),
+        after,
+    )
+
+
+class FeedHeads:
+    def __init__(self, size: int, ttl: int, lateral_max: int):
+        self.size = size
+        self.ttl = ttl
+        self.lateral_max = lateral_max
+
+    @staticmethod
+    def _keys(subreddit_id: int) -> list[str]:
+        return [f"feed_heads:{subreddit_id}", f"feed_heads:{subreddit_id}:version"]
+
+    async def page(
+        self, subreddit_ids: Sequence[int], limit: int, after: Head | None = None
+    ) -> tuple[list[Post], str | None]:
+        """Up to ``limit`` posts of ``subreddit_ids``, newest first, older
+        than ``after``; returns them with the cursor of the next page."""
+        streams, unresolved, versions = await self._from_redis(
+            subreddit_ids, limit, after
+        )
+        CACHE_REQUESTS.labels("feed_heads", "redis").inc(len(streams))
+        CACHE_REQUESTS.labels("feed_heads", "miss").inc(len(unresolved))
+        if unresolved and versions and len(unresolved) <= self.lateral_max:
+            heads = await self._newest(unresolved, max(limit, self.size))
+            await self._load(heads, versions)
+            streams.extend(rows[:limit] for rows in heads.values())
+        elif unresolved:
+            heads = await self._newest(unresolved, limit, total=limit, after=after)
+            streams.extend(heads.values())
+
+        merged = list(islice(heapq.merge(*streams, reverse=True), limit))
+        posts = await self._posts(merged)
+        next_cursor = encode_cursor(merged[-1]) if len(merged) == limit else None
+        return posts, next_cursor
+
+    def pushed(self, session: AsyncSession, post: Post):
+        after_commit(session, lambda: self._push(post.subreddit_id, post))
+
+    def removed(self, session: AsyncSession, post: Post, subreddit_id: int = None):
+        subreddit_id = subreddit_id or post.subreddit_id
+        after_commit(session, lambda: self._remove(subreddit_id, post.id))
+
+    def dropped(self, session: AsyncSession, subreddit_id: int):
+        after_commit(session, lambda: self._drop(subreddit_id))
+
+    async def clear(self):
+        try:
+            redis = get_redis()
+            async for key in redis.scan_iter("feed_heads:*"):
+                await redis.delete(key)
+        except RedisError as err:
+            logger.warning("Feed heads: Redis unavailable: %s", err)
+
+    async def _from_redis(
+        self, subreddit_ids: Sequence[int], limit: int, after: Head | None
+    ) -> tuple[list[list[Head]], list[int], dict[int, bytes]]:
+        """Streams of the heads that cover the page, the subreddits that need
+        Postgres and, on the first page, their versions for loading."""
+        top = "+inf" if after is None else after[0]
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for subreddit_id in subreddit_ids:
+                    key, version = self._keys(subreddit_id)
+                    pipe.zrevrangebyscore(
+                        key, top, "-inf", start=0, num=limit + 1, withscores=True
+                    )
+                    if after is None:
+                        pipe.get(version)
+                results = await pipe.execute()
+        except RedisError as err:
+            logger.warning("Feed heads: Redis unavailable: %s", err)
+            return [], list(subreddit_ids), {}
+
+        step = 1 if after is not None else 2
+        streams, unresolved, versions = [], [], {}
+        for subreddit_id, i in zip(
+            subreddit_ids, range(0, len(results), step), strict=True
+        ):
+            members = [(int(s), int(m)) for m, s in results[i]]
+            # Equal scores come back in string order of the ids.
+            stream = sorted(
+                (
+                    head
+                    for head in members
+                    if head[1] != EMPTY and (after is None or head < after)
+                ),
+                reverse=True,
+            )
+            if len(stream) >= limit or (EMPTY, EMPTY) in members:
+                streams.append(stream)
+                continue
+            unresolved.append(subreddit_id)
+            if after is None and not members:
+                versions[subreddit_id] = results[i + 1] or b"0"
+        return streams, unresolved, versions
+
+    async def _newest(
+        self,
+        subreddit_ids: Sequence[int],
+        per_subreddit: int,
+        total: int | None = None,
+        after: Head | None = None,
+    ) -> dict[int, list[Head]]:
+        if total is not None and len(subreddit_ids) > self.lateral_max:
+            query = in_list_query(subreddit_ids, total, after)
+        else:
+            query = newest_query(subreddit_ids, per_subreddit, total, after)
+        async with session_scope() as session:
+            rows = (await session.execute(query)).all()
+
+        heads = {subreddit_id: [] for subreddit_id in subreddit_ids}
+        for row in rows:
+            heads[row.subreddit_id].append((score(row.created_at), row.id))
+        return heads
+
+    async def _load(self, heads: dict[int, list[Head]], versions: dict[int, bytes]):
+        load = get_redis().register_script(LOAD_SCRIPT)
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for subreddit_id, version in versions.items():
+                    members = heads[subreddit_id][: self.size]
+                    if len(members) < self.size:
+                        members = [*members, (EMPTY, EMPTY)]
+                    args = [a for head in members for a in head]
+                    await load(
+                        keys=self._keys(subreddit_id),
+                        args=[version, self.ttl, *args],
+                        client=pipe,
+                    )
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("Feed heads: Redis unavailable: %s", err)
+
+    @staticmethod
+    async def _posts(merged: list[Head]) -> list[Post]:
+        if not merged:
+            return []
+        ids = [post_id for _, post_id in merged]
+        query = (
+            select(Post)
+            .where(
+                Post.id.in_(ids),
+                Post.created_at.between(created_at(merged[-1]), created_at(merged[0])),
+            )
+            .options(joinedload(Post.user), joinedload(Post.subreddit))
+        )
+        async with session_scope() as session:
+            posts = {post.id: post for post in (await session.execute(query)).scalars()}
+        # A head may still list a post deleted by another worker a moment ago.
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+    async def _push(self, subreddit_id: int, post: Post):
+        try:
+            await get_redis().register_script(PUSH_SCRIPT)(
+                keys=self._keys(subreddit_id),
+                args=[self.size, self.ttl, post.id, score(post.created_at)],
+            )
+        except RedisError as err:
+            logger.warning("Feed heads: write-through failed: %s", err)
+
+    async def _remove(self, subreddit_id: int, post_id: int):
+        try:
+            await get_redis().register_script(REMOVE_SCRIPT)(
+                keys=self._keys(subreddit_id), args=[self.ttl, post_id]
+            )
+        except RedisError as err:
+            logger.warning("Feed heads: write-through failed: %s", err)
+
+    async def _drop(self, subreddit_id: int):
+        key, version = self._keys(subreddit_id)
+        try:
+            async with get_redis().pipeline() as pipe:
+                await pipe.delete(key).incr(version).expire(version, self.ttl).execute()
+        except RedisError as err:
+            logger.warning("Feed heads: write-through failed: %s", err)
+
+
+feed_heads = FeedHeads(
+    settings.FEED_HEAD_SIZE,
+    settings.FEED_HEAD_TTL_SECONDS,
+    settings.FEED_LATERAL_MAX_SUBREDDITS,
+)
@@ -0,0 +1,236 @@
+"""Live vote counts and new comments of a post, as server-sent events.
+
+Votes on a post and new comments are published on ``live:post:{post_id}``
+once their transaction has committed, with the post's new ``upvotes`` or
+``comments_count``. Each worker holds one Redis pub/sub connection and is
+subscribed to the posts its clients watch, so it only receives those.
+
+Updates are coalesced per post: the first one starts a
+``LIVE_COALESCE_SECONDS`` timer and everything that arrives for the post
+until it fires goes out as one event, the latest counts plus the new
+comments. A client that reads slower than that keeps at most one pending
+update, holding no more than ``LIVE_MAX_PENDING_COMMENTS`` comments; past
+that it gets ``resync`` and should refetch the comments. Counts are absolute,
+so a lost update is corrected by the next one. Without Redis clients get the
+snapshot and heartbeats only.
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.database import after_commit
+from src.config.redis_client import get_redis
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "live:post:"
+
+
+def channel(post_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{post_id}"
+
+
+def post_changed(session: AsyncSession, post_id: int, **update):
+    """Publish ``update`` to the post's watchers once ``session`` commits."""
+    data = json.dumps(update)
+
+    async def publish():
+        try:
+            await get_redis().publish(channel(post_id), data)
+        except RedisError as err:
+            logger.warning("Live updates: publish failed: %s", err)
+
+    after_commit(session, publish)
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Listener:
+    """The pending update of one connection, merged until it is sent."""
+
+    __slots__ = ("counts", "comments", "resync", "wake")
+
+    def __init__(self, max_comments: int):
+        self.counts: dict = {}
+        self.comments: deque = deque(maxlen=max_comments)
+        self.resync = False
+        self.wake = asyncio.Event()
+
+    def push(self, update: dict):
+        self.counts.update(update["counts"])
+        comments = update["comments"]
+        if update["resync"] or len(self.comments) + len(comments) > (
+            self.comments.maxlen
+        ):
+            self.resync = True
+        self.comments.extend(comments)
+        self.wake.set()
+
+    async def next(self, timeout: float) -> dict | None:
+        """The update gathered since the last call, ``None`` if none came
+        within ``timeout`` seconds."""
+        try:
+            await asyncio.wait_for(self.wake.wait(), timeout)
+        except TimeoutError:
+            return None
+        self.wake.clear()
+        update = {**self.counts, "comments": list(self.comments)}
+        if self.resync:
+            update["resync"] = True
+        self.counts, self.resync = {}, False
+        self.comments.clear()
+        return update
+
+
+class LiveHub:
+    def __init__(
+        self,
+        coalesce: float,
+        max_connections: int,
+        max_comments: int,
+        retry: float,
+    ):
+        self.coalesce = coalesce
+        self.max_connections = max_connections
+        self.max_comments = max_comments
+        self.retry = retry
+        self.connections = 0
+        self._listeners: dict[int, set[Listener]] = {}
+        self._subscribed: set[int] = set()
+        self._pending: dict[int, dict] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._pubsub: PubSub | None = None
+        self._reader: asyncio.Task | None = None
+
+    def full(self) -> bool:
+        return self.connections >= self.max_connections
+
+    async def stream(
+        self, post_id: int, snapshot: dict, heartbeat: float, lifetime: float
+    ):
+        """SSE frames for one client: ``snapshot``, then the coalesced
+        updates of the post, for ``lifetime`` seconds. The client's
+        EventSource reconnects, possibly to a less busy worker."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lifetime
+        async with self.listen(post_id) as listener:
+            yield sse("snapshot", snapshot)
+            while (remaining := deadline - loop.time()) > 0:
+                update = await listener.next(min(remaining, heartbeat))
+                # A comment line keeps proxies from closing an idle stream.
+                yield sse("update", update) if update else ": ping\n\n"
+
+    @asynccontextmanager
+    async def listen(self, post_id: int):
+        listener = Listener(self.max_comments)
+        self._listeners.setdefault(post_id, set()).add(listener)
+        self.connections += 1
+        try:
+            if self._reader is None:
+                self._pubsub = get_redis().pubsub()
+                self._reader = asyncio.create_task(self._read())
+            try:
+                await self._sync()
+            except RedisError as err:
+                logger.warning("Live updates: Redis unavailable: %s", err)
+            yield listener
+        finally:
+            # No awaiting here, the stream may be cancelled: the reader
+            # unsubscribes from posts nobody watches any more.
+            self.connections -= 1
+            listeners = self._listeners[post_id]
+            listeners.discard(listener)
+            if not listeners:
+                del self._listeners[post_id]
+
+    async def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        self._pending.clear()
+
+    async def _sync(self):
+        """Subscribe to the watched posts, unsubscribe from the others."""
+        watched = self._listeners.keys()
+        if added := watched - self._subscribed:
+            await self._pubsub.subscribe(*map(channel, added))
+            self._subscribed |= added
+        if removed := self._subscribed - watched:
+            await self._pubsub.unsubscribe(*map(channel, removed))
+            self._subscribed -= removed
+
+    async def _read(self):
+        pubsub = self._pubsub
+        try:
+            while self._listeners:
+                await self._read_once()
+        finally:
+            # Closing the connection drops its subscriptions.
+            self._reader, self._pubsub = None, None
+            self._subscribed.clear()
+            await pubsub.aclose()
+
+    async def _read_once(self):
+        try:
+            await self._sync()
+            if not self._subscribed:
+                return
+            # A timeout, so unwatched posts are dropped within a second.
+            message = await self._pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=1.0
+            )
+        except (RedisError, OSError) as err:
+            logger.warning("Live updates: Redis unavailable: %s", err)
+            await asyncio.sleep(self.retry)
+            return
+        if message is not None and message["type"] == "message":
+            post_id = int(message["channel"][len(CHANNEL_PREFIX) :])
+            self.received(post_id, json.loads(message["data"]))
+
+    def received(self, post_id: int, data: dict):
+        """Merge a published update into the post's pending one."""
+        pending = self._pending.setdefault(
+            post_id, {"counts": {}, "comments": [], "resync": False}
+        )
+        if comment := data.pop("comment", None):
+            if len(pending["comments"]) < self.max_comments:
+                pending["comments"].append(comment)
+            else:
+                pending["resync"] = True
+        pending["counts"].update(data)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.coalesce, self._flush
+            )
+
+    def _flush(self):
+        pending, self._pending = self._pending, {}
+        self._flush_handle = None
+        for post_id, update in pending.items():
+            for listener in self._listeners.get(post_id, ()):
+                listener.push(update)
+
+
+live_hub = LiveHub(
+    settings.LIVE_COALESCE_SECONDS,
+    settings.LIVE_MAX_CONNECTIONS,
+    settings.LIVE_MAX_PENDING_COMMENTS,
+    settings.LIVE_RETRY_SECONDS,
+)
+
+
+async def close_live_hub():
+    await live_hub.close()
@@ -1,9 +1,12 @@
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import ForeignKey, String, UniqueConstraint
+from sqlalchemy import ForeignKey, Index, String, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, backref, mapped_column, relationship
 
-from src.config.database import Base, int_pk
+from src.config.database import Base, int_pk, partition_key
+from src.config.partitions import install_partitioning
 from src.users.models import User
 
 
@@ -46,25 +49,56 @@ class Subscription(Base):
 
 
 class Post(Base):
-    id: Mapped[int_pk]
+    id: Mapped[int_pk] = mapped_column(autoincrement=True)
+    created_at: Mapped[partition_key] = mapped_column()
     title: Mapped[str] = mapped_column(String(300))
     content: Mapped[str] = mapped_column(String(40000), nullable=True)
     upvote: Mapped[int] = mapped_column(default=0)
     image_path: Mapped[Optional[str]] = mapped_column(String(300), nullable=True)
     comments_count: Mapped[int] = mapped_column(default=0)
+    # Set once the comments and votes moved to ``PostArchive``; read-only then.
+    archived_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
     user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="SET NULL"), index=True, nullable=True
+        ForeignKey("users.id", ondelete="SET NULL"), nullable=True
     )
     subreddit_id: Mapped[int] = mapped_column(
-        ForeignKey("subreddits.id", ondelete="CASCADE"), index=True
+        ForeignKey("subreddits.id", ondelete="CASCADE")
     )
 
+    __table_args__ = (
+        # Per-user and per-subreddit listings, newest or oldest first.
+        Index("ix_posts_user_id_created_at", "user_id", "created_at"),
+        Index("ix_posts_subreddit_id_created_at", "subreddit_id", "created_at"),
+        Index(
+            "ix_posts_image_path",
+            "image_path",
+            postgresql_where=text("image_path IS NOT NULL"),
+        ),
+        Index(
+            "ix_posts_unarchived_created_at",
+            "created_at",
+            postgresql_where=text("archived_at IS NULL"),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    # The table's key is (id, created_at) because of the partitioning; ids
+    # still come from one sequence and identify a row on their own.
+    __mapper_args__ = {"primary_key": "id"}
+
     user = relationship(User, back_populates="posts")
     subreddit = relationship("Subreddit", back_populates="posts")
     comments = relationship(
-        "Comment", back_populates="post", cascade="all, delete-orphan"
+        "Comment",
+        primaryjoin="Post.id == foreign(Comment.post_id)",
+        back_populates="post",
+        cascade="all, delete-orphan",
+    )
+    votes = relationship(
+        "Vote",
+        primaryjoin="Post.id == foreign(Vote.post_id)",
+        back_populates="post",
+        cascade="all, delete-orphan",
     )
-    votes = relationship("Vote", back_populates="post", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"{self.__class__.__name__}(id={self.id})"
@@ -81,31 +115,43 @@ class Post(Base):
             "created_at": self.created_at,
             "image_url": self.image_path,
             "comments_count": self.comments_count,
+            "archived_at": self.archived_at,
         }
 
 
 class Comment(Base):
-    id: Mapped[int_pk] = mapped_column(index=True)
+    id: Mapped[int_pk] = mapped_column(autoincrement=True)
+    created_at: Mapped[partition_key] = mapped_column()
     content: Mapped[str] = mapped_column(String(4000), nullable=False)
     upvote: Mapped[int] = mapped_column(default=0)
+    replies_count: Mapped[int] = mapped_column(default=0, server_default="0")
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True
     )
-    post_id: Mapped[int] = mapped_column(
-        ForeignKey("posts.id", ondelete="CASCADE"), index=True
-    )
-    parent_comment_id: Mapped[int] = mapped_column(
-        ForeignKey("comments.id", ondelete="CASCADE"), nullable=True, index=True
-    )
+    post_id: Mapped[int] = mapped_column(index=True)
+    parent_comment_id: Mapped[int] = mapped_column(nullable=True, index=True)
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+    __mapper_args__ = {"primary_key": "id"}
 
     replies = relationship(
         "Comment",
+        primaryjoin="Comment.id == foreign(Comment.parent_comment_id)",
         backref=backref("parent_comment", remote_side="[Comment.id]"),
         cascade="all, delete-orphan",
     )
-    votes = relationship("Vote", back_populates="comment", cascade="all, delete-orphan")
+    votes = relationship(
+        "Vote",
+        primaryjoin="Comment.id == foreign(Vote.comment_id)",
+        back_populates="comment",
+        cascade="all, delete-orphan",
+    )
     user = relationship(User, back_populates="comments")
-    post = relationship("Post", back_populates="comments")
+    post = relationship(
+        "Post",
+        primaryjoin="Post.id == foreign(Comment.post_id)",
+        back_populates="comments",
+    )
 
     def __repr__(self):
         return f"{self.__class__.__name__}(id={self.id})"
@@ -120,6 +166,7 @@ class Comment(Base):
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
             "parent_comment_id": self.parent_comment_id,
+            "replies_count": self.replies_count,
         }
         if include_replies:
             data["replies"] = [
@@ -129,21 +176,48 @@ class Comment(Base):
 
 
 class Vote(Base):
-    id: Mapped[int_pk]
+    id: Mapped[int_pk] = mapped_column(autoincrement=True)
+    created_at: Mapped[partition_key] = mapped_column()
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True
     )
-    post_id: Mapped[int] = mapped_column(
-        ForeignKey("posts.id", ondelete="CASCADE"), nullable=True, index=True
-    )
-    comment_id: Mapped[int] = mapped_column(
-        ForeignKey("comments.id", ondelete="CASCADE"), nullable=True, index=True
-    )
+    post_id: Mapped[int] = mapped_column(nullable=True, index=True)
+    comment_id: Mapped[int] = mapped_column(nullable=True, index=True)
     is_upvote: Mapped[bool] = mapped_column(nullable=False)
 
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+    __mapper_args__ = {"primary_key": "id"}
+
     user = relationship("User", back_populates="votes")
-    post = relationship("Post", back_populates="votes")
-    comment = relationship("Comment", back_populates="votes")
+    post = relationship(
+        "Post", primaryjoin="Post.id == foreign(Vote.post_id)", back_populates="votes"
+    )
+    comment = relationship(
+        "Comment",
+        primaryjoin="Comment.id == foreign(Vote.comment_id)",
+        back_populates="votes",
+    )
 
     def __repr__(self):
         return f"{self.__class__.__name__}(id={self.id})"
+
+
+class PostArchive(Base):
+    """Comment tree and votes of an archived post, served as one row.
+
+    ``thread`` holds the root comments in the shape returned by
+    ``/comments/by_post`` (without ``user_vote``); ``votes`` holds
+    ``{"post": {user_id: is_upvote}, "comments": {user_id: {comment_id:
+    is_upvote}}}``.
+    """
+
+    post_id: Mapped[int] = mapped_column(primary_key=True)
+    thread: Mapped[list] = mapped_column(JSONB)
+    votes: Mapped[dict] = mapped_column(JSONB)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(post_id={self.post_id})"
+
+
+for _table in (Post.__table__, Comment.__table__, Vote.__table__):
+    install_partitioning(_table)
@@ -3,9 +3,19 @@ from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import selectinload
 
-from src.config.database import async_session_maker
-from src.posts.dao import CommentDao, VoteDao
-from src.posts.models import Comment, Post
+from src.config.database import session_scope
+from src.dao.export import ExportQuery, export_response
+from src.monitoring.timing import TimedRoute
+from src.posts.dao import (
+    CommentDao,
+    PostArchiveDao,
+    VoteDao,
+    assign_votes,
+    comment_tree,
+    created_since_post,
+    thread_ids,
+)
+from src.posts.models import Comment
 from src.posts.schemas import CommentCreateSchema, CommentUpdateSchema
 from src.users.dependencies import (
     get_current_admin_user,
@@ -14,7 +24,7 @@ from src.users.dependencies import (
 )
 from src.users.models import User
 
-router = APIRouter(prefix="/comments", tags=["comments"])
+router = APIRouter(prefix="/comments", tags=["comments"], route_class=TimedRoute)
 
 
 @router.post("/create/", status_code=status.HTTP_201_CREATED)
@@ -36,15 +46,16 @@ async def reply_to_comment(
         raise HTTPException(status_code=404, detail="Комментарий для ответа не найден")
 
     data = comment_data.dict()
+    data["post_id"] = parent_comment.post_id
     data["parent_comment_id"] = comment_id
 
-    new_comment = await CommentDao.add_forum(data, user)
+    new_comment = await CommentDao.add_comment(data, user)
     return new_comment
 
 
 @router.get("/get_all/", dependencies=[Depends(get_current_admin_user)])
-async def get_all_comments():
-    return await CommentDao.find_all()
+async def get_all_comments(export: ExportQuery = Depends()):
+    return await export_response(CommentDao, export)
 
 
 @router.put("/{comment_id}", dependencies=[Depends(get_current_valid_user)])
@@ -72,30 +83,21 @@ async def delete_comment(
     comment_id: int,
     current_user: User = Depends(get_current_valid_user),
 ):
-    async with async_session_maker() as session:
-        async with session.begin():
-            comment = await CommentDao.find_one_or_none_by_id(comment_id)
-            if not comment:
-                raise HTTPException(status_code=404, detail="Комментарий не найден")
-
-            if comment.user_id != current_user.id and current_user.role not in (2, 3):
-                raise HTTPException(
-                    status_code=403, detail="Нет прав на удаление этого комментария"
-                )
-
-            post = await session.get(Post, comment.post_id)
-            if post and post.comments_count > 0:
-                post.comments_count -= 1
-
-            await session.delete(comment)
-
-        try:
-            await session.commit()
-        except SQLAlchemyError as err:
-            await session.rollback()
-            raise HTTPException(
-                status_code=500, detail="Ошибка при удалении комментария"
-            ) from err
+    comment = await CommentDao.find_one_or_none_by_id(comment_id)
+    if not comment:
+        raise HTTPException(status_code=404, detail="Комментарий не найден")
+
+    if comment.user_id != current_user.id and current_user.role_id not in (2, 3):
+        raise HTTPException(
+            status_code=403, detail="Нет прав на удаление этого комментария"
+        )
+
+    try:
+        await CommentDao.delete_with_replies(comment)
+    except SQLAlchemyError as err:
+        raise HTTPException(
+            status_code=500, detail="Ошибка при удалении комментария"
+        ) from err
 
     return {"detail": "Комментарий удалён"}
 
@@ -126,63 +128,38 @@ async def comments_by_post(
     offset: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
 ):
-    async with async_session_maker() as session:
+    async with session_scope() as session:
         query = (
             select(Comment)
             .filter(Comment.post_id == post_id)
+            .filter(created_since_post(Comment, post_id))
             .options(selectinload(Comment.user))
             .order_by(Comment.created_at.desc())
         )
         result = await session.execute(query)
         all_comments = result.scalars().all()
 
-    if not all_comments:
-        return []
-
-    comment_dict = {}
-    for comment in all_comments:
-        data = comment.to_dict(include_replies=False)
-        data["children"] = []
-
-        if comment.user:
-            data["user"] = {
-                "id": comment.user.id,
-                "username": comment.user.username,
-                "nickname": comment.user.nickname,
-            }
-        else:
-            data["user"] = None
-        comment_dict[comment.id] = data
-
-    root_comments = []
-    for comment in all_comments:
-        if comment.parent_comment_id is None:
-            root_comments.append(comment_dict[comment.id])
-        else:
-            parent = comment_dict.get(comment.parent_comment_id)
-            if parent:
-                parent["children"].append(comment_dict[comment.id])
-            else:
-                print(
-                    f"Не найден родительский комментарий для comment_id {comment.id}: parent_comment_id {comment.parent_comment_id}"
-                )
+    if all_comments:
+        root_comments = comment_tree(all_comments)
+        archive = None
+    else:
+        archive = await PostArchiveDao.find_one_or_none(post_id=post_id)
+        if archive is None:
+            return []
+        root_comments = archive.thread
 
     paginated_root_comments = root_comments[offset : offset + limit]
 
-    all_ids = [data["id"] for data in comment_dict.values()]
     votes_map = {}
-    if user and all_ids:
-        user_votes = await VoteDao.get_user_votes_for_comments(user.id, all_ids)
+    if user and archive is not None:
+        archived_votes = archive.votes["comments"].get(str(user.id), {})
+        votes_map = {int(k): v for k, v in archived_votes.items()}
+    elif user:
+        page_ids = thread_ids(paginated_root_comments)
+        user_votes = await VoteDao.get_user_votes_for_comments(user.id, page_ids)
         votes_map = {vote.comment_id: vote.is_upvote for vote in user_votes}
 
-    def assign_votes(comment_item):
-        comment_item["user_vote"] = votes_map.get(comment_item["id"], None)
-        for child in comment_item["children"]:
-            assign_votes(child)
-
-    for comment in paginated_root_comments:
-        assign_votes(comment)
-
+    assign_votes(paginated_root_comments, votes_map)
     return paginated_root_comments
 
 
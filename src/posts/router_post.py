@@ -1,19 +1,27 @@
-import os
-import shutil
-import uuid
+from datetime import timedelta
+from typing import Optional
 
 from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import Numeric, cast, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from src.config.database import get_async_session
-from src.posts.dao import PostDao, VoteDao
-from src.posts.models import Post, Subscription
+from src.config.settings import settings
+from src.dao.export import ExportQuery, export_response
+from src.media.dao import MediaDao
+from src.media.storage import get_storage
+from src.monitoring.timing import TimedRoute
+from src.posts.dao import PostArchiveDao, PostDao, VoteDao
+from src.posts.feed import decode_cursor, feed_heads
+from src.posts.live import live_hub
+from src.posts.models import Post
 from src.posts.schemas import (
     PostCreateForm,
     PostUpdateSchema,
 )
+from src.posts.subscription_cache import subscription_cache
 from src.users.dependencies import (
     get_current_admin_user,
     get_current_user,
@@ -21,7 +29,7 @@ from src.users.dependencies import (
 )
 from src.users.models import User
 
-router = APIRouter(prefix="/posts", tags=["posts"])
+router = APIRouter(prefix="/posts", tags=["posts"], route_class=TimedRoute)
 
 
 @router.post("/create/")
@@ -32,13 +40,9 @@ async def create_post(
 ):
     image_path = None
     if image:
-        ext = os.path.splitext(image.filename)[1]
-        filename = f"{uuid.uuid4().hex}{ext}"
-        file_path = os.path.join("media", filename)
-        os.makedirs("media", exist_ok=True)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        image_path = file_path
+        storage = get_storage()
+        staged = await storage.stage(image.file, image.filename)
+        image_path = await MediaDao.store(storage, staged)
 
     post_data = {
         "title": form.title,
@@ -50,8 +54,8 @@ async def create_post(
 
 
 @router.get("/get_all/", dependencies=[Depends(get_current_admin_user)])
-async def get_all_posts():
-    return await PostDao.find_all()
+async def get_all_posts(export: ExportQuery = Depends()):
+    return await export_response(PostDao, export)
 
 
 @router.get("/find/")
@@ -64,12 +68,25 @@ async def find_post(
 
 @router.put("/update/{post_id}", dependencies=[Depends(get_current_valid_user)])
 async def update_post(post_id: int, response_body: PostUpdateSchema):
-    return await PostDao.update({"id": post_id}, **response_body.dict())
+    post = await PostDao.update(
+        {"id": post_id, "archived_at": None}, **response_body.dict()
+    )
+    if post is None:
+        archived = await PostDao.find_one_or_none_by_id(post_id)
+        if archived is not None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Пост в архиве и доступен только для чтения",
+            )
+    return post
 
 
 @router.delete("/delete/{post_id}", dependencies=[Depends(get_current_valid_user)])
 async def delete_post(post_id: int):
-    return await PostDao.delete_by_id(post_id)
+    post = await PostDao.delete_by_id(post_id)
+    if post and post.image_path:
+        await MediaDao.release(post.image_path)
+    return post
 
 
 @router.post("/upvote/{post_id}")
@@ -82,59 +99,79 @@ async def delete_upvote(post_id: int, user: User = Depends(get_current_user)):
     return await PostDao.remove_vote(post_id, user)
 
 
+def lenta_item(p: Post) -> dict:
+    return {
+        "id": p.id,
+        "title": p.title,
+        "content": p.content,
+        "upvote": p.upvote,
+        "created_at": p.created_at,
+        "user": {
+            "id": p.user_id,
+            "username": p.user.username if p.user else "Неизвестный",
+        },
+        "subreddit": {"id": p.subreddit_id, "name": p.subreddit.name},
+        "image_path": p.image_path,
+        "comments_count": p.comments_count,
+    }
+
+
+@router.get("/lenta/new/")
+async def get_lenta_new(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(
+        None, pattern=r"^\d+:\d+$", description="next_cursor предыдущей страницы"
+    ),
+    user: User = Depends(get_current_user),
+):
+    subscribed_ids = (await subscription_cache.get(user.id)).tolist()
+    if not subscribed_ids:
+        return {"items": [], "next_cursor": None}
+    after = decode_cursor(cursor) if cursor else None
+    posts, next_cursor = await feed_heads.page(subscribed_ids, limit, after)
+    return {"items": [lenta_item(p) for p in posts], "next_cursor": next_cursor}
+
+
 @router.get("/lenta/")
 async def get_lenta(
     sort_by: str = Query("hot", enum=["hot", "new", "top"]),
     limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0),
+    offset: int = Query(0, ge=0, le=1000),
     session: AsyncSession = Depends(get_async_session),
     user: User = Depends(get_current_user),
 ):
     query = select(Post).options(selectinload(Post.user), selectinload(Post.subreddit))
 
     if sort_by in ("top", "new"):
-        sub_ids_result = await session.execute(
-            select(Subscription.subreddit_id).where(Subscription.user_id == user.id)
-        )
-        subscribed_ids = [row[0] for row in sub_ids_result.all()]
+        subscribed_ids = (await subscription_cache.get(user.id)).tolist()
 
         if not subscribed_ids:
             return []
 
+        if sort_by == "new":
+            posts, _ = await feed_heads.page(subscribed_ids, offset + limit)
+            return [lenta_item(p) for p in posts[offset:]]
+
         query = query.where(Post.subreddit_id.in_(subscribed_ids))
 
     if sort_by == "top":
         query = query.order_by(Post.upvote.desc())
-    elif sort_by == "new":
-        query = query.order_by(Post.created_at.desc())
     elif sort_by == "hot":
         hot_expr = (
             func.log(10, func.greatest(func.coalesce(Post.upvote, 0) + 1, 1)) * 0.5
             + (func.extract("epoch", Post.created_at) / cast(50000, Numeric)) * 0.5
         )
         query = query.order_by(hot_expr.desc())
+        # Old posts can't rank anyway; the window also prunes their partitions.
+        if settings.FEED_HOT_WINDOW_DAYS:
+            window = timedelta(days=settings.FEED_HOT_WINDOW_DAYS)
+            query = query.where(Post.created_at >= func.localtimestamp() - window)
 
     query = query.offset(offset).limit(limit)
     result = await session.execute(query)
     posts = result.scalars().all()
 
-    return [
-        {
-            "id": p.id,
-            "title": p.title,
-            "content": p.content,
-            "upvote": p.upvote,
-            "created_at": p.created_at,
-            "user": {
-                "id": p.user_id,
-                "username": p.user.username if p.user else "Неизвестный",
-            },
-            "subreddit": {"id": p.subreddit_id, "name": p.subreddit.name},
-            "image_path": p.image_path,
-            "comments_count": p.comments_count,
-        }
-        for p in posts
-    ]
+    return [lenta_item(p) for p in posts]
 
 
 @router.get("/my_posts")
@@ -157,6 +194,31 @@ async def get_post_by_id(post_id: int):
     return post
 
 
+@router.get("/{post_id}/live")
+async def live_post(post_id: int):
+    """Server-sent events with the post's vote count and new comments."""
+    if live_hub.full():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Слишком много подключений, попробуйте позже",
+        )
+    snapshot = await PostDao.get_live_state(post_id)
+    if snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+        )
+    return StreamingResponse(
+        live_hub.stream(
+            post_id,
+            snapshot,
+            settings.LIVE_HEARTBEAT_SECONDS,
+            settings.LIVE_CONNECTION_SECONDS,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/user_posts/")
 async def get_user_posts(user_id: int):
     posts = await PostDao.find_my_posts(user_id=user_id)
@@ -176,6 +238,7 @@ async def get_post_votes_by_user(
         return []
     id_list = [int(i) for i in ids.split(",")]
     votes = await VoteDao.get_post_votes_by_user(current_user.id, id_list)
+    votes += await PostArchiveDao.get_post_votes_by_user(current_user.id, id_list)
 
     return {vote["target_id"]: vote["is_upvote"] for vote in votes}
 
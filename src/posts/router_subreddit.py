@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 
+from src.dao.export import ExportQuery, export_response
+from src.monitoring.timing import TimedRoute
 from src.posts.dao import SubredditDao, SubscriptionDao
 from src.posts.schemas import (
     SubRedditCreateSchema,
     SubRedditFindSchema,
     SubRedditUpdateSchema,
+    SubscriptionBulkSchema,
 )
 from src.users.dependencies import (
     get_current_admin_user,
@@ -13,7 +16,7 @@ from src.users.dependencies import (
 )
 from src.users.models import User
 
-router = APIRouter(prefix="/subreddit", tags=["subreddits"])
+router = APIRouter(prefix="/subreddit", tags=["subreddits"], route_class=TimedRoute)
 
 
 @router.post("/create/")
@@ -24,8 +27,8 @@ async def create_subreddit(
 
 
 @router.get("/get_all/", dependencies=[Depends(get_current_admin_user)])
-async def get_all_subreddit():
-    return await SubredditDao.find_all()
+async def get_all_subreddit(export: ExportQuery = Depends()):
+    return await export_response(SubredditDao, export)
 
 
 @router.get("/find/")
@@ -81,12 +84,19 @@ async def delete_subreddit(
 async def create_subscription(
     subreddit_id: int, user: User = Depends(get_current_valid_user)
 ):
-    return await SubscriptionDao.add_forum({"subreddit_id": subreddit_id}, user)
+    return await SubscriptionDao.subscribe(subreddit_id, user)
 
 
 @router.get("/get_all_subscriptions/")
 async def get_all_subscriptions(user: User = Depends(get_current_valid_user)):
-    return await SubscriptionDao.find_all_subscriptions({"user": user})
+    return await SubscriptionDao.find_all_subscriptions({"user_id": user.id})
+
+
+@router.post("/subscriptions/bulk/")
+async def bulk_update_subscriptions(
+    data: SubscriptionBulkSchema, user: User = Depends(get_current_valid_user)
+):
+    return await SubscriptionDao.bulk_update(user.id, data.subscribe, data.unsubscribe)
 
 
 @router.delete(
@@ -106,7 +116,7 @@ async def delete_subscription(
             status_code=403, detail="You are not the owner of this subscription"
         )
 
-    await SubscriptionDao.delete_by_id(subscription_id)
+    await SubscriptionDao.unsubscribe(subscription_id)
     return {"message": "Subscription deleted successfully"}
 
 
@@ -119,8 +129,12 @@ async def get_subreddit_by_id(subreddit_id: int):
 
 
 @router.get("/my-subreddits/")
-async def get_my_subreddits(user: User = Depends(get_current_user)):
-    subreddits = await SubredditDao.find_by_filter(created_by_id=user.id)
+async def get_my_subreddits(
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0),
+    user: User = Depends(get_current_user),
+):
+    subreddits = await SubredditDao.find_by_filter(limit, offset, created_by_id=user.id)
     if not subreddits:
         raise HTTPException(status_code=404, detail="Subreddits not found")
     return subreddits
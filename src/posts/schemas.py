@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional
 
 from fastapi import Form
-from pydantic import BaseModel, Field, constr
+from pydantic import BaseModel, Field, constr, model_validator
 
 
 class SubRedditSchema(BaseModel):
@@ -29,6 +29,17 @@ class SubRedditUpdateSchema(BaseModel):
     description: str = Field(..., min_length=1, max_length=50)
 
 
+class SubscriptionBulkSchema(BaseModel):
+    subscribe: list[int] = Field([], max_length=100)
+    unsubscribe: list[int] = Field([], max_length=100)
+
+    @model_validator(mode="after")
+    def check_overlap(self):
+        if set(self.subscribe) & set(self.unsubscribe):
+            raise ValueError("Нельзя одновременно подписаться и отписаться")
+        return self
+
+
 class PostCreateForm:
     def __init__(
         self,
@@ -61,6 +72,7 @@ class PostResponse(BaseModel):
     user_id: int
     upvote: int
     created_at: datetime
+    user_vote: Optional[bool] = None
 
 
 class CommentCreateSchema(BaseModel):
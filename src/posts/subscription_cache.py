@@ -0,0 +1,172 @@
+"""Per-user sets of subscribed subreddit ids, for building feeds.
+
+Each set lives in Redis (``subscriptions:{user_id}``, kept as an intset since
+it only holds small integers) and in a per-worker LRU as a sorted ``array``.
+Reads try the LRU, then Redis, then Postgres. Subscribing and unsubscribing
+write through once their transaction has committed; the LRU copies held by
+other workers may lag by ``SUBSCRIPTION_CACHE_LOCAL_TTL_SECONDS``.
+
+A set loaded from Postgres is only stored when no write happened since the
+load started (``subscriptions:{user_id}:version``), so a slow load never
+overwrites a newer set. Without Redis every LRU miss reads Postgres.
+"""
+
+import logging
+import time
+from array import array
+from collections import OrderedDict
+from typing import Sequence
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.database import after_commit, read_from_primary, session_scope
+from src.config.redis_client import get_redis
+from src.config.settings import settings
+from src.monitoring.metrics import CACHE_REQUESTS
+from src.posts.models import Subscription
+
+logger = logging.getLogger(__name__)
+
+# Kept in every Redis set so that an empty one still exists; subreddit ids
+# start at 1.
+EMPTY = 0
+
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then return 0 end
+redis.call('SADD', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+UPDATE_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+if ARGV[1] == 'add' then
+    redis.call('SADD', KEYS[1], unpack(ARGV, 3))
+else
+    redis.call('SREM', KEYS[1], unpack(ARGV, 3))
+end
+return 1
+"""
+
+
+class SubscriptionCache:
+    def __init__(self, local_size: int, local_ttl: float, ttl: int):
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self._local: OrderedDict[int, tuple[float, array]] = OrderedDict()
+
+    @staticmethod
+    def _keys(user_id: int) -> list[str]:
+        return [f"subscriptions:{user_id}", f"subscriptions:{user_id}:version"]
+
+    async def get(self, user_id: int) -> array:
+        """Sorted ids of the subreddits ``user_id`` is subscribed to."""
+        entry = self._local.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._local.move_to_end(user_id)
+            CACHE_REQUESTS.labels("subscriptions", "local").inc()
+            return entry[1]
+
+        ids = await self._from_redis(user_id)
+        if ids is None:
+            CACHE_REQUESTS.labels("subscriptions", "miss").inc()
+            ids = await self._from_db(user_id)
+        else:
+            CACHE_REQUESTS.labels("subscriptions", "redis").inc()
+        self._remember(user_id, ids)
+        return ids
+
+    def updated(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        added: Sequence[int] = (),
+        removed: Sequence[int] = (),
+    ):
+        """Write the change through once ``session`` commits."""
+        if added or removed:
+            after_commit(session, lambda: self._apply(user_id, added, removed))
+
+    async def clear(self):
+        self._local.clear()
+        try:
+            redis = get_redis()
+            async for key in redis.scan_iter("subscriptions:*"):
+                await redis.delete(key)
+        except RedisError as err:
+            logger.warning("Subscription cache: Redis unavailable: %s", err)
+
+    def _remember(self, user_id: int, ids: array):
+        self._local[user_id] = (time.monotonic() + self.local_ttl, ids)
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def _from_redis(self, user_id: int) -> array | None:
+        try:
+            members = await get_redis().smembers(self._keys(user_id)[0])
+        except RedisError as err:
+            logger.warning("Subscription cache: Redis unavailable: %s", err)
+            return None
+        if not members:
+            return None
+        return array("i", sorted(i for i in map(int, members) if i != EMPTY))
+
+    async def _from_db(self, user_id: int) -> array:
+        redis, keys = get_redis(), self._keys(user_id)
+        try:
+            version = (await redis.get(keys[1])) or b"0"
+        except RedisError:
+            version = None
+
+        # A replica may not have the latest subscription yet; what is loaded
+        # here is cached until the next write.
+        token = read_from_primary.set(True)
+        try:
+            async with session_scope() as session:
+                result = await session.execute(
+                    select(Subscription.subreddit_id).where(
+                        Subscription.user_id == user_id
+                    )
+                )
+                ids = array("i", sorted(result.scalars()))
+        finally:
+            read_from_primary.reset(token)
+
+        if version is not None:
+            try:
+                await redis.register_script(LOAD_SCRIPT)(
+                    keys=keys, args=[version, self.ttl, EMPTY, *ids]
+                )
+            except RedisError as err:
+                logger.warning("Subscription cache: Redis unavailable: %s", err)
+        return ids
+
+    async def _apply(self, user_id: int, added: Sequence[int], removed: Sequence[int]):
+        entry = self._local.get(user_id)
+        if entry is not None:
+            ids = set(entry[1]).union(added).difference(removed)
+            self._local[user_id] = (entry[0], array("i", sorted(ids)))
+
+        update = get_redis().register_script(UPDATE_SCRIPT)
+        keys = self._keys(user_id)
+        try:
+            if added:
+                await update(keys=keys, args=["add", self.ttl, *added])
+            if removed:
+                await update(keys=keys, args=["remove", self.ttl, *removed])
+        except RedisError as err:
+            logger.warning("Subscription cache: write-through failed: %s", err)
+
+
+subscription_cache = SubscriptionCache(
+    settings.SUBSCRIPTION_CACHE_LOCAL_SIZE,
+    settings.SUBSCRIPTION_CACHE_LOCAL_TTL_SECONDS,
+    settings.SUBSCRIPTION_CACHE_TTL_SECONDS,
+)
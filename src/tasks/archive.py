@@ -0,0 +1,27 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from src.celery_app import celery_app
+from src.config.database import engine
+from src.config.settings import settings
+from src.posts.dao import PostArchiveDao
+
+
+async def _archive(days: int, batch_size: int):
+    cutoff = datetime.now() - timedelta(days=days)
+    archived = 0
+    try:
+        while batch := await PostArchiveDao.archive_posts(cutoff, batch_size):
+            archived += batch
+    finally:
+        await engine.dispose()
+    return archived
+
+
+@celery_app.task
+def archive_old_posts():
+    """Move the comments and votes of posts older than ``ARCHIVE_AFTER_DAYS``
+    into per-post snapshots, ``ARCHIVE_BATCH_SIZE`` posts per transaction."""
+    return asyncio.run(
+        _archive(settings.ARCHIVE_AFTER_DAYS, settings.ARCHIVE_BATCH_SIZE)
+    )
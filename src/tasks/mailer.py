@@ -0,0 +1,237 @@
+"""SMTP connections kept open across the emails a worker process sends.
+
+Opening a connection, STARTTLS and AUTH cost several round trips and most of
+the time of sending one message. ``SMTPPool`` keeps up to ``SMTP_POOL_SIZE``
+sessions per process and reuses them: one idle for longer than
+``SMTP_KEEPALIVE_SECONDS`` is checked with ``NOOP`` first, one that dropped
+is reopened, and one is retired after ``SMTP_MAX_MESSAGES_PER_CONNECTION``
+messages, which servers tend to cap.
+"""
+
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+
+from src.config.settings import get_email_settings
+
+logger = logging.getLogger(__name__)
+
+email_settings = get_email_settings()
+
+
+def is_transient(err: Exception) -> bool:
+    """Whether ``err`` is worth another try later: the server or the network
+    failed, not the message."""
+    if isinstance(err, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in err.recipients.values())
+    if isinstance(err, smtplib.SMTPResponseException):
+        return 400 <= err.smtp_code < 500
+    if isinstance(err, smtplib.SMTPServerDisconnected):
+        return True
+    # Every SMTPException is an OSError too.
+    return isinstance(err, OSError) and not isinstance(err, smtplib.SMTPException)
+
+
+class Connection:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+
+
+class SMTPPool:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        starttls: bool = True,
+        timeout: float = 10,
+        size: int = 2,
+        keepalive: float = 30,
+        max_messages: int = 100,
+    ):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.max_messages = max_messages
+        self._idle: queue.LifoQueue[Connection] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self) -> Connection:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.password and smtp.has_extn("auth"):
+                smtp.login(self.username, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        return Connection(smtp)
+
+    def _alive(self, connection: Connection) -> bool:
+        if time.monotonic() - connection.last_used < self.keepalive:
+            return True
+        try:
+            return connection.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _checkout(self) -> Connection:
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if self._alive(connection):
+                return connection
+            connection.smtp.close()
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise smtplib.SMTPServerDisconnected("No free SMTP connection")
+        try:
+            connection = self._checkout()
+            try:
+                yield connection
+            except BaseException:
+                connection.smtp.close()
+                raise
+            connection.last_used = time.monotonic()
+            if connection.sent >= self.max_messages:
+                connection.close()
+            else:
+                self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+    def send(self, message: EmailMessage):
+        if errors := self.send_many([message]):
+            raise errors[0]
+
+    def send_many(self, messages: list[EmailMessage]) -> dict[int, Exception]:
+        """Send ``messages`` over one session; returns the errors by index.
+
+        A message the server refuses doesn't end the session. A connection
+        that drops is reopened once for the messages left.
+        """
+        errors, pending, reconnected = {}, list(enumerate(messages)), False
+        while pending:
+            try:
+                with self.connection() as connection:
+                    while pending:
+                        i, message = pending[0]
+                        try:
+                            connection.smtp.send_message(message)
+                            connection.sent += 1
+                        except smtplib.SMTPServerDisconnected:
+                            raise
+                        except smtplib.SMTPException as err:
+                            errors[i] = err
+                        pending.pop(0)
+            except (smtplib.SMTPException, OSError) as err:
+                if reconnected or not is_transient(err):
+                    errors.update((i, err) for i, _ in pending)
+                    break
+                reconnected = True
+                logger.info("SMTP connection lost, reconnecting: %s", err)
+        return errors
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def build_message(to: str, subject: str, body: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = email_settings["email_from"]
+    msg["To"] = to
+    msg.set_content(body)
+    return msg
+
+
+def verification_message(email: str, code: str) -> dict:
+    return {
+        "to": email,
+        "subject": "Подтверждение регистрации",
+        "body": f"Ваш код подтверждения: {code}",
+    }
+
+
+DIGEST_LINES = {
+    "comment": "{actor} прокомментировал(а) ваш пост «{title}»",
+    "reply": "{actor} ответил(а) на ваш комментарий к посту «{title}»",
+}
+DIGEST_MAX_LINES = 20
+
+
+def digest_message(email: str, items: list[dict]) -> dict:
+    """One email for a user's pending notifications, ``{"kind", "actor",
+    "title"}`` each."""
+    lines = [
+        DIGEST_LINES[item["kind"]].format(
+            actor=item["actor"] or "Удалённый пользователь",
+            title=item["title"] or "удалённый пост",
+        )
+        for item in items[:DIGEST_MAX_LINES]
+    ]
+    if len(items) > DIGEST_MAX_LINES:
+        lines.append(f"…и ещё {len(items) - DIGEST_MAX_LINES}")
+    return {
+        "to": email,
+        "subject": f"Новые уведомления: {len(items)}",
+        "body": "\n".join(lines),
+    }
+
+
+_pool: SMTPPool | None = None
+_pool_pid: int | None = None
+
+
+def get_pool() -> SMTPPool:
+    """The pool of this process; a forked worker never reuses its parent's
+    sockets."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = SMTPPool(
+            email_settings["smtp_server"],
+            email_settings["smtp_port"],
+            email_settings["email_from"],
+            email_settings["email_password"],
+            starttls=email_settings["starttls"],
+            timeout=email_settings["timeout"],
+            size=email_settings["pool_size"],
+            keepalive=email_settings["keepalive_seconds"],
+            max_messages=email_settings["max_messages_per_connection"],
+        )
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def close_pool():
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+    _pool = None
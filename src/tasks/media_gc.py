@@ -0,0 +1,25 @@
+import asyncio
+
+from src.celery_app import celery_app
+from src.config.database import engine
+from src.config.settings import get_media_settings
+from src.media.dao import MediaDao
+from src.media.storage import get_storage
+
+media_settings = get_media_settings()
+
+
+async def _collect():
+    try:
+        fixed = await MediaDao.reconcile()
+        removed = await MediaDao.collect_garbage(
+            get_storage(), grace_minutes=media_settings["gc_grace_minutes"]
+        )
+    finally:
+        await engine.dispose()
+    return {"reconciled": fixed, "removed": removed}
+
+
+@celery_app.task
+def collect_media_garbage():
+    return asyncio.run(_collect())
@@ -0,0 +1,25 @@
+import asyncio
+
+from src.celery_app import celery_app
+from src.config.database import engine
+from src.config.settings import settings
+from src.notifications.dao import NotificationDao
+
+
+async def _send_digests(batch_size: int):
+    after, emails = 0, 0
+    try:
+        while after is not None:
+            after, sent = await NotificationDao.send_digests(after, batch_size)
+            emails += sent
+    finally:
+        await engine.dispose()
+    return emails
+
+
+@celery_app.task
+def send_notification_digests():
+    """Email every user one digest of the notifications they have not read
+    since the last one, ``NOTIFICATIONS_DIGEST_BATCH_SIZE`` users per
+    transaction."""
+    return asyncio.run(_send_digests(settings.NOTIFICATIONS_DIGEST_BATCH_SIZE))
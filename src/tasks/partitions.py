@@ -0,0 +1,20 @@
+import asyncio
+
+from src.celery_app import celery_app
+from src.config.database import engine
+from src.config.partitions import create_future_partitions
+
+
+async def _create():
+    try:
+        async with engine.begin() as connection:
+            return await create_future_partitions(connection)
+    finally:
+        await engine.dispose()
+
+
+@celery_app.task
+def create_partitions():
+    """Create the monthly partitions of the next ``PARTITION_MONTHS_AHEAD``
+    months that don't exist yet; inserts fail once a month has none."""
+    return asyncio.run(_create())
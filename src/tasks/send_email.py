@@ -1,24 +1,72 @@
-import smtplib
-from email.message import EmailMessage
+import logging
+import random
+
+from celery.exceptions import MaxRetriesExceededError
+from celery.signals import worker_process_shutdown
 
 from src.celery_app import celery_app
 from src.config.settings import get_email_settings
+from src.tasks.mailer import (
+    build_message,
+    close_pool,
+    get_pool,
+    is_transient,
+    verification_message,
+)
+
+logger = logging.getLogger(__name__)
 
 email_settings = get_email_settings()
 
 
-@celery_app.task
-def send_verification_email(email: str, code: str):
-    msg = EmailMessage()
-    msg["Subject"] = "Подтверждение регистрации"
-    msg["From"] = email_settings["email_from"]
-    msg["To"] = email
-    msg.set_content(f"Ваш код подтверждения: {code}")
-
-    try:
-        with smtplib.SMTP(email_settings["smtp_server"], email_settings["smtp_port"]) as server:
-            server.starttls()
-            server.login(email_settings["email_from"], email_settings["email_password"])
-            server.send_message(msg)
-    except Exception as e:
-        print(f"Ошибка при отправке email: {e}")
+def backoff(retries: int) -> float:
+    delay = min(
+        email_settings["retry_backoff_seconds"] * 2**retries,
+        email_settings["retry_backoff_max_seconds"],
+    )
+    return delay * random.uniform(0.5, 1)
+
+
+def _deliver(task, messages: list[dict]) -> dict:
+    """Send ``messages`` over a pooled connection and retry the ones that
+    failed for a reason that may pass."""
+    errors = get_pool().send_many([build_message(**message) for message in messages])
+    transient = []
+    for i, err in errors.items():
+        if is_transient(err):
+            transient.append(messages[i])
+        else:
+            logger.error("Email to %s rejected: %s", messages[i]["to"], err)
+
+    if transient:
+        try:
+            # A single verification email keeps its own arguments.
+            raise task.retry(
+                args=[transient] if task.name == send_emails.name else None,
+                countdown=backoff(task.request.retries),
+                max_retries=email_settings["max_retries"],
+            )
+        except MaxRetriesExceededError:
+            logger.error(
+                "Giving up on %d emails after %d retries",
+                len(transient),
+                task.request.retries,
+            )
+    return {"sent": len(messages) - len(errors), "failed": len(errors)}
+
+
+@celery_app.task(bind=True)
+def send_emails(self, messages: list[dict]):
+    """Send a batch of ``{"to", "subject", "body"}`` messages in one SMTP
+    session."""
+    return _deliver(self, messages)
+
+
+@celery_app.task(bind=True)
+def send_verification_email(self, email: str, code: str):
+    return _deliver(self, [verification_message(email, code)])
+
+
+@worker_process_shutdown.connect
+def _close_smtp_pool(**kwargs):
+    close_pool()
@@ -8,7 +8,7 @@ from pydantic import EmailStr
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.settings import get_auth_data
-from src.tasks.send_email import send_verification_email
+from src.notifications.dispatcher import get_dispatcher
 from src.users.dao import UserDao
 from src.users.models import User
 from src.users.schemas import SUserRegister
@@ -79,7 +79,7 @@ async def register_user(user_data: SUserRegister):
         verification_expires=datetime.now() + timedelta(minutes=10),
     )
 
-    send_verification_email.apply_async(args=[user_data.email, verification_code])
+    await get_dispatcher().send_verification(user_data.email, verification_code)
 
     return {"message": "Код подтверждения отправлен на email"}
 
@@ -131,6 +131,6 @@ async def resend_verification_code(user: User, session: AsyncSession):
     await session.merge(user)
     await session.commit()
 
-    send_verification_email.apply_async(args=[user.email, new_code])
+    await get_dispatcher().send_verification(user.email, new_code)
 
     return {"message": "Новый код подтверждения отправлен на email", "success": True}
@@ -4,6 +4,7 @@ from fastapi import Depends, HTTPException, Request, status
 from jose import JWTError, jwt
 
 from src.config.settings import get_auth_data, get_email_settings
+from src.monitoring.timing import timed_auth
 from src.users.dao import UserDao
 from src.users.models import User
 
@@ -19,32 +20,8 @@ def get_token(request: Request):
     return token
 
 
-async def get_current_user_or_none(token: str = Depends(get_token)):
-    try:
-        auth_data = get_auth_data()
-        payload = jwt.decode(
-            token, auth_data["secret_key"], algorithms=[auth_data["algorithm"]]
-        )
-    except JWTError:
-        return None
-
-    expire = payload.get("exp")
-    expire_time = datetime.fromtimestamp(int(expire), tz=timezone.utc)
-    if (not expire) or (expire_time < datetime.now(timezone.utc)):
-        return None
-
-    user_id = payload.get("sub")
-    if not user_id:
-        return None
-
-    user = await UserDao.find_one_or_none_by_id(int(user_id))
-    if not user:
-        return None
-
-    return user
-
-
-async def get_current_user(token: str = Depends(get_token)):
+def token_user_id(token: str) -> int:
+    """The user id of a valid, unexpired access token."""
     try:
         auth_data = get_auth_data()
         payload = jwt.decode(
@@ -56,8 +33,10 @@ async def get_current_user(token: str = Depends(get_token)):
         ) from None
 
     expire = payload.get("exp")
-    expire_time = datetime.fromtimestamp(int(expire), tz=timezone.utc)
-    if (not expire) or (expire_time < datetime.now(timezone.utc)):
+    if (not expire) or (
+        datetime.fromtimestamp(int(expire), tz=timezone.utc)
+        < datetime.now(timezone.utc)
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Токен истек"
         )
@@ -67,8 +46,26 @@ async def get_current_user(token: str = Depends(get_token)):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Не найден ID пользователя"
         )
+    return int(user_id)
+
+
+@timed_auth
+async def get_current_user_or_none(token: str = Depends(get_token)):
+    try:
+        user_id = token_user_id(token)
+    except HTTPException:
+        return None
+
+    user = await UserDao.find_one_or_none_by_id(user_id)
+    if not user:
+        return None
 
-    user = await UserDao.find_one_or_none_by_id(int(user_id))
+    return user
+
+
+@timed_auth
+async def get_current_user(token: str = Depends(get_token)):
+    user = await UserDao.find_one_or_none_by_id(token_user_id(token))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
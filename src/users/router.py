@@ -4,6 +4,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import RedirectResponse
 
 from src.config.database import get_async_session
+from src.dao.export import ExportQuery, export_response
+from src.monitoring.timing import TimedRoute
 from src.users.auth import (
     auth_data,
     authenticate_user,
@@ -31,7 +33,7 @@ from src.users.schemas import (
     VerifyEmailSchema,
 )
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=TimedRoute)
 
 SECRET_KEY = auth_data["secret_key"]
 ALGORITHM = auth_data["algorithm"]
@@ -89,8 +91,8 @@ async def resend_code(
     summary="Получить всех пользователей",
     dependencies=[Depends(get_current_admin_user)],
 )
-async def get_all_users():
-    return await UserDao.find_all()
+async def get_all_users(export: ExportQuery = Depends()):
+    return await export_response(UserDao, export)
 
 
 @router.get("/find/", summary="поиск юзера")
@@ -0,0 +1,241 @@
+"""Fixtures for tests that run the app against a real Postgres.
+
+The database comes from the usual ``DB_*`` settings. Its name must contain
+``test`` because the schema is created from the models and every table is
+truncated between tests. Tests that need it are skipped when it is not
+configured or not reachable.
+"""
+
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from bench.routes import Seed
+from tests.query_recorder import QueryRecorder
+
+
+@pytest.fixture(scope="session")
+async def database():
+    if "test" not in os.environ.get("DB_NAME", ""):
+        pytest.skip("DB_NAME must point at a dedicated *test* database")
+
+    from src.config.database import Base, engine
+    from src.media import models as media_models  # noqa: F401
+    from src.notifications import models as notifications_models  # noqa: F401
+    from src.outbox import models as outbox_models  # noqa: F401
+    from src.posts import models as posts_models  # noqa: F401
+    from src.users import models as users_models  # noqa: F401
+
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(Base.metadata.create_all)
+    except OSError as err:
+        pytest.skip(f"Test database is not reachable: {err}")
+    yield engine
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def seed(database) -> Seed:
+    from src.config.database import Base, async_session_maker
+    from src.notifications.unread import unread
+    from src.posts.feed import feed_heads
+    from src.posts.models import Comment, Post, Subreddit, Subscription, Vote
+    from src.posts.subscription_cache import subscription_cache
+    from src.users.auth import get_password_hash
+    from src.users.models import Role, User
+
+    tables = ", ".join(t.name for t in Base.metadata.sorted_tables)
+    async with database.begin() as connection:
+        await connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    await subscription_cache.clear()
+    await feed_heads.clear()
+    await unread.clear()
+
+    password = get_password_hash("password123")
+
+    def make_user(name: str, **values) -> User:
+        return User(
+            username=name,
+            email=f"{name}@example.com",
+            password=password,
+            gender="male",
+            date_of_birth=datetime(2000, 1, 1),
+            **{"is_verified": True, **values},
+        )
+
+    async with async_session_maker() as session:
+        session.add_all(
+            [
+                Role(id=1, name="user"),
+                Role(id=2, name="admin"),
+                Role(id=3, name="super_admin"),
+            ]
+        )
+        await session.flush()
+
+        user = make_user("user")
+        # A super admin, so it passes every admin check.
+        admin = make_user("admin", role_id=3)
+        other = make_user("other")
+        unverified = make_user(
+            "unverified",
+            is_verified=False,
+            verification_code="123456",
+            verification_expires=datetime.now(timezone.utc) + timedelta(minutes=10),
+        )
+        session.add_all([user, admin, other, unverified])
+        await session.flush()
+
+        subreddit = Subreddit(name="python", description="snakes", created_by=user)
+        session.add(subreddit)
+        await session.flush()
+        session.add(Subscription(user_id=user.id, subreddit_id=subreddit.id))
+
+        posts = [
+            Post(
+                title=f"post {i}",
+                content="content",
+                user_id=(user, other)[i % 2].id,
+                subreddit_id=subreddit.id,
+                upvote=i,
+                comments_count=3,
+            )
+            for i in range(10)
+        ]
+        session.add_all(posts)
+        await session.flush()
+        post, voted_post = posts[0], posts[1]
+
+        comments = []
+        for target in posts:
+            root = Comment(content="root", post_id=target.id, user_id=other.id)
+            session.add(root)
+            await session.flush()
+            comments.append(root)
+            for _ in range(2):
+                reply = Comment(
+                    content="reply",
+                    post_id=target.id,
+                    user_id=user.id,
+                    parent_comment_id=root.id,
+                )
+                session.add(reply)
+                comments.append(reply)
+        await session.flush()
+        comment, reply, voted_comment = comments[0], comments[1], comments[3]
+
+        session.add_all(
+            [
+                Vote(user_id=user.id, post_id=voted_post.id, is_upvote=True),
+                Vote(user_id=user.id, comment_id=voted_comment.id, is_upvote=True),
+            ]
+        )
+        subscription = Subscription(user_id=other.id, subreddit_id=subreddit.id)
+        session.add(subscription)
+        await session.commit()
+
+        return Seed(
+            user=user.id,
+            admin=admin.id,
+            other=other.id,
+            unverified=unverified.id,
+            subreddit=subreddit.id,
+            post=post.id,
+            comment=comment.id,
+            reply=reply.id,
+            voted_post=voted_post.id,
+            voted_comment=voted_comment.id,
+            subscription=subscription.id,
+        )
+
+
+@pytest.fixture(scope="session")
+def app():
+    from src.main import app
+
+    return app
+
+
+@pytest.fixture
+async def client(app, seed):
+    import httpx
+
+    from src.posts.live import close_live_hub
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+    # The lifespan doesn't run here; live streams leave the hub's reader.
+    await close_live_hub()
+
+
+@pytest.fixture
+def login(client):
+    from src.users.auth import create_access_token
+
+    def login_as(user_id: int | None):
+        client.cookies.clear()
+        if user_id is not None:
+            client.cookies.set(
+                "users_access_token", create_access_token({"sub": str(user_id)})
+            )
+
+    return login_as
+
+
+@pytest.fixture(scope="session")
+def query_recorder(database):
+    from src.config.database import replica_engine
+
+    recorder = QueryRecorder(database, replica_engine)
+    recorder.install()
+    yield recorder
+    recorder.remove()
+
+
+class Handler:
+    def __init__(self):
+        self.messages = []
+        self.contents = []
+        self.sessions = set()
+        self.refuse = set()
+        # Deferred with a 4xx once, accepted on the next try.
+        self.defer = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refuse:
+            return "550 No such user"
+        if address in self.defer:
+            self.defer.discard(address)
+            return "451 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append(envelope.rcpt_tos[0])
+        self.contents.append(envelope.content)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    aiosmtpd = pytest.importorskip("aiosmtpd.controller")
+    handler = Handler()
+    controller = aiosmtpd.Controller(handler, hostname="localhost", port=free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
@@ -0,0 +1,85 @@
+import re
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# The same statement repeated this many times within one request is treated as
+# an N+1 pattern even when it is not a relationship lazy load.
+REPEAT_LIMIT = 3
+
+_PARAMS = re.compile(r"\$\d+|%\(\w+\)s|\b\d+\b")
+_IN_LIST = re.compile(r"IN \([^)]*\)", re.I)
+
+
+def normalize(statement: str) -> str:
+    statement = _IN_LIST.sub("IN (...)", statement)
+    return " ".join(_PARAMS.sub("?", statement).split())
+
+
+@dataclass
+class RecordedQueries:
+    statements: list[str] = field(default_factory=list)
+    parameters: list = field(default_factory=list)
+    lazy_loads: list[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self) -> dict[str, int]:
+        counts = Counter(normalize(s) for s in self.statements)
+        return {sql: n for sql, n in counts.items() if n >= REPEAT_LIMIT}
+
+    def repeated_lazy_loads(self) -> dict[str, int]:
+        counts = Counter(self.lazy_loads)
+        return {attr: n for attr, n in counts.items() if n > 1}
+
+    def report(self) -> str:
+        return "\n".join(f"  {i}. {s}" for i, s in enumerate(self.statements, 1))
+
+
+class QueryRecorder:
+    """Collects every SQL statement the engines execute while recording.
+
+    Lazy loads are tracked separately (by ``Class.attribute``) via the ORM
+    ``do_orm_execute`` hook, so a relationship loaded once per row shows up as
+    a repeated lazy load even when the row count is below ``REPEAT_LIMIT``.
+    """
+
+    def __init__(self, *engines):
+        self.engines = [e.sync_engine for e in engines if e is not None]
+        self.current: RecordedQueries | None = None
+
+    def install(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(Session, "do_orm_execute", self._on_orm_execute)
+
+    def remove(self):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._on_execute)
+        event.remove(Session, "do_orm_execute", self._on_orm_execute)
+
+    @contextmanager
+    def record(self):
+        self.current = RecordedQueries()
+        try:
+            yield self.current
+        finally:
+            self.current = None
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.current is not None:
+            self.current.statements.append(statement)
+            self.current.parameters.append(parameters)
+
+    def _on_orm_execute(self, orm_execute_state):
+        if self.current is None or not orm_execute_state.is_relationship_load:
+            return
+        if orm_execute_state.lazy_loaded_from is None:
+            return
+        prop = orm_execute_state.loader_strategy_path[-1]
+        self.current.lazy_loads.append(str(prop))
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def test_archived_thread_is_served_from_snapshot(client, login, seed):
+    from src.config.settings import settings
+    from src.posts import counters
+    from src.posts.dao import PostArchiveDao
+
+    api = settings.API_V1_STR
+    login(seed.user)
+    by_post = f"{api}/comments/comments/by_post/{seed.voted_post}"
+    votes = f"{api}/posts/votes/by-user"
+    live_thread = (await client.get(by_post)).json()
+    live_votes = (await client.get(votes, params={"ids": seed.voted_post})).json()
+
+    cutoff = datetime.now() + timedelta(minutes=1)
+    assert await PostArchiveDao.archive_posts(cutoff, limit=100) == 10
+    assert await PostArchiveDao.archive_posts(cutoff, limit=100) == 0
+
+    assert (await client.get(by_post)).json() == live_thread
+    assert (await client.get(votes, params={"ids": seed.voted_post})).json() == (
+        live_votes
+    )
+
+    upvote = await client.post(
+        f"{api}/posts/upvote/{seed.post}", params={"is_upvote": True}
+    )
+    assert upvote.status_code == 409, upvote.text
+    comment = await client.post(
+        f"{api}/comments/create/", json={"post_id": seed.post, "content": "late"}
+    )
+    assert comment.status_code == 409, comment.text
+
+    # The live rows are gone; the frozen counters must not be "repaired".
+    for counter in (counters.comments, counters.post_votes):
+        assert await counter.reconcile(0, await counter.max_id() + 1) == 0
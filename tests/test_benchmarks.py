@@ -0,0 +1,157 @@
+"""Microbenchmarks of the pure-Python hot paths, no database needed.
+
+Inputs are built from a fixed seed, at several sizes, so runs are comparable.
+A plain test run skips them (``--benchmark-skip`` is in the pytest addopts of
+pyproject.toml); ``--benchmark-only`` runs them alone, for about a second
+each. To keep a baseline and check a change against it:
+
+    pytest tests/test_benchmarks.py --benchmark-only --benchmark-autosave
+    pytest tests/test_benchmarks.py --benchmark-only \\
+        --benchmark-compare --benchmark-compare-fail=median:10%
+
+The second run fails when a benchmark's median got more than 10% slower than
+in the latest saved run (kept under ``.benchmarks/``, per machine).
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from src.posts.dao import (  # noqa: E402
+    assign_votes,
+    comment_tree,
+    post_responses,
+    thread_ids,
+)
+from src.posts.models import Comment, Post  # noqa: E402
+from src.users.auth import create_access_token  # noqa: E402
+from src.users.dependencies import token_user_id  # noqa: E402
+from src.users.models import User  # noqa: E402
+from src.utilts import hot_score  # noqa: E402
+
+SEED = 47
+NOW = datetime(2026, 1, 1)
+THREAD_SIZES = [100, 1_000, 10_000]
+PAGE_SIZES = [20, 100, 1_000]
+
+
+def make_comments(size: int) -> list[Comment]:
+    """A thread of ``size`` comments, newest first as the route loads it:
+    a third are roots, the rest reply to an earlier comment, mostly a recent
+    one so some branches run deep."""
+    rng = random.Random(SEED)
+    users = [
+        User(id=i, username=f"user{i}", nickname=f"User {i}") for i in range(1, 51)
+    ]
+    comments = []
+    for i in range(1, size + 1):
+        parent = None
+        if i > 1 and rng.random() > 0.33:
+            parent = max(1, i - int(rng.expovariate(0.2)) - 1)
+        created_at = NOW + timedelta(seconds=i)
+        comment = Comment(
+            id=i,
+            post_id=1,
+            user_id=rng.randint(1, 50),
+            content=" ".join("lorem" for _ in range(rng.randint(5, 60))),
+            upvote=rng.randint(0, 500),
+            replies_count=0,
+            parent_comment_id=parent,
+            created_at=created_at,
+            updated_at=created_at,
+        )
+        # Set the loaded attribute only, as selectinload does: assigning the
+        # relationship would fill ``User.comments`` through the backref.
+        comment.__dict__["user"] = users[comment.user_id - 1]
+        comments.append(comment)
+    comments.reverse()
+    return comments
+
+
+def make_posts(size: int) -> list[Post]:
+    rng = random.Random(SEED)
+    posts = []
+    for i in range(1, size + 1):
+        created_at = NOW - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+        posts.append(
+            Post(
+                id=i,
+                title=f"Post {i}",
+                content=" ".join("lorem" for _ in range(rng.randint(10, 300))),
+                upvote=rng.randint(0, 5000),
+                user_id=rng.randint(1, 50),
+                subreddit_id=rng.randint(1, 20),
+                image_path=None,
+                comments_count=rng.randint(0, 300),
+                archived_at=None,
+                created_at=created_at,
+                updated_at=created_at,
+            )
+        )
+    return posts
+
+
+@pytest.fixture(scope="module", params=THREAD_SIZES, ids=lambda n: f"comments={n}")
+def comments(request) -> list[Comment]:
+    return make_comments(request.param)
+
+
+@pytest.fixture(scope="module", params=PAGE_SIZES, ids=lambda n: f"posts={n}")
+def posts(request) -> list[Post]:
+    return make_posts(request.param)
+
+
+def test_comment_tree(benchmark, comments):
+    roots = benchmark(comment_tree, comments)
+    assert len(thread_ids(roots)) == len(comments)
+
+
+def test_assign_votes(benchmark, comments):
+    roots = comment_tree(comments)
+    rng = random.Random(SEED)
+    ids = thread_ids(roots)
+    votes = {i: rng.random() < 0.8 for i in rng.sample(ids, len(ids) // 10)}
+
+    def collect_and_assign():
+        assign_votes(roots, votes)
+        return thread_ids(roots)
+
+    assert len(benchmark(collect_and_assign)) == len(comments)
+
+
+def test_comment_to_dict(benchmark, comments):
+    result = benchmark(lambda: [comment.to_dict() for comment in comments])
+    assert len(result) == len(comments)
+
+
+def test_post_to_dict(benchmark, posts):
+    result = benchmark(lambda: [post.to_dict() for post in posts])
+    assert len(result) == len(posts)
+
+
+def test_post_responses(benchmark, posts):
+    rng = random.Random(SEED)
+    votes = {post.id: rng.random() < 0.8 for post in posts if rng.random() < 0.3}
+    result = benchmark(post_responses, posts, votes)
+    assert [response.user_vote for response in result] == [
+        votes.get(post.id) for post in posts
+    ]
+
+
+def test_hot_score(benchmark, posts):
+    result = benchmark(
+        lambda: [hot_score(post.upvote, post.created_at) for post in posts]
+    )
+    assert len(result) == len(posts)
+
+
+def test_create_access_token(benchmark):
+    assert benchmark(create_access_token, {"sub": "1"})
+
+
+def test_token_user_id(benchmark):
+    token = create_access_token({"sub": "1"})
+    assert benchmark(token_user_id, token) == 1
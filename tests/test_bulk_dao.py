@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, text
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def subreddits(names) -> dict[str, str]:
+    from src.config.database import async_session_maker
+    from src.posts.models import Subreddit
+
+    async with async_session_maker() as session:
+        rows = await session.execute(
+            select(Subreddit.name, Subreddit.description).where(
+                Subreddit.name.in_(names)
+            )
+        )
+        return dict(rows.all())
+
+
+async def test_copy_fills_omitted_defaults_across_partitions(seed, database):
+    from src.posts.dao import PostDao, SubredditDao
+
+    assert (
+        await SubredditDao.add_many(
+            [{"name": "copied", "description": "d", "created_by_id": seed.user}],
+            copy=True,
+        )
+        == 1
+    )
+    # upvote and comments_count only have Python-side defaults.
+    months = [datetime.now(), datetime.now() + timedelta(days=40)]
+    rows = [
+        {
+            "title": f"copied {i}",
+            "user_id": seed.user,
+            "subreddit_id": seed.subreddit,
+            "created_at": months[i % 2],
+        }
+        for i in range(5)
+    ]
+    assert await PostDao.add_many(rows, batch_size=2, copy=True) == 5
+
+    async with database.connect() as connection:
+        subreddit = (
+            await connection.execute(
+                text(
+                    "SELECT subscribers_count, created_at FROM subreddits "
+                    "WHERE name = 'copied'"
+                )
+            )
+        ).one()
+        posts = (
+            await connection.execute(
+                text(
+                    "SELECT count(*), count(DISTINCT tableoid), max(upvote), "
+                    "max(comments_count) FROM posts WHERE title LIKE 'copied %'"
+                )
+            )
+        ).one()
+    assert subreddit.subscribers_count == 0
+    assert subreddit.created_at is not None
+    assert tuple(posts) == (5, 2, 0, 0)
+
+
+async def test_update_many_by_another_key(seed):
+    from src.posts.dao import SubredditDao
+
+    names = [f"sub{i}" for i in range(3)]
+    await SubredditDao.add_many(
+        [{"name": n, "description": "old", "created_by_id": seed.user} for n in names]
+    )
+    updated = await SubredditDao.update_many(
+        [{"name": n, "description": f"new {n}"} for n in [*names, "missing"]],
+        key="name",
+        batch_size=2,
+    )
+
+    assert updated == 3
+    assert await subreddits(names) == {n: f"new {n}" for n in names}
+
+
+async def test_upsert_many_without_update_columns_keeps_existing_rows(seed):
+    from src.posts.dao import SubredditDao
+
+    rows = [
+        {"name": name, "description": "upserted", "created_by_id": seed.other}
+        for name in ("python", "rust")
+    ]
+    affected = await SubredditDao.upsert_many(
+        rows, index_elements=("name",), update_columns=[]
+    )
+    assert affected == 1
+    assert await subreddits(["python", "rust"]) == {
+        "python": "snakes",
+        "rust": "upserted",
+    }
+
+    assert await SubredditDao.upsert_many(rows, index_elements=("name",)) == 2
+    assert await subreddits(["python"]) == {"python": "upserted"}
+
+
+async def test_delete_many_batches_and_returns_the_ids(seed, query_recorder):
+    from src.posts.dao import SubredditDao
+
+    await SubredditDao.add_many(
+        [
+            {"name": f"tmp{i}", "description": "tmp", "created_by_id": seed.user}
+            for i in range(5)
+        ]
+    )
+    ids = [s.id for s in await SubredditDao.find_all() if s.description == "tmp"]
+
+    with query_recorder.record() as queries:
+        deleted = await SubredditDao.delete_many({"description": "tmp"}, batch_size=2)
+
+    assert sorted(deleted) == sorted(ids)
+    # Three chunks, then the empty one that ends the loop.
+    assert sum(s.startswith("DELETE") for s in queries.statements) == 4
+    assert await SubredditDao.find_one_or_none(description="tmp") is None
+    assert await SubredditDao.delete_many({"id": ids}) == []
+
+    with pytest.raises(ValueError):
+        await SubredditDao.delete_many({})
+    assert await SubredditDao.find_one_or_none_by_id(seed.subreddit) is not None
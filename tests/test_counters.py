@@ -0,0 +1,72 @@
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def drift() -> dict[str, int]:
+    from src.posts.counters import COUNTERS
+
+    return {
+        counter.name: await counter.reconcile(0, await counter.max_id() + 1)
+        for counter in COUNTERS
+    }
+
+
+async def test_writes_keep_counters_exact(client, login, seed):
+    from src.config.settings import settings
+
+    api = settings.API_V1_STR
+    await drift()
+
+    login(seed.admin)
+    await client.post(f"{api}/subreddit/create_subscribe/{seed.subreddit}")
+    await client.post(f"{api}/posts/upvote/{seed.post}", params={"is_upvote": True})
+    await client.post(f"{api}/posts/upvote/{seed.post}", params={"is_upvote": False})
+    await client.post(
+        f"{api}/comments/upvote/{seed.comment}", params={"is_upvote": False}
+    )
+    reply = await client.post(
+        f"{api}/comments/reply_to_comment/{seed.reply}",
+        json={"post_id": seed.post, "content": "nested"},
+    )
+    assert reply.status_code == 200, reply.text
+
+    login(seed.user)
+    await client.post(f"{api}/posts/delete_upvote/{seed.voted_post}")
+    await client.post(
+        f"{api}/comments/create/", json={"post_id": seed.post, "content": "new"}
+    )
+    deleted = await client.delete(f"{api}/comments/delete/{seed.reply}")
+    assert deleted.status_code == 200, deleted.text
+
+    login(seed.other)
+    await client.delete(f"{api}/subreddit/delete_subscription/{seed.subscription}")
+
+    leftover = await drift()
+    assert not any(leftover.values()), leftover
+
+
+async def test_concurrent_votes_of_one_user_count_once(seed):
+    import asyncio
+    from types import SimpleNamespace
+
+    from sqlalchemy import func, select
+
+    from src.config.database import async_session_maker
+    from src.posts.dao import PostDao
+    from src.posts.models import Vote
+
+    await drift()
+    voter = SimpleNamespace(id=seed.other)
+    await asyncio.gather(*(PostDao.up_vote(seed.post, True, voter) for _ in range(3)))
+    await asyncio.gather(*(PostDao.up_vote(seed.post, False, voter) for _ in range(3)))
+
+    async with async_session_maker() as session:
+        votes = await session.scalar(
+            select(func.count())
+            .select_from(Vote)
+            .where(Vote.user_id == seed.other, Vote.post_id == seed.post)
+        )
+    assert votes == 1
+    leftover = await drift()
+    assert not any(leftover.values()), leftover
@@ -0,0 +1,133 @@
+import logging
+
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+def dispatcher_for(controller, **kwargs):
+    from src.notifications.dispatcher import AsyncioDispatcher
+
+    return AsyncioDispatcher(
+        controller.hostname, controller.port, starttls=False, **kwargs
+    )
+
+
+def email(to: str) -> dict:
+    return {"to": to, "subject": "Привет", "body": "Тест"}
+
+
+async def test_close_drains_the_queue(smtp_server):
+    controller, handler = smtp_server
+    dispatcher = dispatcher_for(controller, concurrency=3)
+
+    await dispatcher.send([email(f"u{i}@example.com") for i in range(30)])
+    await dispatcher.close()
+
+    assert sorted(handler.messages) == sorted(f"u{i}@example.com" for i in range(30))
+    assert len(handler.sessions) <= 3
+
+
+async def test_deferred_email_is_retried_and_refused_one_dropped(smtp_server, caplog):
+    controller, handler = smtp_server
+    handler.defer.add("later@example.com")
+    handler.refuse.add("gone@example.com")
+    dispatcher = dispatcher_for(controller, backoff=0.01)
+
+    with caplog.at_level(logging.ERROR):
+        await dispatcher.send(
+            [email(to) for to in ("later@example.com", "gone@example.com")]
+        )
+        await dispatcher.close()
+
+    assert handler.messages == ["later@example.com"]
+    assert "gone@example.com" in caplog.text
+
+
+async def test_register_sends_the_code_in_process(client, smtp_server, monkeypatch):
+    from sqlalchemy import select
+
+    from src.config.database import async_session_maker
+    from src.config.settings import settings
+    from src.notifications import dispatcher
+    from src.users.models import User
+
+    controller, handler = smtp_server
+    monkeypatch.setattr(dispatcher, "_dispatcher", dispatcher_for(controller))
+    response = await client.post(
+        f"{settings.API_V1_STR}/users/register/",
+        json={
+            "username": "newbie",
+            "email": "newbie@example.com",
+            "date_of_birth": "2000-01-01",
+            "gender": "other",
+            "password": "password123",
+        },
+    )
+    assert response.status_code == 200, response.text
+    # What shutdown does: the email goes out before the app stops.
+    await dispatcher.close_dispatcher()
+
+    async with async_session_maker() as session:
+        code = await session.scalar(
+            select(User.verification_code).where(User.email == "newbie@example.com")
+        )
+    assert handler.messages == ["newbie@example.com"]
+    assert f"Ваш код подтверждения: {code}".encode() in handler.contents[0]
+
+
+async def test_celery_tasks_are_queued_once_committed(database, monkeypatch):
+    from sqlalchemy import text
+
+    from src.config.database import async_session_maker, current_session, finish_session
+    from src.notifications.dispatcher import CeleryDispatcher
+    from src.tasks.send_email import send_verification_email
+
+    queued = []
+    monkeypatch.setattr(
+        send_verification_email, "apply_async", lambda args: queued.append(args)
+    )
+    dispatcher = CeleryDispatcher()
+    for commit in (False, True):
+        async with async_session_maker() as session:
+            token = current_session.set(session)
+            try:
+                await session.execute(text("SELECT 1"))
+                await dispatcher.send_verification("newbie@example.com", str(commit))
+                assert queued == []
+                if commit:
+                    await finish_session(session)
+                else:
+                    await session.rollback()
+            finally:
+                current_session.reset(token)
+    assert queued == [["newbie@example.com", "True"]]
+
+    # Outside a transaction there is nothing to wait for.
+    await dispatcher.send_verification("newbie@example.com", "now")
+    assert queued[-1] == ["newbie@example.com", "now"]
+
+
+async def test_in_process_emails_are_queued_once_committed(database, smtp_server):
+    from sqlalchemy import text
+
+    from src.config.database import async_session_maker, current_session, finish_session
+
+    controller, handler = smtp_server
+    dispatcher = dispatcher_for(controller)
+    for commit in (False, True):
+        async with async_session_maker() as session:
+            token = current_session.set(session)
+            try:
+                await session.execute(text("SELECT 1"))
+                await dispatcher.send([email(f"{commit}@example.com")])
+                assert dispatcher._workers == []
+                if commit:
+                    await finish_session(session)
+                else:
+                    await session.rollback()
+            finally:
+                current_session.reset(token)
+    await dispatcher.close()
+
+    assert handler.messages == ["True@example.com"]
@@ -0,0 +1,121 @@
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def expected_feed(user_id: int) -> list[int]:
+    from sqlalchemy import select
+
+    from src.config.database import async_session_maker
+    from src.posts.models import Post, Subscription
+
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(Post.id)
+            .join(Subscription, Subscription.subreddit_id == Post.subreddit_id)
+            .where(Subscription.user_id == user_id)
+            .order_by(Post.created_at.desc(), Post.id.desc())
+        )
+        return result.scalars().all()
+
+
+async def test_new_feed_pages_merge_subreddits_in_order(client, login, seed):
+    from src.config.settings import settings
+
+    api = settings.API_V1_STR
+    login(seed.user)
+    await client.post(
+        f"{api}/subreddit/create/", json={"name": "golang", "description": "gophers"}
+    )
+    found = await client.get(f"{api}/subreddit/find/", params={"name": "golang"})
+    [golang] = [subreddit["id"] for subreddit in found.json()]
+    await client.post(
+        f"{api}/subreddit/subscriptions/bulk/", json={"subscribe": [golang]}
+    )
+    for i in range(4):
+        await client.post(
+            f"{api}/posts/create/",
+            data={"subreddit_id": golang, "title": f"go {i}", "content": "body"},
+        )
+
+    # The seeded posts share one created_at, so pages split ties by id.
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get(f"{api}/posts/lenta/new/", params=params)).json()
+        seen += [post["id"] for post in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == await expected_feed(seed.user)
+
+    lenta = await client.get(
+        f"{api}/posts/lenta/", params={"sort_by": "new", "offset": 3, "limit": 5}
+    )
+    assert [post["id"] for post in lenta.json()] == seen[3:8]
+
+
+async def test_moved_and_deleted_posts_leave_the_feed(client, login, seed):
+    from src.config.settings import settings
+
+    api = settings.API_V1_STR
+    login(seed.admin)
+    await client.post(
+        f"{api}/subreddit/create/", json={"name": "golang", "description": "gophers"}
+    )
+    found = await client.get(f"{api}/subreddit/find/", params={"name": "golang"})
+    [golang] = [subreddit["id"] for subreddit in found.json()]
+
+    login(seed.user)
+    feed = await client.get(f"{api}/posts/lenta/new/", params={"limit": 100})
+    assert seed.post in [post["id"] for post in feed.json()["items"]]
+
+    await client.put(
+        f"{api}/posts/update/{seed.post}",
+        json={"title": "moved", "content": "body", "subreddit_id": golang},
+    )
+    await client.delete(f"{api}/posts/delete/{seed.voted_post}")
+    feed = await client.get(f"{api}/posts/lenta/new/", params={"limit": 100})
+    assert [post["id"] for post in feed.json()["items"]] == await expected_feed(
+        seed.user
+    )
+
+
+async def test_cold_first_page_of_many_subreddits_reads_the_in_list(
+    client, login, seed, monkeypatch
+):
+    from src.config.settings import settings
+    from src.posts import feed
+
+    heads = feed.feed_heads
+    # The second subreddit has no posts; it only takes the page past the cutoff.
+    subscribed = [seed.subreddit, seed.subreddit + 1000]
+
+    async def cold(subreddit_ids, limit, after):
+        return [], list(subreddit_ids), dict.fromkeys(subreddit_ids, b"0")
+
+    async def load(heads, versions):
+        raise AssertionError("heads loaded past FEED_LATERAL_MAX_SUBREDDITS")
+
+    queries = []
+    in_list_query = feed.in_list_query
+    monkeypatch.setattr(heads, "lateral_max", 1)
+    monkeypatch.setattr(heads, "_from_redis", cold)
+    monkeypatch.setattr(heads, "_load", load)
+    monkeypatch.setattr(
+        feed,
+        "in_list_query",
+        lambda *args: queries.append(args) or in_list_query(*args),
+    )
+
+    posts, _ = await heads.page(subscribed, 5)
+    assert len(queries) == 1
+    assert [post.id for post in posts] == (await expected_feed(seed.user))[:5]
+
+    login(seed.user)
+    api = settings.API_V1_STR
+    for offset in (-1, 1001):
+        response = await client.get(
+            f"{api}/posts/lenta/", params={"sort_by": "new", "offset": offset}
+        )
+        assert response.status_code == 422
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+@pytest.fixture
+async def hub():
+    from src.posts.live import LiveHub
+
+    hub = LiveHub(coalesce=0.05, max_connections=2, max_comments=3, retry=60)
+    yield hub
+    await hub.close()
+
+
+async def test_updates_are_coalesced_per_post(hub):
+    async with hub.listen(1) as watcher, hub.listen(2) as other:
+        for upvotes in range(5):
+            hub.received(1, {"upvotes": upvotes})
+        hub.received(1, {"comments_count": 4, "comment": {"id": 10}})
+
+        update = await watcher.next(1)
+        assert update == {"upvotes": 4, "comments_count": 4, "comments": [{"id": 10}]}
+        assert await other.next(0.1) is None
+        # Nothing is left over for the next tick.
+        assert await watcher.next(0.1) is None
+        assert hub.full()
+    assert not hub.full()
+
+
+async def test_slow_listener_keeps_a_bounded_update(hub):
+    async with hub.listen(1) as watcher:
+        for i in range(3):
+            hub.received(1, {"upvotes": i, "comment": {"id": i}})
+            await asyncio.sleep(0.1)
+        hub.received(1, {"comment": {"id": 3}})
+        await asyncio.sleep(0.1)
+
+        update = await watcher.next(1)
+        assert update["upvotes"] == 2
+        assert [c["id"] for c in update["comments"]] == [1, 2, 3]
+        assert update["resync"]
+
+
+async def test_live_stream_starts_with_a_snapshot(client, seed, monkeypatch):
+    from src.config.settings import settings
+
+    api = settings.API_V1_STR
+    monkeypatch.setattr(settings, "LIVE_CONNECTION_SECONDS", 0)
+    response = await client.get(f"{api}/posts/{seed.post}/live")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    event, data = response.text.strip().split("\n")
+    assert event == "event: snapshot"
+    assert json.loads(data.removeprefix("data: ")) == {
+        "upvotes": 0,
+        "comments_count": 3,
+    }
+
+    response = await client.get(f"{api}/posts/999999/live")
+    assert response.status_code == 404
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+from src.monitoring.loop_lag import LoopLagMonitor
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+def block_the_loop():
+    time.sleep(0.3)
+
+
+async def handler():
+    block_the_loop()
+
+
+async def test_blocking_call_is_logged_with_its_stack(caplog):
+    blocks = REGISTRY.get_sample_value("event_loop_blocks_total") or 0
+    lags = REGISTRY.get_sample_value("event_loop_lag_seconds_count") or 0
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    try:
+        with caplog.at_level(logging.WARNING, logger="src.monitoring.loop_lag"):
+            await asyncio.sleep(0.05)
+            await asyncio.create_task(handler(), name="slow-request")
+            await asyncio.sleep(0.05)
+    finally:
+        monitor.stop()
+
+    [record] = caplog.records
+    message = record.getMessage()
+    assert message.startswith("Event loop blocked for ")
+    assert "in slow-request:" in message
+    assert "in block_the_loop" in message
+    assert "time.sleep(0.3)" in message
+    # The loop's own frames are left out.
+    assert "base_events.py" not in message
+    assert REGISTRY.get_sample_value("event_loop_blocks_total") == blocks + 1
+    assert REGISTRY.get_sample_value("event_loop_lag_seconds_count") > lags + 1
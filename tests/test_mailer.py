@@ -0,0 +1,77 @@
+import smtplib
+import socket
+from email.message import EmailMessage
+
+from src.tasks.mailer import SMTPPool, is_transient
+
+
+def message(to: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = "Подтверждение регистрации"
+    msg["From"] = "noreply@example.com"
+    msg["To"] = to
+    msg.set_content("Ваш код подтверждения: 123456")
+    return msg
+
+
+def pool_for(controller, **kwargs) -> SMTPPool:
+    return SMTPPool(controller.hostname, controller.port, starttls=False, **kwargs)
+
+
+def test_messages_share_one_session(smtp_server):
+    controller, handler = smtp_server
+    pool = pool_for(controller, max_messages=30)
+
+    assert pool.send_many([message(f"u{i}@example.com") for i in range(20)]) == {}
+    for i in range(20, 40):
+        pool.send(message(f"u{i}@example.com"))
+    pool.close()
+
+    assert len(handler.messages) == 40
+    # Retired after 30 messages, the rest went over a second session.
+    assert len(handler.sessions) == 2
+
+
+def test_dropped_connection_is_reopened(smtp_server):
+    controller, handler = smtp_server
+    pool = pool_for(controller, keepalive=3600)
+    pool.send(message("first@example.com"))
+
+    # The server closes the idle session without the pool noticing.
+    with pool.connection() as connection:
+        connection.smtp.sock.shutdown(socket.SHUT_RDWR)
+    assert pool.send_many([message("second@example.com")]) == {}
+    pool.close()
+
+    assert handler.messages == ["first@example.com", "second@example.com"]
+
+
+def test_refused_recipient_does_not_end_the_batch(smtp_server):
+    controller, handler = smtp_server
+    handler.refuse.add("gone@example.com")
+    pool = pool_for(controller)
+
+    errors = pool.send_many(
+        [message(to) for to in ("a@example.com", "gone@example.com", "b@example.com")]
+    )
+    pool.close()
+
+    assert list(errors) == [1]
+    assert not is_transient(errors[1])
+    assert handler.messages == ["a@example.com", "b@example.com"]
+
+
+def test_transient_errors():
+    assert is_transient(smtplib.SMTPServerDisconnected())
+    assert is_transient(ConnectionRefusedError())
+    assert is_transient(smtplib.SMTPResponseException(421, b"Try again later"))
+    assert is_transient(
+        smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"Mailbox busy")})
+    )
+    assert not is_transient(smtplib.SMTPDataError(554, b"Rejected"))
+    assert not is_transient(smtplib.SMTPNotSupportedError("No STARTTLS"))
+    assert not is_transient(
+        smtplib.SMTPRecipientsRefused(
+            {"a@example.com": (450, b"Busy"), "b@example.com": (550, b"No user")}
+        )
+    )
@@ -0,0 +1,159 @@
+import hashlib
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+BODY = b"\x89PNG" + b"pixels" * 100
+DIGEST = hashlib.sha256(BODY).hexdigest()
+KEY = f"{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.png"
+
+
+@pytest.fixture
+def storage(tmp_path):
+    from src.media.storage import LocalStorage
+
+    return LocalStorage(root=str(tmp_path))
+
+
+async def upload(storage) -> str:
+    from src.media.dao import MediaDao
+
+    staged = await storage.stage(io.BytesIO(BODY), "photo.PNG")
+    assert staged.key == KEY
+    return await MediaDao.store(storage, staged)
+
+
+async def blobs() -> list:
+    from src.config.database import async_session_maker
+    from src.media.models import MediaBlob
+
+    async with async_session_maker() as session:
+        return list((await session.execute(select(MediaBlob))).scalars())
+
+
+async def test_same_bytes_share_one_blob(seed, storage, tmp_path):
+    first = await upload(storage)
+    second = await upload(storage)
+
+    assert first == second == f"{tmp_path}/{KEY}"
+    [blob] = await blobs()
+    assert (blob.key, blob.ref_count, blob.size) == (KEY, 2, len(BODY))
+    assert (tmp_path / KEY).read_bytes() == BODY
+    assert os.listdir(storage.tmp_dir) == []
+
+
+async def test_release_and_reconcile_track_references(seed, storage):
+    from src.config.database import async_session_maker
+    from src.media.dao import MediaDao
+    from src.posts.models import Post
+
+    path = await upload(storage)
+    await upload(storage)
+    for _ in range(3):
+        await MediaDao.release(path)
+    [blob] = await blobs()
+    assert blob.ref_count == 0
+
+    async with async_session_maker() as session:
+        await session.execute(
+            update(Post).where(Post.id == seed.post).values(image_path=path)
+        )
+        await session.commit()
+    assert await MediaDao.reconcile() == 1
+    assert await MediaDao.reconcile() == 0
+    [blob] = await blobs()
+    assert blob.ref_count == 1
+
+
+async def test_garbage_waits_for_the_grace_period(seed, storage, tmp_path):
+    from src.config.database import async_session_maker
+    from src.media.dao import MediaDao
+    from src.media.models import MediaBlob
+
+    path = await upload(storage)
+    await MediaDao.release(path)
+    stale = tmp_path / ".tmp" / "stale"
+    fresh = tmp_path / ".tmp" / "fresh"
+    stale.write_bytes(b"aborted upload")
+    fresh.write_bytes(b"upload in flight")
+    two_hours_ago = time.time() - 2 * 3600
+    os.utime(stale, (two_hours_ago, two_hours_ago))
+
+    assert await MediaDao.collect_garbage(storage, grace_minutes=60) == 0
+    assert (tmp_path / KEY).exists()
+    assert not stale.exists()
+    assert fresh.exists()
+
+    async with async_session_maker() as session:
+        await session.execute(
+            update(MediaBlob).values(updated_at=datetime.now() - timedelta(hours=2))
+        )
+        await session.commit()
+    assert await MediaDao.collect_garbage(storage, grace_minutes=60) == 1
+    assert not (tmp_path / KEY).exists()
+    assert await blobs() == []
+
+
+async def test_rejected_post_publishes_no_image(
+    client, login, seed, storage, tmp_path, monkeypatch
+):
+    from src.config.database import async_session_maker
+    from src.config.settings import settings
+    from src.media import storage as media_storage
+    from src.media.models import MediaBlob
+
+    monkeypatch.setattr(media_storage, "_storage", storage)
+    login(seed.user)
+    create = f"{settings.API_V1_STR}/posts/create/"
+    files = {"image": ("photo.png", BODY, "image/png")}
+
+    response = await client.post(
+        create, data={"subreddit_id": 999, "title": "lost"}, files=files
+    )
+    assert response.status_code == 400, response.text
+    assert await blobs() == []
+    assert not (tmp_path / KEY).exists()
+
+    response = await client.post(
+        create, data={"subreddit_id": seed.subreddit, "title": "kept"}, files=files
+    )
+    assert response.status_code == 200, response.text
+    assert (tmp_path / KEY).read_bytes() == BODY
+    async with async_session_maker() as session:
+        count = select(func.count()).select_from(MediaBlob)
+        assert await session.scalar(count) == 1
+
+
+async def test_s3_storage_round_trip(tmp_path, monkeypatch):
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    from src.media.storage import S3Storage
+
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        boto3.client("s3").create_bucket(Bucket="media")
+        storage = S3Storage(
+            root=str(tmp_path),
+            bucket="media",
+            public_url="https://cdn.example.com/",
+            access_key="key",
+            secret_key="secret",
+        )
+        staged = await storage.stage(io.BytesIO(BODY), "photo.png")
+        await storage.publish(staged, staged.key)
+
+        assert storage.url(KEY) == f"https://cdn.example.com/{KEY}"
+        stored = storage.client.get_object(Bucket="media", Key=KEY)
+        assert stored["Body"].read() == BODY
+        assert stored["CacheControl"] == "public, max-age=31536000, immutable"
+        assert os.listdir(storage.tmp_dir) == []
+
+        await storage.delete(KEY)
+        listing = storage.client.list_objects_v2(Bucket="media")
+        assert listing["KeyCount"] == 0
@@ -0,0 +1,60 @@
+import hashlib
+
+import httpx
+import pytest
+
+
+def test_accept_encoding_q_values():
+    from src.media.serving import accepted_encodings
+
+    assert accepted_encodings("gzip, br;q=0.5, identity; q=0, *;q=x") == {
+        "gzip": 1.0,
+        "br": 0.5,
+        "identity": 0.0,
+        "*": 0.0,
+    }
+
+
+@pytest.fixture
+def media(tmp_path):
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+
+    from src.media.serving import MediaFiles
+
+    body = b"{}" * 1000
+    digest = hashlib.sha256(body).hexdigest()
+    key = f"{digest[:2]}/{digest[2:4]}/{digest}.json"
+    (tmp_path / digest[:2] / digest[2:4]).mkdir(parents=True)
+    (tmp_path / key).write_bytes(body)
+    (tmp_path / f"{key}.gz").write_bytes(b"gzip")
+    (tmp_path / f"{key}.br").write_bytes(b"br")
+    app = Starlette(routes=[Mount("/media", MediaFiles(directory=tmp_path))])
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://media"
+    )
+    return client, f"/media/{key}"
+
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize(
+    "accept, encoding",
+    [
+        ("gzip, br", "br"),
+        ("gzip, br;q=0.5", "gzip"),
+        ("gzip;q=0, br;q=0", None),
+        ("*", "br"),
+        ("*;q=0, gzip", "gzip"),
+        ("identity", None),
+    ],
+)
+async def test_precompressed_variant_follows_accept_encoding(media, accept, encoding):
+    client, url = media
+    # Headers only: the variants aren't really compressed.
+    async with client.stream(
+        "GET", url, headers={"accept-encoding": accept}
+    ) as response:
+        assert response.status_code == 200
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
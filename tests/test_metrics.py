@@ -0,0 +1,45 @@
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def scrape(client) -> dict[tuple, float]:
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    return {
+        (sample.name, *sorted(sample.labels.items())): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+async def test_metrics_label_queries_by_route_and_dao(client, login, seed):
+    from src.config.settings import settings
+
+    route = f"{settings.API_V1_STR}/posts/find/"
+    http = (
+        "http_request_duration_seconds_count",
+        ("method", "GET"),
+        ("route", route),
+        ("status", "200"),
+    )
+    query = (
+        "db_query_duration_seconds_count",
+        ("dao", "PostDao.find_by_search"),
+        ("route", route),
+    )
+    rows = ("db_query_rows_count", *query[1:])
+    pool = ("db_pool_checkout_wait_seconds_count", ("pool", "primary"))
+
+    before = await scrape(client)
+    login(seed.user)
+    response = await client.get(route, params={"search": "post"})
+    assert response.status_code == 200, response.text
+    after = await scrape(client)
+
+    assert after[http] - before.get(http, 0) == 1
+    assert after[query] - before.get(query, 0) >= 1
+    assert after[rows] - before.get(rows, 0) >= 1
+    assert after[pool] > before.get(pool, 0)
+    assert ("db_pool_saturation", ("pool", "primary")) in after
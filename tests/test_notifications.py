@@ -0,0 +1,97 @@
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    async def publish(self, events):
+        self.events += events
+
+
+async def comment_on_seed(client, login, seed):
+    from src.config.settings import settings
+
+    api = settings.API_V1_STR
+    # A comment on the user's post, a reply to the other user's comment and
+    # a reply of the user to themselves.
+    login(seed.other)
+    await client.post(
+        f"{api}/comments/create/", json={"post_id": seed.post, "content": "hi"}
+    )
+    login(seed.user)
+    for parent in (seed.comment, seed.reply):
+        response = await client.post(
+            f"{api}/comments/reply_to_comment/{parent}",
+            json={"post_id": seed.post, "content": "reply"},
+        )
+        assert response.status_code < 400, response.text
+
+
+async def test_relay_notifies_authors_in_one_batch(client, login, seed):
+    from src.notifications.dao import NotificationDao
+    from src.outbox.relay import relay_once
+
+    await comment_on_seed(client, login, seed)
+    recorder = Recorder()
+    assert await relay_once(recorder, 100) == 3
+    # Still published for the other consumers.
+    assert [e.topic for e in recorder.events] == ["comment.created"] * 3
+
+    [comment] = await NotificationDao.find_for_user(seed.user, 10)
+    assert comment["kind"] == "comment"
+    assert comment["actor"] == {"id": seed.other, "username": "other"}
+    [reply] = await NotificationDao.find_for_user(seed.other, 10)
+    assert reply["kind"] == "reply"
+    assert reply["actor"]["id"] == seed.user
+    assert not reply["is_read"]
+
+
+async def test_unread_count_and_mark_read(client, login, seed):
+    from src.config.settings import settings
+    from src.outbox.relay import relay_once
+
+    api = settings.API_V1_STR
+    await comment_on_seed(client, login, seed)
+    await relay_once(Recorder(), 100)
+
+    login(seed.other)
+    response = await client.get(f"{api}/notifications/unread-count/")
+    assert response.json() == {"unread": 1}
+    [notification] = (await client.get(f"{api}/notifications/")).json()
+
+    response = await client.post(
+        f"{api}/notifications/read/", json={"ids": [notification["id"]]}
+    )
+    assert response.json() == {"read": 1}
+    response = await client.post(f"{api}/notifications/read/", json={})
+    assert response.json() == {"read": 0}
+    response = await client.get(f"{api}/notifications/unread-count/")
+    assert response.json() == {"unread": 0}
+
+
+async def test_digest_sends_one_email_per_user(client, login, seed):
+    from src.notifications.dao import NotificationDao
+    from src.outbox.relay import relay_once
+
+    await comment_on_seed(client, login, seed)
+    await relay_once(Recorder(), 100)
+
+    after, sent = 0, []
+    while after is not None:
+        after, emails = await NotificationDao.send_digests(after, 1)
+        sent.append(emails)
+    assert sent == [1, 1, 0]
+
+    recorder = Recorder()
+    assert await relay_once(recorder, 100) == 2
+    messages = [m for e in recorder.events for m in e.payload["messages"]]
+    assert sorted(m["to"] for m in messages) == [
+        "other@example.com",
+        "user@example.com",
+    ]
+    assert all(m["subject"] == "Новые уведомления: 1" for m in messages)
+    # Covered notifications are not sent again.
+    assert await NotificationDao.send_digests(0, 100) == (None, 0)
@@ -0,0 +1,121 @@
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+class Recorder:
+    def __init__(self, fail: bool = False):
+        self.events = []
+        self.fail = fail
+
+    async def publish(self, events):
+        if self.fail:
+            raise ConnectionError("broker unreachable")
+        self.events += events
+
+
+async def outbox_ids() -> list[int]:
+    from sqlalchemy import select
+
+    from src.config.database import async_session_maker
+    from src.outbox.models import OutboxEvent
+
+    async with async_session_maker() as session:
+        result = await session.execute(select(OutboxEvent.id).order_by(OutboxEvent.id))
+        return result.scalars().all()
+
+
+async def test_writes_reach_the_relay_once_committed(client, login, seed, monkeypatch):
+    from src.config.settings import settings
+    from src.notifications import dispatcher
+    from src.outbox.relay import RoutingSink, relay_once
+
+    api = settings.API_V1_STR
+    monkeypatch.setattr(dispatcher, "_dispatcher", dispatcher.OutboxDispatcher())
+    login(seed.user)
+    await client.post(
+        f"{api}/posts/create/",
+        data={"subreddit_id": seed.subreddit, "title": "new", "content": "body"},
+    )
+    await client.post(f"{api}/posts/upvote/{seed.post}", params={"is_upvote": True})
+    # The parent is missing: the comment counter moved, then it rolled back.
+    response = await client.post(
+        f"{api}/comments/reply_to_comment/999",
+        json={"post_id": seed.post, "content": "reply"},
+    )
+    assert response.status_code == 404
+    login(None)
+    await client.post(
+        f"{api}/users/register/",
+        json={
+            "username": "newbie",
+            "email": "newbie@example.com",
+            "date_of_birth": "2000-01-01",
+            "gender": "other",
+            "password": "password123",
+        },
+    )
+
+    tasks, streams = Recorder(), Recorder()
+    assert await relay_once(RoutingSink(tasks, streams), 100) == 3
+    assert [event.topic for event in streams.events] == ["post.created", "vote.cast"]
+    assert streams.events[1].payload == {
+        "user_id": seed.user,
+        "is_upvote": True,
+        "post_id": seed.post,
+    }
+    [verification] = tasks.events
+    assert verification.topic == "email.verification"
+    assert verification.payload["email"] == "newbie@example.com"
+    assert await outbox_ids() == []
+
+
+async def test_rejected_post_leaves_nothing_behind(client, login, seed):
+    from src.config.settings import settings
+
+    login(seed.user)
+    response = await client.post(
+        f"{settings.API_V1_STR}/posts/create/",
+        data={"subreddit_id": 999, "title": "new", "content": "body"},
+    )
+    assert response.status_code == 400
+    assert await outbox_ids() == []
+
+
+async def test_failed_publish_leaves_the_batch_in_place(seed):
+    from src.config.database import transaction
+    from src.outbox.events import emit
+    from src.outbox.relay import relay_once
+
+    async with transaction() as session:
+        for i in range(3):
+            emit(session, "test.event", i=i)
+    pending = await outbox_ids()
+
+    with pytest.raises(ConnectionError):
+        await relay_once(Recorder(fail=True), 100)
+    assert await outbox_ids() == pending
+
+    recorder = Recorder()
+    assert await relay_once(recorder, 100) == 3
+    assert [event.payload["i"] for event in recorder.events] == [0, 1, 2]
+
+
+async def test_relays_skip_each_others_batches(seed):
+    from src.config.database import async_session_maker, transaction
+    from src.outbox.events import emit
+    from src.outbox.relay import claim_query, relay_once
+
+    async with transaction() as session:
+        for i in range(10):
+            emit(session, "test.event", i=i)
+
+    async with async_session_maker() as first:
+        claimed = (await first.execute(claim_query(4))).all()
+        recorder = Recorder()
+        # Does not wait for the rows the first relay holds.
+        assert await relay_once(recorder, 100) == 6
+        assert {e.id for e in claimed}.isdisjoint(e.id for e in recorder.events)
+        await first.rollback()
+
+    assert await outbox_ids() == sorted(event.id for event in claimed)
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def count(database, query: str, **params) -> int:
+    async with database.connect() as connection:
+        return (await connection.execute(text(query), params)).scalar_one()
+
+
+async def test_deleting_a_post_cascades_through_partitions(
+    client, login, seed, database
+):
+    from src.config.settings import settings
+
+    login(seed.user)
+    response = await client.delete(
+        f"{settings.API_V1_STR}/posts/delete/{seed.voted_post}"
+    )
+    assert response.status_code == 200, response.text
+
+    comments = "SELECT id FROM comments WHERE post_id = :post"
+    assert (
+        await count(
+            database, f"SELECT count(*) FROM ({comments}) c", post=seed.voted_post
+        )
+        == 0
+    )
+    votes = "SELECT count(*) FROM votes WHERE post_id = :post OR comment_id = :comment"
+    assert (
+        await count(database, votes, post=seed.voted_post, comment=seed.voted_comment)
+        == 0
+    )
+    assert await count(database, "SELECT count(*) FROM comments") == 27
+
+
+async def test_future_partitions_are_created_once(database):
+    from src.config.partitions import PARTITIONED_TABLES, create_future_partitions
+
+    async with database.begin() as connection:
+        created = await create_future_partitions(connection, months_ahead=6)
+        again = await create_future_partitions(connection, months_ahead=6)
+        await connection.rollback()
+
+    assert set(created) == set(PARTITIONED_TABLES)
+    assert all(n > 0 for n in created.values()), created
+    assert not any(again.values()), again
+
+
+@pytest.mark.parametrize(
+    "insert",
+    [
+        "INSERT INTO comments (content, upvote, user_id, post_id) "
+        "VALUES ('x', 0, :user, 0)",
+        "INSERT INTO comments (content, upvote, user_id, post_id, parent_comment_id) "
+        "VALUES ('x', 0, :user, :post, 0)",
+        "INSERT INTO votes (user_id, post_id, is_upvote) VALUES (:user, 0, true)",
+        "INSERT INTO votes (user_id, comment_id, is_upvote) VALUES (:user, 0, true)",
+    ],
+)
+async def test_children_of_missing_parents_are_rejected(seed, database, insert):
+    with pytest.raises(IntegrityError, match="is not in"):
+        async with database.begin() as connection:
+            await connection.execute(
+                text(insert), {"user": seed.user, "post": seed.post}
+            )
+
+
+async def test_parent_delete_waits_for_a_child_being_inserted(seed, database):
+    comments = "SELECT count(*) FROM comments WHERE post_id = :post"
+
+    async def delete_post():
+        async with database.begin() as connection:
+            await connection.execute(
+                text("DELETE FROM posts WHERE id = :post"), {"post": seed.post}
+            )
+
+    async with database.begin() as connection:
+        await connection.execute(
+            text(
+                "INSERT INTO comments (content, upvote, user_id, post_id) "
+                "VALUES ('late', 0, :user, :post)"
+            ),
+            {"user": seed.user, "post": seed.post},
+        )
+        deleting = asyncio.create_task(delete_post())
+        await asyncio.sleep(0.2)
+        assert not deleting.done()
+    await deleting
+
+    # The cascade ran after the comment committed, so it found it too.
+    assert await count(database, comments, post=seed.post) == 0
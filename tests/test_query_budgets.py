@@ -0,0 +1,52 @@
+import pytest
+
+from bench.routes import CALLS, QUERY_BUDGETS
+
+
+def test_every_route_has_a_budget(app):
+    from src.api.main import api_router
+
+    routes = {
+        f"{method} {route.path}"
+        for route in api_router.routes
+        for method in route.methods
+    }
+    assert routes == {route.split(" [")[0] for route in QUERY_BUDGETS}
+    assert set(CALLS) == set(QUERY_BUDGETS)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize("route", sorted(QUERY_BUDGETS))
+async def test_query_budget(
+    route, app, client, login, seed, query_recorder, monkeypatch
+):
+    from src.config.settings import settings
+    from src.tasks.send_email import send_verification_email
+
+    call = CALLS[route](seed)
+    method, _ = route.split(" ", 1)
+    login(getattr(seed, call.as_user) if call.as_user else None)
+
+    monkeypatch.setattr(send_verification_email, "apply_async", lambda *a, **kw: None)
+    for name, value in call.settings.items():
+        monkeypatch.setattr(settings, name, value)
+    with query_recorder.record() as queries:
+        response = await client.request(
+            method,
+            f"{settings.API_V1_STR}{call.url}",
+            json=call.json,
+            params=call.params,
+            data=call.data,
+        )
+
+    assert response.status_code < 400, response.text
+    assert queries.count <= QUERY_BUDGETS[route], (
+        f"{route} ran {queries.count} queries, budget is {QUERY_BUDGETS[route]}:\n"
+        f"{queries.report()}"
+    )
+    assert not queries.repeated_lazy_loads(), (
+        f"{route} lazy-loads in a loop: {queries.repeated_lazy_loads()}"
+    )
+    assert not queries.repeated(), (
+        f"{route} repeats statements (N+1): {queries.repeated()}"
+    )
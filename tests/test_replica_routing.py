@@ -0,0 +1,80 @@
+"""Replica routing against a stand-in replica: the test database, through
+connections with ``default_transaction_read_only=on``, so any write routed
+there fails the way it would on a hot standby."""
+
+import pytest
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+@pytest.fixture
+async def replica(database, monkeypatch):
+    from src.config import database as db
+    from src.config import middleware
+
+    replica_engine = create_async_engine(
+        database.url,
+        connect_args={"server_settings": {"default_transaction_read_only": "on"}},
+    )
+    statements = []
+    event.listen(
+        replica_engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    # What src/config/middleware.py does for a configured replica.
+    middleware.count_checkouts(replica_engine)
+    monkeypatch.setattr(db, "replica_engine", replica_engine)
+    monkeypatch.setattr(middleware, "replica_engine", replica_engine)
+    monkeypatch.setattr(db.replica_state, "healthy", True)
+    yield statements
+    await replica_engine.dispose()
+
+
+async def test_get_requests_read_from_the_replica(client, seed, replica):
+    from src.config.settings import settings
+
+    response = await client.get(f"{settings.API_V1_STR}/posts/{seed.post}")
+    assert response.status_code == 200
+    assert any("FROM posts" in statement for statement in replica)
+    assert response.headers["x-db-checkouts"] == "1"
+
+
+async def test_write_requests_read_and_write_the_primary(client, login, seed, replica):
+    from src.config.settings import settings
+
+    api = settings.API_V1_STR
+    login(seed.other)
+    response = await client.post(
+        f"{api}/posts/upvote/{seed.post}", params={"is_upvote": True}
+    )
+    assert response.status_code == 200, response.text
+    response = await client.delete(f"{api}/comments/delete/{seed.comment}")
+    assert response.status_code == 200, response.text
+    assert replica == []
+
+    # The write pins the client to the primary for a while.
+    response = await client.get(f"{api}/comments/comments/by_post/{seed.post}")
+    assert response.json() == []
+    assert replica == []
+
+
+async def test_selects_with_writing_ctes_stay_on_the_primary(database, seed, replica):
+    from src.config.database import read_from_replica, transaction
+    from src.notifications.dao import NotificationDao
+    from src.posts.models import Post
+
+    token = read_from_replica.set(True)
+    try:
+        moved = update(Post).values(upvote=Post.upvote + 1).returning(Post.id)
+        async with transaction() as session:
+            count = await session.scalar(
+                select(func.count()).select_from(moved.cte("moved"))
+            )
+        assert count == 10
+        assert await NotificationDao.send_digests(0, 100) == (None, 0)
+    finally:
+        read_from_replica.reset(token)
+    assert replica == []
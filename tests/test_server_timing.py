@@ -0,0 +1,52 @@
+import logging
+
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+def parse(header: str) -> dict[str, dict]:
+    entries = {}
+    for entry in header.split(", "):
+        name, *params = entry.split(";")
+        entries[name] = dict(param.split("=", 1) for param in params)
+    return entries
+
+
+async def test_sampled_request_reports_its_breakdown(
+    client, login, seed, monkeypatch, caplog
+):
+    from src.config.settings import settings
+
+    monkeypatch.setattr(settings, "SERVER_TIMING_SAMPLE_RATE", 1.0)
+    login(seed.user)
+    with caplog.at_level(logging.INFO, logger="src.monitoring.timing"):
+        response = await client.get(
+            f"{settings.API_V1_STR}/comments/comments/by_post/{seed.post}"
+        )
+    assert response.status_code == 200
+
+    entries = parse(response.headers["server-timing"])
+    assert list(entries) == ["db", "auth", "serialize", "app", "total"]
+    durations = {name: float(entry["dur"]) for name, entry in entries.items()}
+    assert all(duration >= 0 for duration in durations.values())
+    assert durations["db"] > 0 and durations["auth"] > 0
+    parts = sum(durations[name] for name in ("db", "auth", "serialize", "app"))
+    assert parts == pytest.approx(durations["total"], abs=0.3)
+
+    # The user, the thread, its authors and the votes on it.
+    [record] = [r for r in caplog.records if hasattr(r, "timing")]
+    assert record.timing["route"] == "/api/v1/comments/comments/by_post/{post_id}"
+    assert record.timing["status"] == 200
+    assert record.timing["queries"] == 4
+    assert entries["db"]["desc"] == '"4 queries"'
+    assert record.timing["total_ms"] == durations["total"]
+
+
+async def test_unsampled_request_has_no_header(client, seed, monkeypatch):
+    from src.config.settings import settings
+
+    monkeypatch.setattr(settings, "SERVER_TIMING_SAMPLE_RATE", 0.0)
+    response = await client.get(f"{settings.API_V1_STR}/posts/{seed.post}")
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
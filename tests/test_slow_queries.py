@@ -0,0 +1,83 @@
+import asyncio
+import logging
+
+import pytest
+
+from src.monitoring.slow_queries import fingerprint, parameter_shape
+
+
+def test_fingerprint_folds_arguments():
+    assert fingerprint(
+        "SELECT * FROM posts WHERE id IN ($1::INTEGER, $2::INTEGER)\n  LIMIT 10"
+    ) == fingerprint("SELECT * FROM posts WHERE id IN ($1::INTEGER) LIMIT 20")
+    assert (
+        fingerprint("INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4), ($5, $6)")
+        == "INSERT INTO t (a, b) VALUES (?, ?), ..."
+    )
+    assert fingerprint("SELECT 'it''s' WHERE a = 'x'") == "SELECT ? WHERE a = ?"
+    assert (
+        fingerprint("UPDATE t SET at=$1::TIMESTAMP WITHOUT TIME ZONE WHERE t.id = $2")
+        == "UPDATE t SET at=? WHERE t.id = ?"
+    )
+    assert parameter_shape((1, "a", [1, 2], None)) == [
+        "int",
+        "str",
+        "list[2]",
+        "NoneType",
+    ]
+
+
+@pytest.fixture
+def slow_log(database, monkeypatch):
+    from src.monitoring.slow_queries import slow_query_log
+
+    monkeypatch.setattr(slow_query_log, "threshold", 0)
+    slow_query_log.clear()
+    slow_query_log.install(database)
+    yield slow_query_log
+    slow_query_log.remove(database)
+    slow_query_log.clear()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_slow_statements_are_logged_explained_and_listed(
+    client, login, seed, slow_log, caplog
+):
+    from src.config.settings import settings
+
+    api = settings.API_V1_STR
+    login(None)
+    with caplog.at_level(logging.WARNING, logger="src.monitoring.slow_queries"):
+        for _ in range(2):
+            response = await client.get(f"{api}/posts/{seed.post}")
+            assert response.status_code == 200
+
+    [stats] = [s for s in slow_log.stats.values() if "FROM posts" in s.fingerprint]
+    assert stats.count == 2
+    assert stats.parameters == ["int"]
+    assert stats.callers == {"/api/v1/posts/{post_id} PostDao.get_post_by_id": 2}
+    logged = [r.getMessage() for r in caplog.records]
+    assert any(
+        "route=/api/v1/posts/{post_id} dao=PostDao.get_post_by_id" in line
+        for line in logged
+    )
+    for _ in range(100):
+        if stats.plan is not None:
+            break
+        await asyncio.sleep(0.01)
+    assert stats.plan[0]["Plan"]["Node Type"]
+    # The plan's own statement isn't counted.
+    assert not any("EXPLAIN" in s.fingerprint for s in slow_log.stats.values())
+
+    login(seed.user)
+    response = await client.get(f"{api}/monitoring/slow-queries/")
+    assert response.status_code == 403
+
+    login(seed.admin)
+    response = await client.get(f"{api}/monitoring/slow-queries/", params={"limit": 50})
+    assert response.status_code == 200
+    [entry] = [
+        q for q in response.json()["queries"] if q["statement"] == stats.fingerprint
+    ]
+    assert entry["count"] == 2
+    assert entry["plan"] == stats.plan
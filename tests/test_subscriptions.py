@@ -0,0 +1,91 @@
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def test_bulk_update_keeps_feed_and_counters_in_sync(client, login, seed):
+    from src.config.settings import settings
+    from src.posts.counters import subscribers
+
+    api = settings.API_V1_STR
+    # The seed inserts subscriptions without touching the counters.
+    await subscribers.reconcile(0, await subscribers.max_id() + 1)
+    login(seed.user)
+    await client.post(
+        f"{api}/subreddit/create/", json={"name": "golang", "description": "gophers"}
+    )
+    found = await client.get(f"{api}/subreddit/find/", params={"name": "golang"})
+    [golang] = [subreddit["id"] for subreddit in found.json()]
+
+    login(seed.admin)
+    feed = await client.get(f"{api}/posts/lenta/", params={"sort_by": "new"})
+    assert feed.json() == []
+
+    response = await client.post(
+        f"{api}/subreddit/subscriptions/bulk/",
+        json={"subscribe": [seed.subreddit, golang, 999], "unsubscribe": [998]},
+    )
+    assert response.json() == {
+        "subscribed": sorted([seed.subreddit, golang]),
+        "unsubscribed": [],
+    }
+    feed = await client.get(f"{api}/posts/lenta/", params={"sort_by": "new"})
+    assert {post["subreddit"]["id"] for post in feed.json()} == {seed.subreddit}
+
+    response = await client.post(
+        f"{api}/subreddit/subscriptions/bulk/",
+        json={"subscribe": [golang], "unsubscribe": [seed.subreddit]},
+    )
+    assert response.json() == {"subscribed": [], "unsubscribed": [seed.subreddit]}
+    feed = await client.get(f"{api}/posts/lenta/", params={"sort_by": "new"})
+    assert feed.json() == []
+
+    subscriptions = await client.get(f"{api}/subreddit/get_all_subscriptions/")
+    assert [s["subreddit_id"] for s in subscriptions.json()] == [golang]
+    assert await subscribers.reconcile(0, await subscribers.max_id() + 1) == 0
+
+
+async def test_single_subscription_changes_reach_the_feed(client, login, seed):
+    from src.config.settings import settings
+
+    api = settings.API_V1_STR
+    login(seed.other)
+    feed = await client.get(f"{api}/posts/lenta/", params={"sort_by": "new"})
+    assert feed.json()
+
+    await client.delete(f"{api}/subreddit/delete_subscription/{seed.subscription}")
+    feed = await client.get(f"{api}/posts/lenta/", params={"sort_by": "new"})
+    assert feed.json() == []
+
+    await client.post(f"{api}/subreddit/create_subscribe/{seed.subreddit}")
+    feed = await client.get(f"{api}/posts/lenta/", params={"sort_by": "new"})
+    assert feed.json()
+
+
+async def test_overlapping_bulk_update_is_rejected(client, login, seed):
+    from src.config.settings import settings
+
+    login(seed.user)
+    response = await client.post(
+        f"{settings.API_V1_STR}/subreddit/subscriptions/bulk/",
+        json={"subscribe": [seed.subreddit], "unsubscribe": [seed.subreddit]},
+    )
+    assert response.status_code == 422
+
+
+async def test_rejected_writes_fail_the_request(client, login, seed):
+    from src.config.settings import settings
+
+    api = settings.API_V1_STR
+    login(seed.user)
+    duplicate = await client.post(
+        f"{api}/subreddit/create/", json={"name": "python", "description": "again"}
+    )
+    assert duplicate.status_code == 400
+    assert duplicate.json() == {"detail": "Subreddit already exists"}
+
+    login(seed.other)
+    twice = await client.post(f"{api}/subreddit/create_subscribe/{seed.subreddit}")
+    assert twice.status_code == 400
+    missing = await client.post(f"{api}/subreddit/create_subscribe/999")
+    assert missing.status_code == 400